@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+性能基准测试脚本
+
+把 data/processed/herb.txt 按倍数放大为合成语料（每份副本的药材名和拼音加上不同后缀，
+并打乱条目顺序），测量解析、建立索引、各查询方法、to_dataframe 和 export_to_csv 的耗时、
+吞吐量（MB/s、次/s）和内存峰值，并用 python -X importtime 测量导入包和 CLI --help 的启动耗时，
+结果以 JSON 输出，可以与保存的基线比较找出性能退化。
+
+    uv run python scripts/benchmark.py --scales 1,10 --output output/baseline.json
+    uv run python scripts/benchmark.py --scales 1,10 --compare output/baseline.json
+    uv run python scripts/benchmark.py --scales "" --compare output/baseline.json  # 只测启动耗时
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import tcm_herbdb
+from tcm_herbdb import HerbDatabase, HerbParser
+from tcm_herbdb.config import Config
+
+
+# 副本编号的后缀，名称用天干，拼音用对应的读音，保证放大后的药材名互不相同
+_NAME_DIGITS = "甲乙丙丁戊己庚辛壬癸"
+_PINYIN_DIGITS = ("jia", "yi", "bing", "ding", "wu", "ji", "geng", "xin", "ren", "gui")
+
+# 每个查询方法的调用参数，名称和拼音查询从语料中抽样
+QUERY_WORKLOAD = {
+    "get_herbs_by_property": [("温",), ("寒",), ("甘",), ("辛",)],
+    "get_herbs_by_efficacy": [("解表",), ("清热",), ("补气",), ("活血",)],
+    "get_herbs_by_field": [("dosage", "先煎"), ("precautions", "孕妇"), ("application", "咳嗽")],
+    "get_herbs_by_attributes": [((), "温", ("肺",)), (("辛",), None, ()), (("甘", "苦"), ("寒", "凉"), ("肝",))],
+    "search_many": [(("解表", "清热", "止咳", "活血", "补气"), "efficacy")],
+    "query": [("efficacy:解表 AND properties:温",), ("properties:寒 AND NOT precautions:孕妇",),
+              ("(efficacy:止咳 OR efficacy:平喘) AND properties:肺",)],
+    "fuzzy_search": [("mahaung",), ("ren shen",), ("麻皇",), ("当归",)],
+    "get_herbs_by_dosage": [(15, 30), (None, None, 3), (3, 10)],
+    "similarity_search": [("恶寒发热，无汗，头身疼痛",), ("咳嗽气喘，痰多",), ("补气健脾",)],
+    "similarity_search_many": [(("恶寒发热，无汗，头身疼痛", "咳嗽气喘，痰多", "补气健脾", "活血化瘀止痛"),)],
+    # herb.txt 不带章节层级，从 Markdown 教材放大的语料才会命中
+    "get_herbs_by_category": [("解表药",), ("发散风寒药",), ("第八章",)],
+}
+
+# 测量启动耗时的 Python 命令行参数
+STARTUP_COMMANDS = {
+    "import_tcm_herbdb": ["-c", "import tcm_herbdb"],
+    "cli_help": ["-m", "tcm_herbdb.cli", "--help"],
+}
+
+
+def _suffix(copy: int) -> Tuple[str, str]:
+    """第 copy 份副本的 (名称后缀, 拼音后缀)，第0份不加后缀"""
+    if copy == 0:
+        return "", ""
+    name, pinyin = "", ""
+    while copy:
+        copy, digit = divmod(copy, 10)
+        name = _NAME_DIGITS[digit] + name
+        pinyin = _PINYIN_DIGITS[digit] + pinyin
+    return name, pinyin
+
+
+def make_corpus(text: str, scale: int, seed: int = 0) -> str:
+    """
+    生成放大 scale 倍的合成语料
+
+    条目以表头行为界切分，每份副本的药材名和拼音加上后缀，所有条目打乱顺序后重新拼接；
+    表头前一行以"。"结尾，保证放大后的语料仍能被 Config.PARSER_PATTERN 正确切分。
+    """
+    regex = re.compile(Config.PARSER_PATTERN, re.MULTILINE)
+    matches = list(regex.finditer(text))
+    # 表头匹配项从上一条目末尾的"。"开始，条目从其后的换行符之后开始
+    starts = [match.start() + 2 for match in matches]
+    prefix = text[:starts[0]]
+    entries = []
+    for i, match in enumerate(matches):
+        end = starts[i + 1] if i + 1 < len(matches) else len(text)
+        entry = text[starts[i]:end]
+        if not entry.endswith(("。\n", "$\n")):
+            entry = entry.rstrip("\n") + "。\n"
+        # 名称和拼音在条目内的位置
+        entries.append((entry, match.end(1) - starts[i], match.end(2) - starts[i]))
+
+    chunks = []
+    for copy in range(scale):
+        name_suffix, pinyin_suffix = _suffix(copy)
+        for entry, name_end, pinyin_end in entries:
+            chunks.append(entry[:name_end] + name_suffix + entry[name_end:pinyin_end]
+                          + pinyin_suffix + entry[pinyin_end:])
+    random.Random(seed).shuffle(chunks)
+    return prefix + "".join(chunks)
+
+
+def measure(func: Callable, repeat: int = 1, min_time: float = 0.0, memory: bool = True) -> Dict[str, float]:
+    """
+    测量函数的耗时和内存峰值
+
+    先不计时地调用一次（导入 pandas/NumPy、建立延迟索引等一次性开销不计入耗时），再连续调用
+    直到累计耗时不少于 min_time，重复 repeat 轮取每次调用平均耗时最短的一轮；
+    memory 为True时另外在 tracemalloc 下调用一次记录内存峰值（tracemalloc 会拖慢执行，不计入耗时）。
+    """
+    func()
+    best = None
+    calls = 0
+    for _ in range(repeat):
+        gc.collect()
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        per_call = elapsed / calls
+        best = per_call if best is None else min(best, per_call)
+    result = {"seconds": best, "calls": calls}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_scale(base_text: str, scale: int, args) -> Dict[str, Dict[str, float]]:
+    """对放大 scale 倍的语料运行全部基准测试，返回 名称 -> 测量结果"""
+    results = {}
+    text = make_corpus(base_text, scale, args.seed)
+    size_mb = len(text.encode("utf-8")) / 1e6
+    parser = HerbParser()
+
+    def record(name: str, measurement: Dict[str, float], **throughput: float):
+        for key, amount in throughput.items():
+            measurement[key] = amount / measurement["seconds"]
+        results[name] = measurement
+        print(f"  {scale}x {name:<32} {measurement['seconds'] * 1000:10.3f} ms", file=sys.stderr)
+
+    herbs = parser.extract_herb_info(text)
+    record("parse.extract_herb_info",
+           measure(lambda: parser.extract_herb_info(text), args.repeat, args.min_time, args.memory),
+           mb_per_s=size_mb, herbs_per_s=len(herbs))
+    results["parse.extract_herb_info"].update(corpus_mb=size_mb, herbs=len(herbs))
+    del text
+
+    record("database.build_indexes",
+           measure(lambda: HerbDatabase(herbs, cache_size=0), args.repeat, args.min_time, args.memory),
+           herbs_per_s=len(herbs))
+
+    def build_all_indexes():
+        db = HerbDatabase(herbs, cache_size=0)
+        # n-gram 和 TF-IDF 索引在第一次查询时才建立
+        db.text_index, db.similarity_index.matrix
+
+    record("database.build_all_indexes",
+           measure(build_all_indexes, args.repeat, args.min_time, args.memory), herbs_per_s=len(herbs))
+
+    # 关闭查询缓存，测量的是每次查询的实际开销
+    db = HerbDatabase(herbs, cache_size=0)
+    sample = random.Random(args.seed).sample(herbs, min(20, len(herbs)))
+    workload = dict(QUERY_WORKLOAD,
+                    get_herbs_by_name=[(herb["name"],) for herb in sample],
+                    get_herbs_by_pinyin=[(herb["pinyin"],) for herb in sample],
+                    similar_herbs=[(herb["name"],) for herb in sample[:5]])
+    for method_name in sorted(workload):
+        method = getattr(db, method_name)
+        calls = workload[method_name]
+
+        def run_all(method=method, calls=calls):
+            for call in calls:
+                method(*call)
+
+        measurement = measure(run_all, args.repeat, args.min_time, args.memory)
+        measurement["seconds"] /= len(calls)
+        record(f"query.{method_name}", measurement, queries_per_s=1)
+
+    record("database.to_dataframe",
+           measure(db.to_dataframe, args.repeat, args.min_time, args.memory), rows_per_s=len(herbs))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "herbs.csv")
+        measurement = measure(lambda: db.export_to_csv(csv_path), args.repeat, args.min_time, args.memory)
+        record("database.export_to_csv", measurement,
+               mb_per_s=os.path.getsize(csv_path) / 1e6, rows_per_s=len(herbs))
+    return results
+
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    解析 -X importtime 的输出
+
+    返回 (所有顶层导入的累计耗时之和（秒）, 按自身耗时降序排列的 [(模块名, 秒)])
+    """
+    total = 0.0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # 表头行
+            continue
+        modules.append((name.strip(), int(self_us) / 1e6))
+        # 模块名前只有一个空格的是顶层导入，其累计耗时已包含它导入的所有模块
+        if len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative_us) / 1e6
+    modules.sort(key=lambda item: item[1], reverse=True)
+    return total, modules
+
+
+def run_startup(runs: int) -> Dict[str, Dict[str, object]]:
+    """在新的解释器中测量导入包和 CLI --help 的耗时，各运行 runs 次取最短的一次"""
+    results = {}
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [str(Path(tcm_herbdb.__file__).parent.parent), os.environ.get("PYTHONPATH")])))
+    for name, command in STARTUP_COMMANDS.items():
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, "-X", "importtime", *command], env=env,
+                                       capture_output=True, text=True, check=True)
+            wall = time.perf_counter() - start
+            total, modules = parse_importtime(completed.stderr)
+            if best is None or total < best["seconds"]:
+                best = {"seconds": total, "wall_seconds": wall,
+                        "slowest_modules": [[module, seconds] for module, seconds in modules[:10]]}
+        results[name] = best
+        print(f"  startup {name:<32} {best['seconds'] * 1000:10.3f} ms", file=sys.stderr)
+    return results
+
+
+def compare(current: Dict[str, object], baseline: Dict[str, object], threshold: float) -> List[str]:
+    """
+    与基线比较耗时，返回退化的测试项
+
+    耗时超过基线的 (1 + threshold) 倍视为退化，只比较两边都有的测试项
+    """
+    regressions = []
+    for key, measurement in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        ratio = measurement["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        flag = "退化" if ratio > 1 + threshold else ""
+        print(f"{key:<40} {base['seconds'] * 1000:10.3f} ms -> {measurement['seconds'] * 1000:10.3f} ms "
+              f"{ratio:6.2f}x {flag}", file=sys.stderr)
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCM-HerbDB 性能基准测试")
+    parser.add_argument("--input", default=str(Path(__file__).parent.parent / "data" / "processed" / "herb.txt"),
+                        help="作为放大基础的语料文件")
+    parser.add_argument("--scales", default="1,10,100",
+                        help="逗号分隔的放大倍数（默认: 1,10,100；1000 倍约需 1.2 GB 语料和数 GB 内存）")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复的轮数，取最好的一轮（默认: 3）")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每项每轮测量的最短累计秒数（默认: 0.2）")
+    parser.add_argument("--startup-runs", type=int, default=10,
+                        help="测量启动耗时时每条命令的运行次数，取最短的一次（默认: 10；0 表示不测量）")
+    parser.add_argument("--seed", type=int, default=0, help="打乱条目和抽样查询的随机种子")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="不测量内存峰值")
+    parser.add_argument("--output", "-o", help="结果 JSON 的保存路径，默认输出到标准输出")
+    parser.add_argument("--compare", help="与之比较的基线 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="耗时超过基线多少比例视为退化（默认: 0.25）")
+    args = parser.parse_args()
+    # 解析和导出的进度日志会干扰计时输出
+    logging.getLogger("tcm_herbdb").setLevel(logging.WARNING)
+
+    base_text = Path(args.input).read_text(encoding="utf-8")
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "input": args.input,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    if args.startup_runs > 0:
+        for name, measurement in run_startup(args.startup_runs).items():
+            report["results"][f"startup/{name}"] = measurement
+    for scale in (int(value) for value in args.scales.split(",") if value):
+        for name, measurement in run_scale(base_text, scale, args).items():
+            report["results"][f"{scale}x/{name}"] = measurement
+    # ru_maxrss 在 Linux 上以 KB 为单位，在 macOS 上以字节为单位
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report["meta"]["max_rss_mb"] = max_rss / (1e6 if sys.platform == "darwin" else 1e3)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} 项性能退化超过 {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import importlib
+
 from .logging_config import setup_logging, get_logger, configure_default_logging
 
 # 导入config模块
@@ -6,7 +8,6 @@ from .config import Config
 # 导入herb_parser模块中的函数和类
 from .herb_parser import (
     HerbParser,
-    HerbDatabase as BaseHerbDatabase,
     extract_herb_info,
     extract_section,
     get_first_n_herbs,
@@ -14,11 +15,52 @@ from .herb_parser import (
     get_first_n_herbs_from_txt
 )
 
-# 导入database模块中的扩展类
-from .database import HerbDatabase as ExtendedHerbDatabase, BaseHerbDatabase
+# 导入records模块中的紧凑记录类
+from .records import HerbRecord
+
+# 导入compression模块中的压缩存储类
+from .compression import CompressedHerb, FieldCompressor, train_dictionary
+
+# 导入index模块中的索引类
+from .index import CategoryIndex, FuzzyIndex, HashIndex, NgramIndex, QGramIndex, levenshtein, strip_tones
+
+# 导入aho_corasick模块中的多模式串匹配自动机
+from .aho_corasick import AhoCorasick
+
+# 导入properties模块中的药性解析
+from .properties import PropertyIndex, parse_properties
+
+# 导入dosage模块中的用法用量解析
+from .dosage import DosageIndex, parse_dosage
+
+# 导入similarity模块中的相似度检索索引
+from .similarity import TfidfIndex, char_ngrams
+
+# 导入cache模块中的解析缓存类
+from .cache import ParseCache
+
+# 导入query模块中的组合查询谓词
+from .query import And, Attributes, Contains, Dosage, Equals, Not, Or, Pinyin, Predicate, parse_query
+
+# 导入query_cache模块中的查询结果缓存类
+from .query_cache import QueryCache
+
+# 导入exporters模块中的流式导出函数
+from .exporters import herb_columns, write_arrow, write_jsonl, write_parquet
+
+# 导入instrumentation模块中的运行指标
+from .instrumentation import MetricsRegistry, metrics
 
-# 导入cli模块
-from .cli import main as cli_main
+# 数据库类、SQLite存储后端、查询服务和CLI在首次访问时才导入（见 __getattr__），
+# 使 import tcm_herbdb 不必加载 sqlite3、asyncio、argparse 等模块；名称 -> (模块, 属性)
+_LAZY_IMPORTS = {
+    'HerbDatabase': ('.database', 'HerbDatabase'),
+    'ExtendedHerbDatabase': ('.database', 'HerbDatabase'),
+    'BaseHerbDatabase': ('.database', 'BaseHerbDatabase'),
+    'SQLiteHerbDatabase': ('.sqlite_database', 'SQLiteHerbDatabase'),
+    'HerbServer': ('.server', 'HerbServer'),
+    'cli_main': ('.cli', 'main'),
+}
 
 # 定义包的公共接口
 __all__ = [
@@ -35,18 +77,85 @@ __all__ = [
     'HerbDatabase',
     'BaseHerbDatabase',
     'ExtendedHerbDatabase',
+    'SQLiteHerbDatabase',
     'extract_herb_info',
     'extract_section',
     'get_first_n_herbs',
     'extract_herb_info_from_txt',
     'get_first_n_herbs_from_txt',
+    'HerbRecord',
+
+    # 压缩存储相关
+    'CompressedHerb',
+    'FieldCompressor',
+    'train_dictionary',
+
+    # 缓存相关
+    'ParseCache',
+    'QueryCache',
+
+    # 导出相关
+    'herb_columns',
+    'write_jsonl',
+    'write_parquet',
+    'write_arrow',
+
+    # 索引相关
+    'HashIndex',
+    'NgramIndex',
+    'QGramIndex',
+    'FuzzyIndex',
+    'CategoryIndex',
+    'TfidfIndex',
+    'char_ngrams',
+    'levenshtein',
+    'strip_tones',
+    'AhoCorasick',
+
+    # 组合查询相关
+    'Predicate',
+    'Contains',
+    'Equals',
+    'Pinyin',
+    'Attributes',
+    'Dosage',
+    'And',
+    'Or',
+    'Not',
+    'parse_query',
+
+    # 药性相关
+    'PropertyIndex',
+    'parse_properties',
+
+    # 用法用量相关
+    'DosageIndex',
+    'parse_dosage',
+
+    # 运行指标相关
+    'MetricsRegistry',
+    'metrics',
+
+    # 查询服务相关
+    'HerbServer',
 
     # CLI相关
     'cli_main'
 ]
 
-# 为向后兼容性保留HerbDatabase
-HerbDatabase = ExtendedHerbDatabase
+
+def __getattr__(name: str):
+    """按需导入 _LAZY_IMPORTS 中的名称，导入后缓存在模块字典中"""
+    if name in _LAZY_IMPORTS:
+        module_name, attribute = _LAZY_IMPORTS[name]
+        value = getattr(importlib.import_module(module_name, __name__), attribute)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
 
 
 def hello() -> str:
@@ -0,0 +1,80 @@
+"""
+多模式串匹配模块
+
+用所有查询词建立 Aho-Corasick 自动机，对每段文本只扫描一遍即可找出其中出现的全部查询词，
+耗时与文本长度加匹配次数成正比，而与查询词数量无关。
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 自动机
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        terms = list(terms)
+        # 去重并保持顺序；空串在任何文本中都出现，不放入自动机
+        self.terms: List[str] = list(dict.fromkeys(term for term in terms if term))
+        self.has_empty = "" in terms
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        # 建立字典树，每个查询词的终点状态记录该词的编号
+        terminal: List[List[int]] = [[]]
+        for term_id, term in enumerate(self.terms):
+            state = 0
+            for char in term:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    terminal.append([])
+                state = next_state
+            terminal[state].append(term_id)
+
+        # 按层次遍历计算失败指针，并把失败指针所指状态的输出并入当前状态
+        self._output = [tuple(ids) for ids in terminal]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+        # 把失败指针链上（根状态除外）的转移并入各状态，匹配时每个字符只需查一次表；
+        # 在根状态的转移较多，不复制到各状态，查不到时再查根状态
+        self._delta: List[Dict[str, int]] = [{} for _ in self._goto]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = {**self._delta[self._fail[state]], **self._goto[state]}
+            queue.extend(self._goto[state].values())
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """依次产出每次匹配的 (查询词编号, 结束位置)，结束位置为匹配末字符之后的下标"""
+        delta, root, output = self._delta, self._goto[0], self._output
+        state = 0
+        for pos, char in enumerate(text, 1):
+            state = delta[state].get(char) or root.get(char, 0)
+            for term_id in output[state]:
+                yield term_id, pos
+
+    def find(self, text: str) -> Set[int]:
+        """文本中出现的全部查询词编号"""
+        delta, root, output = self._delta, self._goto[0], self._output
+        found = set()
+        state = 0
+        for char in text:
+            state = delta[state].get(char) or root.get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
@@ -0,0 +1,105 @@
+"""
+解析结果缓存模块
+
+以输入文件内容的哈希值、解析正则和解析器版本作为键，把解析结果以 pickle
+二进制格式保存在缓存目录中，文件未改变时直接反序列化，无需重新解析。
+反序列化 pickle 可以执行任意代码，因此缓存目录只对当前用户可写，
+也不读取属于其他用户或其他用户可写的缓存文件。
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from .config import Config
+
+
+# 创建模块日志记录器
+logger = logging.getLogger(__name__)
+
+
+def _is_trusted(stat: os.stat_result) -> bool:
+    """缓存文件属于当前用户且其他用户不可写（不支持 getuid 的平台不检查）"""
+    if not hasattr(os, "getuid"):
+        return True
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+class ParseCache:
+    """
+    磁盘解析缓存
+    """
+
+    def __init__(self, cache_dir: Union[str, Path] = None, pattern: str = None):
+        self.cache_dir = Path(cache_dir or Config.CACHE_DIR)
+        self.pattern = pattern or Config.PARSER_PATTERN
+
+    def key(self, file_path: Union[str, Path], variant: str = "dict") -> str:
+        """
+        计算缓存键：文件内容哈希 + 解析正则 + 章节配置 + 解析器版本 + 结果形式
+        """
+        with open(file_path, 'rb') as f:
+            content_digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        parser_digest = hashlib.sha256(
+            f"{self.pattern}\n{Config.SECTION_FIELDS!r}\n{Config.PARSER_VERSION}".encode('utf-8')
+        ).hexdigest()
+        return f"{content_digest[:32]}-{parser_digest[:16]}-{variant}"
+
+    def path(self, key: str) -> Path:
+        """缓存文件路径"""
+        return self.cache_dir / f"{key}.pickle"
+
+    def load(self, key: str) -> Optional[List[Dict[str, str]]]:
+        """读取缓存，未命中、缓存损坏或缓存文件不可信时返回None"""
+        try:
+            with open(self.path(key), 'rb') as f:
+                if not _is_trusted(os.fstat(f.fileno())):
+                    logger.warning(f"解析缓存文件属于其他用户或其他用户可写，将重新解析: {self.path(key)}")
+                    return None
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取解析缓存失败，将重新解析: {e}")
+            return None
+
+    def store(self, key: str, herbs: List[Dict[str, str]]):
+        """写入缓存，先写临时文件再原子替换，写入失败只记录警告"""
+        try:
+            self.cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(herbs, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path(key))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"写入解析缓存失败: {e}")
+
+    def get_or_parse(self, file_path: Union[str, Path],
+                     parse: Callable[[], Iterable[Dict[str, str]]],
+                     variant: str = "dict") -> List[Dict[str, str]]:
+        """
+        命中缓存时直接返回缓存的解析结果，否则调用 parse 解析并写入缓存
+        """
+        key = self.key(file_path, variant)
+        herbs = self.load(key)
+        if herbs is not None:
+            logger.info(f"命中解析缓存: {file_path}")
+            return herbs
+
+        herbs = list(parse())
+        # 解析期间文件被修改时不写入缓存，以免把新内容的结果存到旧内容的键下
+        if self.key(file_path, variant) == key:
+            self.store(key, herbs)
+        return herbs
+
+    def clear(self):
+        """删除缓存目录中的所有缓存文件"""
+        for path in self.cache_dir.glob("*.pickle"):
+            path.unlink()
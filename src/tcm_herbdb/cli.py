@@ -9,9 +9,16 @@ from pathlib import Path
 project_root = Path.cwd()
 sys.path.insert(0, str(project_root))
 
-from tcm_herbdb.herb_parser import HerbParser
-from tcm_herbdb.database import HerbDatabase as ExtendedHerbDatabase
+from tcm_herbdb.herb_parser import MARKDOWN_SUFFIXES, HerbParser
+from tcm_herbdb.cache import ParseCache
 from tcm_herbdb.config import Config
+from tcm_herbdb.instrumentation import metrics
+
+# 数据库和查询服务模块在执行对应命令时才导入，使 --help 等短命令启动更快
+
+
+# 支持的导出格式
+EXPORT_FORMATS = ("csv", "jsonl", "parquet", "arrow")
 
 
 def parse_arguments():
@@ -23,18 +30,55 @@ def parse_arguments():
     # 解析命令
     parse_parser = subparsers.add_parser("parse", help="解析药材数据")
     parse_parser.add_argument("--input", "-i", type=str, default="data/processed/herb.txt",
-                              help="输入文件路径")
+                              help="输入文件路径，.md 文件按 Markdown 教材解析")
     parse_parser.add_argument("--output", "-o", type=str, default="output/herbs.csv",
                               help="输出CSV文件路径")
     parse_parser.add_argument("--count", "-c", type=int, default=5,
                               help="显示前n个药材的详细信息")
+    parse_parser.add_argument("--workers", "-w", type=int, default=1,
+                              help="并行解析的进程数，大于1时启用多进程解析")
+    parse_parser.add_argument("--no-cache", action="store_true",
+                              help="不使用磁盘解析缓存")
+    parse_parser.add_argument("--mmap", action="store_true",
+                              help="以内存映射方式解析，不把整个文件解码到内存")
+    parse_parser.add_argument("--profile", action="store_true",
+                              help="结束时输出各阶段的耗时统计")
 
     # 导出命令
-    export_parser = subparsers.add_parser("export", help="导出药材数据到CSV")
+    export_parser = subparsers.add_parser("export", help="导出药材数据到CSV、JSONL、Parquet或Arrow文件")
     export_parser.add_argument("--input", "-i", type=str, default="data/processed/herb.txt",
-                               help="输入文件路径")
-    export_parser.add_argument("--output", "-o", type=str, default="output/herbs.csv",
-                               help="输出CSV文件路径")
+                               help="输入文件路径，.md 文件按 Markdown 教材解析")
+    export_parser.add_argument("--output", "-o", type=str, default=None,
+                               help="输出文件路径，默认为 output/herbs.<格式>")
+    export_parser.add_argument("--format", "-f", choices=EXPORT_FORMATS, default="csv",
+                               help="导出格式，parquet 和 arrow 需要安装 pyarrow")
+    export_parser.add_argument("--workers", "-w", type=int, default=1,
+                               help="并行解析的进程数，大于1时启用多进程解析")
+    export_parser.add_argument("--no-cache", action="store_true",
+                               help="不使用磁盘解析缓存")
+    export_parser.add_argument("--mmap", action="store_true",
+                               help="以内存映射方式解析，不把整个文件解码到内存")
+    export_parser.add_argument("--profile", action="store_true",
+                               help="结束时输出各阶段的耗时统计")
+
+    # 查询服务命令
+    serve_parser = subparsers.add_parser("serve", help="启动 HTTP/JSON 查询服务")
+    serve_parser.add_argument("--input", "-i", type=str, default="data/processed/herb.txt",
+                              help="输入文件路径，.md 文件按 Markdown 教材解析")
+    serve_parser.add_argument("--host", type=str, default=Config.SERVER_HOST,
+                              help="监听地址")
+    serve_parser.add_argument("--port", "-p", type=int, default=Config.SERVER_PORT,
+                              help="监听端口")
+    serve_parser.add_argument("--unix-socket", type=str, default=None,
+                              help="监听 Unix 套接字路径，指定时忽略 --host 和 --port")
+    serve_parser.add_argument("--workers", "-w", type=int, default=1,
+                              help="并行解析的进程数，大于1时启用多进程解析")
+    serve_parser.add_argument("--no-cache", action="store_true",
+                              help="不使用磁盘解析缓存")
+    serve_parser.add_argument("--compress", choices=("zlib", "lzma"), default=None,
+                              help="压缩存储全文、应用和现代研究等长字段，访问时才解压，减少常驻内存")
+    serve_parser.add_argument("--profile", action="store_true",
+                              help="记录运行指标（可通过 /metrics 获取），停止时输出各阶段和查询的耗时统计")
     
     return parser.parse_args()
 
@@ -50,20 +94,46 @@ def cmd_parse(args):
         print(f"错误: 找不到输入文件 {input_path}")
         return
     
-    # 读取并解析药材数据
-    with open(input_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
+    # 流式解析药材数据，只保留前n个药材和统计计数；多进程时整体并行解析
     parser = HerbParser()
-    herbs = parser.extract_herb_info(content)
-    
-    print(f"成功提取了 {len(herbs)} 味药材的信息")
+    markdown = input_path.suffix.lower() in MARKDOWN_SUFFIXES
+
+    def parse():
+        if markdown:
+            return parser.iter_herbs_markdown(input_path)
+        if args.mmap:
+            return parser.iter_herbs_mmap(input_path)
+        if args.workers > 1:
+            return parser.extract_herb_info_parallel(input_path, workers=args.workers)
+        return parser.iter_herbs(input_path)
+
+    # 文件内容未变化时直接读取解析缓存
+    if Config.CLI_CACHE_ENABLED and not args.no_cache:
+        variant = "markdown" if markdown else "dict"
+        herbs = ParseCache(pattern=parser.pattern).get_or_parse(input_path, parse, variant)
+    else:
+        herbs = parse()
+
+    first_herbs = []
+    total = 0
+    herbs_with_properties = 0
+    herbs_with_efficacy = 0
+    herbs_with_application = 0
+    for herb in herbs:
+        if total < args.count:
+            first_herbs.append(herb)
+        total += 1
+        herbs_with_properties += bool(herb['properties'])
+        herbs_with_efficacy += bool(herb['efficacy'])
+        herbs_with_application += bool(herb['application'])
+
+    print(f"成功提取了 {total} 味药材的信息")
     print()
     
     # 显示前n个药材的详细信息
     print(f"前{args.count}味药材的详细信息:")
     print("-" * 50)
-    for i, herb in enumerate(herbs[:args.count]):
+    for i, herb in enumerate(first_herbs):
         print(f"{i+1}. 药材名: {herb['name']}")
         print(f"   拼音: {herb['pinyin']}")
         print(f"   来源: {herb['source']}")
@@ -75,18 +145,15 @@ def cmd_parse(args):
     # 统计信息
     print("统计信息:")
     print("-" * 50)
-    print(f"总药材数: {len(herbs)}")
+    print(f"总药材数: {total}")
     
     # 计算有多少味药材有完整的药性信息
-    herbs_with_properties = sum(1 for herb in herbs if herb['properties'])
     print(f"有药性信息的药材数: {herbs_with_properties}")
     
     # 计算有多少味药材有完整的功效信息
-    herbs_with_efficacy = sum(1 for herb in herbs if herb['efficacy'])
     print(f"有功效信息的药材数: {herbs_with_efficacy}")
     
     # 计算有多少味药材有完整的应用信息
-    herbs_with_application = sum(1 for herb in herbs if herb['application'])
     print(f"有应用信息的药材数: {herbs_with_application}")
     
     # 询问是否导出到CSV
@@ -106,32 +173,79 @@ def cmd_export(args):
         print(f"错误: 找不到输入文件 {input_path}")
         return
     
-    # 创建数据库实例并导出到CSV
-    db = ExtendedHerbDatabase.from_txt_file(args.input)
+    from tcm_herbdb.database import HerbDatabase as ExtendedHerbDatabase
+
+    # 创建数据库实例并导出到CSV，导出不需要查询索引
+    db = ExtendedHerbDatabase.from_txt_file(args.input, workers=args.workers,
+                                            cache=Config.CLI_CACHE_ENABLED and not args.no_cache,
+                                            use_mmap=args.mmap, use_index=False)
     
     # 确保输出目录存在
-    output_path = project_root / args.output
+    export_format = getattr(args, "format", "csv")
+    output_path = project_root / (args.output or f"output/herbs.{export_format}")
     output_path.parent.mkdir(exist_ok=True)
 
-    # 导出到CSV
-    db.export_to_csv(str(output_path))
+    # 按指定格式导出
+    db.export(str(output_path), format=export_format)
+
+    print(f"{export_format.upper()}文件已生成: {output_path}")
+    print(f"{export_format.upper()}文件大小: {output_path.stat().st_size} 字节")
 
-    print(f"CSV文件已生成: {output_path}")
-    print(f"CSV文件大小: {output_path.stat().st_size} 字节")
+
+def cmd_serve(args):
+    """执行查询服务命令"""
+    input_path = project_root / args.input
+    if not input_path.exists():
+        print(f"错误: 找不到输入文件 {input_path}")
+        return
+
+    import asyncio
+    from tcm_herbdb.database import HerbDatabase as ExtendedHerbDatabase
+    from tcm_herbdb.server import HerbServer
+
+    # 数据库只加载一次，之后所有请求共享
+    db = ExtendedHerbDatabase.from_txt_file(args.input, workers=args.workers,
+                                            cache=Config.CLI_CACHE_ENABLED and not args.no_cache,
+                                            compress=args.compress)
+    print(f"已加载 {db.get_herb_count()} 味药材")
+
+    server = HerbServer(db, args.host, args.port, args.unix_socket)
+
+    async def run():
+        await server.start()
+        print(f"查询服务已启动: {server.address}，按 Ctrl+C 停止")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("查询服务已停止")
 
 
 def main():
     """主函数"""
     args = parse_arguments()
-    
+
+    profile = getattr(args, "profile", False)
+    if profile:
+        metrics.enable()
+
     if args.command == "parse":
         cmd_parse(args)
     elif args.command == "export":
         cmd_export(args)
+    elif args.command == "serve":
+        cmd_serve(args)
     else:
-        print("请指定一个命令: parse 或 export")
+        print("请指定一个命令: parse、export 或 serve")
         print("使用 --help 查看帮助信息")
 
+    if profile:
+        print()
+        print("性能统计:")
+        print("-" * 50)
+        print(metrics.report())
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
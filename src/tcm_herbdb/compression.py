@@ -0,0 +1,207 @@
+"""
+压缩存储模块
+
+full_content、modern_research 等长字段占每味药材的大部分内存，查询接口和索引却很少读取。
+CompressedHerb 把这些冷字段（Config.COLD_FIELDS）合在一起压缩成一个字节串，访问时才解压，
+最近解压过的药材保存在 FieldCompressor 的 LRU 缓存中；其余字段的值保存在元组中，
+字段名到位置的映射由同一布局的药材共用。支持标准库的 zlib 和 lzma，zlib 还可以使用从语料中统计出的
+共享字典，明显提高短文本的压缩率。
+
+    db = HerbDatabase(herbs, compress="zlib")
+    db.get_herbs_by_name("麻黄")[0]["full_content"]  # 此时才解压
+"""
+import lzma
+import re
+import zlib
+from collections import Counter, OrderedDict
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import Config
+
+
+# 支持的压缩算法
+CODECS = ("zlib", "lzma")
+
+# 冷字段以此分隔后一起压缩，含有该字符的药材不压缩
+_SEPARATOR = "\x00"
+
+# 压缩前的文本编码，汉字为主的文本用 UTF-16 比 UTF-8 压缩率更高、解码更快
+_ENCODING = "utf-16-le"
+
+# 统计共享字典时用于切分短语的标点
+_PHRASE_SPLIT = re.compile(r'[，。；：、（）()\n]')
+
+# lzma 使用不带文件头的原始格式，省去每个字节串约60字节的开销；单味药材的文本很短，
+# 字典缩小到 1MB 以免每次压缩都分配 preset 9 默认的 64MB 字典
+_LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 9, "dict_size": 1 << 20}]
+
+
+def train_dictionary(texts: Iterable[str], size: int = None) -> bytes:
+    """
+    从语料中统计 zlib 共享字典
+
+    按标点把文本切成短语，选出在多段文本中重复出现、总字节数最多的短语拼接成字典，
+    出现最多的短语放在末尾（zlib 引用距离越近编码越短）。size 默认取 Config.COMPRESSION_DICT_SIZE
+    """
+    size = Config.COMPRESSION_DICT_SIZE if size is None else size
+    counts = Counter()
+    for text in texts:
+        counts.update({phrase for phrase in _PHRASE_SPLIT.split(text) if 2 <= len(phrase) <= 40})
+    candidates = sorted(((count - 1) * len(phrase.encode(_ENCODING)), phrase)
+                        for phrase, count in counts.items() if count > 1)
+    chosen = []
+    total = 0
+    for _, phrase in reversed(candidates):
+        encoded = phrase.encode(_ENCODING)
+        if total + len(encoded) <= size:
+            chosen.append(encoded)
+            total += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+class FieldCompressor:
+    """
+    冷字段的压缩器，同时保存最近解压结果的 LRU 缓存
+
+    同一个压缩器可以由多个数据库（如同一教材的多个版本）共用，共享字典和缓存都只保留一份。
+    dictionary 只支持 zlib，cache_size 为0时不缓存，每次访问都重新解压。
+    """
+
+    def __init__(self, codec: str = "zlib", fields: Iterable[str] = None, dictionary: Optional[bytes] = None,
+                 cache_size: int = None, level: int = None):
+        if codec not in CODECS:
+            raise ValueError(f"不支持的压缩算法: {codec}")
+        if dictionary and codec != "zlib":
+            raise ValueError("只有 zlib 支持共享字典")
+        self.codec = codec
+        self.fields = tuple(Config.COLD_FIELDS if fields is None else fields)
+        self.dictionary = dictionary or b""
+        self.cache_size = Config.COMPRESSION_CACHE_SIZE if cache_size is None else cache_size
+        self.level = Config.COMPRESSION_LEVEL if level is None else level
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[bytes, Tuple[str, ...]]" = OrderedDict()
+        # 字段顺序相同的药材共用同一个字段名元组，以及不压缩字段的 字段名 -> 位置 映射
+        self._layouts: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self._positions: Dict[Tuple[str, ...], Dict[str, int]] = {}
+
+    @classmethod
+    def for_herbs(cls, herbs: Iterable[Mapping], codec: str = "zlib", **kwargs) -> "FieldCompressor":
+        """建立压缩器，zlib 时用 herbs 的冷字段统计共享字典"""
+        fields = tuple(kwargs.pop("fields", None) or Config.COLD_FIELDS)
+        dictionary = None
+        if codec == "zlib":
+            dictionary = train_dictionary(herb.get(field) or "" for herb in herbs for field in fields)
+        return cls(codec, fields, dictionary, **kwargs)
+
+    def compress(self, herb: Mapping) -> "CompressedHerb":
+        """压缩一味药材的冷字段，其余字段原样保留"""
+        cold_keys = tuple(field for field in self.fields if field in herb)
+        values = [herb[field] for field in cold_keys]
+        if any(_SEPARATOR in value for value in values):
+            cold_keys, values = (), []
+        hot_keys = tuple(key for key in herb if key not in cold_keys)
+        hot = tuple(herb[key] for key in hot_keys)
+        keys = self._layout(tuple(herb.keys()))
+        blob = self._encode(_SEPARATOR.join(values).encode(_ENCODING)) if cold_keys else b""
+        return CompressedHerb(self, self._hot_positions(hot_keys), hot, blob, self._layout(cold_keys), keys)
+
+    def compress_all(self, herbs: Iterable[Mapping]) -> List["CompressedHerb"]:
+        """压缩一组药材"""
+        return [self.compress(herb) for herb in herbs]
+
+    def load(self, blob: bytes) -> Tuple[str, ...]:
+        """解压冷字段，优先从 LRU 缓存中读取"""
+        values = self._cache.get(blob)
+        if values is not None:
+            self._cache.move_to_end(blob)
+            self.hits += 1
+            return values
+        self.misses += 1
+        values = tuple(self._decode(blob).decode(_ENCODING).split(_SEPARATOR))
+        if self.cache_size > 0:
+            self._cache[blob] = values
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return values
+
+    def info(self) -> Dict[str, object]:
+        """解压缓存的命中次数、未命中次数、当前条目数和容量"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.cache_size}
+
+    def _layout(self, keys: Tuple[str, ...]) -> Tuple[str, ...]:
+        return self._layouts.setdefault(keys, keys)
+
+    def _hot_positions(self, keys: Tuple[str, ...]) -> Dict[str, int]:
+        positions = self._positions.get(keys)
+        if positions is None:
+            positions = self._positions[keys] = {key: i for i, key in enumerate(keys)}
+        return positions
+
+    def _encode(self, data: bytes) -> bytes:
+        if self.codec == "lzma":
+            return lzma.compress(data, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+        if self.dictionary:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=self.dictionary)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def _decode(self, blob: bytes) -> bytes:
+        if self.codec == "lzma":
+            return lzma.decompress(blob, format=lzma.FORMAT_RAW, filters=_LZMA_FILTERS)
+        if self.dictionary:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=self.dictionary)
+        else:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return decompressor.decompress(blob) + decompressor.flush()
+
+
+class CompressedHerb(Mapping):
+    """
+    冷字段压缩存储的药材记录
+
+    支持与字典相同的只读访问方式（herb['name']、herb.get、keys、items 等），字段顺序不变，
+    与内容相同的字典比较时相等。访问冷字段时才解压，同一味药材的冷字段一次全部解压并缓存。
+    """
+
+    __slots__ = ("_compressor", "_hot_positions", "_hot", "_blob", "_cold_keys", "_keys")
+
+    def __init__(self, compressor: FieldCompressor, hot_positions: Dict[str, int], hot: Tuple[str, ...],
+                 blob: bytes, cold_keys: Tuple[str, ...], keys: Tuple[str, ...]):
+        self._compressor = compressor
+        self._hot_positions = hot_positions
+        self._hot = hot
+        self._blob = blob
+        self._cold_keys = cold_keys
+        self._keys = keys
+
+    def __getitem__(self, key: str) -> str:
+        position = self._hot_positions.get(key)
+        if position is not None:
+            return self._hot[position]
+        if key in self._cold_keys:
+            return self._compressor.load(self._blob)[self._cold_keys.index(key)]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key) -> bool:
+        return key in self._hot_positions or key in self._cold_keys
+
+    @property
+    def compressed_size(self) -> int:
+        """冷字段压缩后的字节数"""
+        return len(self._blob)
+
+    def to_dict(self) -> Dict[str, str]:
+        """生成普通字典"""
+        return {key: self[key] for key in self._keys}
+
+    def __repr__(self) -> str:
+        return f"CompressedHerb(name={self.get('name')!r}, compressed_size={len(self._blob)})"
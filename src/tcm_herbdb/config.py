@@ -5,6 +5,14 @@ import os
 from pathlib import Path
 
 
+def _cache_home() -> Path:
+    """用户缓存目录，遵循 XDG 基础目录规范：XDG_CACHE_HOME 未设置或不是绝对路径时为 ~/.cache"""
+    xdg_cache_home = os.getenv("XDG_CACHE_HOME")
+    if xdg_cache_home and os.path.isabs(xdg_cache_home):
+        return Path(xdg_cache_home)
+    return Path.home() / ".cache"
+
+
 class Config:
     """应用配置类"""
     
@@ -33,6 +41,77 @@ class Config:
     
     # 解析器配置
     PARSER_PATTERN = r'[。$]\n^([\u4e00-\u9fa5 ]+)\s*([a-zA-Zāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜü]+).*《([^》]+)》'
+
+    # 解析器版本，解析结果的结构或内容发生变化时需要递增，以使旧的解析缓存失效
+    PARSER_VERSION = "2"
+
+    # 【…】章节标题与药材字段的对应关系
+    SECTION_FIELDS = {
+        "药性": "properties",
+        "功效": "efficacy",
+        "应用": "application",
+        "用法用量": "dosage",
+        "使用注意": "precautions",
+        "现代研究": "modern_research",
+        "鉴别用药": "differentiation",
+        "其他": "others",
+    }
     
+    # 流式解析时每次读取的字符数
+    STREAM_CHUNK_SIZE = 64 * 1024
+
+    # 并行解析时每个进程分配的分片数，以及分片的最小字符数
+    PARALLEL_SHARDS_PER_WORKER = 4
+    PARALLEL_MIN_SHARD_SIZE = 256 * 1024
+
+    # 建立 n-gram 倒排索引的字段及 n 的取值
+    INDEX_FIELDS = ("properties", "efficacy", "application", "precautions")
+    NGRAM_SIZE = 2
+
+    # 模糊查找默认返回的药材数及允许的最大编辑距离
+    FUZZY_TOP_K = 10
+    FUZZY_MAX_DISTANCE = 2
+
+    # 解析缓存目录，默认为 $XDG_CACHE_HOME/tcm_herbdb
+    CACHE_DIR = Path(os.getenv("TCM_HERBDB_CACHE_DIR") or _cache_home() / "tcm_herbdb")
+    # 库函数（load_herbs、from_txt_file 等）默认不读写解析缓存，传入 cache=True 或设置
+    # TCM_HERBDB_CACHE=1 时开启；命令行默认开启，设置 TCM_HERBDB_CACHE=0 或使用 --no-cache 关闭
+    CACHE_ENABLED = os.getenv("TCM_HERBDB_CACHE", "0") != "0"
+    CLI_CACHE_ENABLED = os.getenv("TCM_HERBDB_CACHE", "1") != "0"
+
+    # 查询结果缓存的容量（0 表示不缓存）和过期时间（秒，0 表示不过期）
+    QUERY_CACHE_SIZE = int(os.getenv("TCM_HERBDB_QUERY_CACHE_SIZE", "256"))
+    QUERY_CACHE_TTL = float(os.getenv("TCM_HERBDB_QUERY_CACHE_TTL", "0")) or None
+
+    # 查询服务的默认监听地址、长连接空闲超时（秒）及流式响应每批写出的药材数
+    SERVER_HOST = os.getenv("TCM_HERBDB_HOST", "127.0.0.1")
+    SERVER_PORT = int(os.getenv("TCM_HERBDB_PORT", "8000"))
+    SERVER_KEEPALIVE_TIMEOUT = 15
+    SERVER_STREAM_BATCH = 64
+
+    # 运行指标，设置 TCM_HERBDB_METRICS=1 开启；耗时直方图的桶边界（秒）
+    METRICS_ENABLED = os.getenv("TCM_HERBDB_METRICS", "0") != "0"
+    METRICS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                       0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    # 相似度检索使用的字段、字符 n-gram 的长度范围及默认返回的药材数
+    SIMILARITY_FIELDS = ("efficacy", "application", "properties")
+    SIMILARITY_NGRAM_RANGE = (1, 2)
+    SIMILARITY_TOP_K = 10
+
+    # 压缩存储的冷字段、解压结果缓存的药材数、zlib 压缩级别及共享字典的最大字节数（zlib 窗口为32KB）；
+    # INDEX_FIELDS、SIMILARITY_FIELDS 和用法用量会被索引和组合查询逐条读取，不作为冷字段
+    COLD_FIELDS = ("full_content", "modern_research", "differentiation", "others")
+    COMPRESSION_CACHE_SIZE = 64
+    COMPRESSION_LEVEL = 9
+    COMPRESSION_DICT_SIZE = 32 * 1024
+
+    # 流式导出 Parquet/Arrow 时每批的药材数，以及使用字典编码的低基数列
+    EXPORT_BATCH_SIZE = 1024
+    DICTIONARY_COLUMNS = ("source",)
+
+    # to_dataframe(categorical=True) 时转换为分类类型的重复值较多的列
+    CATEGORICAL_COLUMNS = ("source", "flavors", "nature", "meridians")
+
     # 默认提取的药材数量
     DEFAULT_N_HERBS = 5
\ No newline at end of file
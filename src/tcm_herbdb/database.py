@@ -1,33 +1,316 @@
-import pandas as pd
-from typing import List, Dict, Optional
+import csv
+import io
+import logging
+import os
+from bisect import bisect_left, bisect_right
+from difflib import SequenceMatcher
+from typing import TYPE_CHECKING, List, Dict, Iterable, Optional, Tuple, Union
 from pathlib import Path
-from .herb_parser import HerbParser
+from .herb_parser import CATEGORY_FIELDS, MARKDOWN_SUFFIXES, HerbParser
+from .aho_corasick import AhoCorasick
+from .cache import ParseCache
+from .compression import FieldCompressor
+from .dosage import DosageIndex, check_range, dose_matches, parse_dosage
+from .exporters import WRITERS, as_rows, herb_columns, write_arrow, write_jsonl, write_parquet
+from .instrumentation import STAGE_SECONDS, metrics
+from .index import CategoryIndex, FuzzyIndex, HashIndex, NgramIndex, fuzzy_distance, is_cjk, levenshtein, strip_tones
+from .properties import NATURES, PropertyIndex, parse_properties
+from .query import Predicate, QueryPlan, parse_query, plan_query
+from .query_cache import QueryCache, cached_query, timed_query
+from .similarity import TfidfIndex
 from .config import Config
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# 创建模块日志记录器
+logger = logging.getLogger(__name__)
+
+# 由【药性】解析得到、可以在 to_dataframe 中选择的派生列
+PROPERTY_COLUMNS = ("flavors", "nature", "meridians")
+
+# 增量更新比较新旧文本时每次比较的字符数
+_DIFF_CHUNK = 1 << 16
+
+
+def _common_prefix_length(a: str, b: str, limit: int) -> int:
+    """a 和 b 的公共前缀长度（不超过 limit），先按块比较，再在第一个不同的块内二分"""
+    pos = 0
+    while pos < limit:
+        k = min(pos + _DIFF_CHUNK, limit)
+        if a[pos:k] != b[pos:k]:
+            break
+        pos += _DIFF_CHUNK
+    lo, hi = min(pos, limit), min(pos + _DIFF_CHUNK, limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[pos:mid] == b[pos:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_length(a: str, b: str, limit: int) -> int:
+    """a 和 b 的公共后缀长度（不超过 limit），做法同 _common_prefix_length"""
+    la, lb = len(a), len(b)
+    pos = 0
+    while pos < limit:
+        k = min(pos + _DIFF_CHUNK, limit)
+        if a[la - k:la - pos] != b[lb - k:lb - pos]:
+            break
+        pos += _DIFF_CHUNK
+    lo, hi = min(pos, limit), min(pos + _DIFF_CHUNK, limit)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[la - mid:la - pos] == b[lb - mid:lb - pos]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
 
 class BaseHerbDatabase:
     """
     基础中药数据库管理类
+
+    查询结果缓存在 query_cache 中，容量和过期时间默认取 Config.QUERY_CACHE_SIZE 和
+    Config.QUERY_CACHE_TTL。通过 add_herb 等方法修改数据库时会递增 version 使缓存失效；
+    直接修改 herbs 列表后需要调用 invalidate。
+
+    各查询方法每次调用只通过 get_all_herbs 读取一次全部药材，其他存储后端（如 SQLiteHerbDatabase）
+    覆盖 get_all_herbs 即可沿用这些查询。
     """
 
-    def __init__(self, herbs: List[Dict[str, str]] = None):
+    # 正在执行被缓存（或计时）的查询，内部的嵌套查询不再单独缓存（或计时）
+    _in_cached_query = False
+    _in_timed_query = False
+
+    def __init__(self, herbs: List[Dict[str, str]] = None,
+                 cache_size: int = None, cache_ttl: Optional[float] = None):
         self.herbs = herbs or []
+        self._init_query_cache(cache_size, cache_ttl)
+
+    def _init_query_cache(self, cache_size: int = None, cache_ttl: Optional[float] = None):
+        """建立查询结果缓存，cache_size 为0时不缓存"""
+        self.version = 0
+        self.query_cache = QueryCache(
+            Config.QUERY_CACHE_SIZE if cache_size is None else cache_size,
+            Config.QUERY_CACHE_TTL if cache_ttl is None else cache_ttl,
+        )
+
+    def invalidate(self):
+        """数据库已修改，递增版本号使缓存的查询结果失效"""
+        self.version += 1
+
+    def cache_info(self) -> Dict[str, object]:
+        """查询缓存的命中次数、未命中次数、条目数、容量和过期时间"""
+        return self.query_cache.info()
 
     def add_herb(self, herb: Dict[str, str]):
         """添加单味药材"""
         self.herbs.append(herb)
+        self.invalidate()
 
+    @cached_query
     def get_herbs_by_name(self, name: str) -> List[Dict[str, str]]:
         """根据名称查找药材"""
-        return [herb for herb in self.herbs if herb['name'] == name]
+        return [herb for herb in self.get_all_herbs() if herb['name'] == name]
+
+    @cached_query
+    def get_herbs_by_pinyin(self, pinyin: str, exact: bool = False) -> List[Dict[str, str]]:
+        """
+        根据拼音查找药材
 
+        exact 为False时忽略声调、大小写和空格，如 "mahuang" 可以查到麻黄
+        """
+        if exact:
+            return [herb for herb in self.get_all_herbs() if herb['pinyin'] == pinyin]
+        plain = strip_tones(pinyin)
+        return [herb for herb in self.get_all_herbs() if strip_tones(herb['pinyin']) == plain]
+
+    @cached_query
+    def fuzzy_search(self, query: str, k: int = None,
+                     max_distance: int = None) -> List[Tuple[Dict[str, str], int]]:
+        """
+        按名称或拼音模糊查找药材，容忍错别字、缺少声调和多余空格
+
+        中文查询与名称比较，其他查询去掉声调和空格后与拼音比较。返回最多k个
+        (药材, 编辑距离)，按距离升序排列。k 默认为 Config.FUZZY_TOP_K；
+        max_distance 默认按查询长度确定（每3个字允许1处错误），且不超过 Config.FUZZY_MAX_DISTANCE。
+        """
+        k = Config.FUZZY_TOP_K if k is None else k
+        if is_cjk(query):
+            field, key, normalize = 'name', query, str
+        else:
+            field, key, normalize = 'pinyin', strip_tones(query), strip_tones
+        max_distance = fuzzy_distance(key, max_distance)
+        matches = []
+        for herb in self.get_all_herbs():
+            distance = levenshtein(key, normalize(herb[field]), max_distance)
+            if distance <= max_distance:
+                matches.append((herb, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches[:k]
+
+    @cached_query
     def get_herbs_by_property(self, property_value: str) -> List[Dict[str, str]]:
         """根据药性查找药材"""
-        return [herb for herb in self.herbs if property_value in herb['properties']]
+        return self.get_herbs_by_field('properties', property_value)
 
+    @cached_query
     def get_herbs_by_efficacy(self, efficacy: str) -> List[Dict[str, str]]:
         """根据功效查找药材"""
-        return [herb for herb in self.herbs if efficacy in herb['efficacy']]
+        return self.get_herbs_by_field('efficacy', efficacy)
+
+    @cached_query
+    def get_herbs_by_field(self, field: str, value: str) -> List[Dict[str, str]]:
+        """查找指定字段包含value的药材"""
+        return [herb for herb in self.get_all_herbs() if value in herb[field]]
+
+    @cached_query
+    def get_herbs_by_attributes(self, flavors: Iterable[str] = None,
+                                natures: Union[str, Iterable[str]] = None,
+                                meridians: Iterable[str] = None) -> List[Dict[str, str]]:
+        """
+        根据结构化药性查找药材
+
+        flavors 和 meridians 要求药材包含全部给定取值，natures 要求四气等于其中之一，
+        如 get_herbs_by_attributes(natures="温", meridians=["肺", "胃"])。
+        已建立药性索引（property_index）时直接使用，否则临时建立一个
+        """
+        herbs = self.get_all_herbs()
+        index = getattr(self, "property_index", None)
+        if index is None:
+            index = PropertyIndex()
+            for herb_id, herb in enumerate(herbs):
+                index.add(herb_id, herb)
+        return [herbs[i] for i in index.query(flavors, natures, meridians)]
+
+    def search_many(self, terms: Iterable[str],
+                    fields: Union[str, Iterable[str]] = "efficacy") -> Dict[str, List[Dict[str, str]]]:
+        """
+        批量查找多个词，返回 查询词 -> 包含该词的药材列表
+
+        用所有查询词建立 Aho-Corasick 自动机，每味药材的每个字段只扫描一遍，
+        结果与对每个词分别调用 get_herbs_by_field 并合并各字段的结果一致（药材顺序不变）。
+        """
+        fields = [fields] if isinstance(fields, str) else list(fields)
+        automaton = AhoCorasick(terms)
+        results = {term: [] for term in automaton.terms}
+        herbs = self.get_all_herbs()
+        for herb in herbs:
+            found = set()
+            for field in fields:
+                found |= automaton.find(herb[field])
+            for term_id in sorted(found):
+                results[automaton.terms[term_id]].append(herb)
+        if automaton.has_empty:
+            results[""] = list(herbs)
+        return results
+
+    @cached_query
+    def query(self, condition: Union[str, Predicate]) -> List[Dict[str, str]]:
+        """
+        按组合条件查找药材
+
+        condition 可以是 Contains、Equals 等谓词的组合，也可以是 parse_query 支持的查询字符串，
+        如 db.query("efficacy:解表 AND properties:温 AND NOT precautions:孕妇")
+        """
+        return self.query_with_plan(condition)[1]
+
+    def explain(self, condition: Union[str, Predicate]) -> str:
+        """执行查询，返回所选的执行计划及每一步的行数"""
+        return self.query_with_plan(condition)[0].explain()
+
+    @timed_query
+    def query_with_plan(self, condition: Union[str, Predicate]) -> Tuple[QueryPlan, List[Dict[str, str]]]:
+        """执行查询，返回 (执行计划, 结果)，执行计划中已记录每一步的行数；结果不经过查询缓存"""
+        predicate = parse_query(condition) if isinstance(condition, str) else condition
+        plan = plan_query(self, predicate)
+        herbs = self.get_all_herbs()
+        return plan, [herbs[i] for i in plan.execute(herbs)]
+
+    @cached_query
+    def get_herbs_by_dosage(self, low: float = None, high: float = None, max_dose: float = None,
+                            unit: str = "g") -> List[Dict[str, str]]:
+        """
+        根据常规剂量查找药材
+
+        low、high 给出时要求剂量范围与 [low, high] 相交（缺省一端不限），max_dose 给出时
+        要求最大剂量不超过 max_dose，如 get_herbs_by_dosage(15, 30)、get_herbs_by_dosage(max_dose=3)。
+        剂量取【用法用量】中第一个带单位的剂量范围，见 parse_dosage
+        """
+        check_range(low, high)
+        result = []
+        for herb in self.get_all_herbs():
+            parsed = parse_dosage(herb.get('dosage') or "")
+            if dose_matches((parsed["min"], parsed["max"], parsed["unit"]), low, high, max_dose, unit):
+                result.append(herb)
+        return result
+
+    @cached_query
+    def get_herbs_by_category(self, category: str) -> List[Dict[str, str]]:
+        """
+        根据章、类别或节查找药材，如 "第八章"、"解表药" 或 "发散风寒药"
+
+        只有从 Markdown 教材解析的药材带有章节层级，见 HerbParser.iter_herbs_markdown
+        """
+        if not category:
+            return []
+        return [herb for herb in self.get_all_herbs()
+                if any(herb.get(field) == category for field in CATEGORY_FIELDS)]
+
+    def get_categories(self) -> Dict[str, List[str]]:
+        """返回 类别 -> 该类别下的节列表，均按在教材中出现的顺序排列"""
+        categories: Dict[str, List[str]] = {}
+        for herb in self.get_all_herbs():
+            category = herb.get('category')
+            if not category:
+                continue
+            subcategories = categories.setdefault(category, [])
+            subcategory = herb.get('subcategory')
+            if subcategory and subcategory not in subcategories:
+                subcategories.append(subcategory)
+        return categories
+
+    @cached_query
+    def similarity_search(self, text: str, k: int = None) -> List[Tuple[Dict[str, str], float]]:
+        """
+        按 TF-IDF 余弦相似度查找与一段文本（如症状描述）最相关的药材
+
+        比较功效、应用和药性（Config.SIMILARITY_FIELDS）的字符 n-gram，返回最多k个
+        (药材, 相似度)，按相似度降序排列，不含相似度为0的药材，k 默认取 Config.SIMILARITY_TOP_K
+        """
+        return self.similarity_search_many([text], k)[0]
+
+    def similarity_search_many(self, texts: Iterable[str],
+                               k: int = None) -> List[List[Tuple[Dict[str, str], float]]]:
+        """批量按相似度查找，结果与对每段文本分别调用 similarity_search 一致"""
+        herbs = self.get_all_herbs()
+        return [[(herbs[i], score) for i, score in matches]
+                for matches in self._similarity_index(herbs).search_many(texts, k)]
+
+    @cached_query
+    def similar_herbs(self, name: str, k: int = None) -> List[Tuple[Dict[str, str], float]]:
+        """
+        查找与指定药材最相似的药材，如 similar_herbs("麻黄")
+
+        返回值与 similarity_search 相同，不含该药材本身；找不到该药材时返回空列表
+        """
+        herbs = self.get_all_herbs()
+        herb_ids = [i for i, herb in enumerate(herbs) if herb['name'] == name]
+        if not herb_ids:
+            return []
+        return [(herbs[i], score) for i, score in self._similarity_index(herbs).similar(herb_ids[0], k)]
+
+    def _similarity_index(self, herbs: List[Dict[str, str]]) -> TfidfIndex:
+        """为 herbs（即 get_all_herbs 的结果）建立 TF-IDF 索引"""
+        index = TfidfIndex()
+        for herb_id, herb in enumerate(herbs):
+            index.add(herb_id, herb)
+        return index
 
     def get_all_herbs(self) -> List[Dict[str, str]]:
         """获取所有药材"""
@@ -41,45 +324,491 @@ class BaseHerbDatabase:
 class HerbDatabase(BaseHerbDatabase):
     """
     扩展的中药数据库管理类，提供数据导出功能
+
+    compress 为 "zlib" 或 "lzma" 时，Config.COLD_FIELDS 中的长字段压缩存储、访问时才解压
+    （zlib 使用从这批药材统计出的共享字典），药材仍可像字典一样读取，见 compression 模块；
+    也可以直接传入 FieldCompressor，由多个数据库共用同一个字典和解压缓存。
     """
 
-    def __init__(self, herbs: List[Dict[str, str]] = None):
-        super().__init__(herbs)
+    def __init__(self, herbs: List[Dict[str, str]] = None, use_index: bool = True,
+                 cache_size: int = None, cache_ttl: Optional[float] = None,
+                 compress: Union[str, FieldCompressor, None] = None):
+        super().__init__(herbs, cache_size, cache_ttl)
+        self.use_index = use_index
+        self.compressor = None
+        if compress:
+            self.compressor = compress if isinstance(compress, FieldCompressor) \
+                else FieldCompressor.for_herbs(self.herbs, compress)
+            with metrics.timer(STAGE_SECONDS, stage="compress"):
+                self.herbs = self.compressor.compress_all(self.herbs)
+        # 上次增量解析得到的各条目指纹（内容哈希）及对应药材，以及解析的文本和各条目表头位置，
+        # 用于 refresh_from_txt_file
+        self._entries: Optional[List[Tuple[int, Optional[Dict[str, str]]]]] = None
+        self._source: Optional[Tuple[str, List[int]]] = None
+        # 上次增量导出的 (文件路径, 各行内容)，及按条目指纹缓存的CSV行
+        self._csv_export: Optional[Tuple[str, List[bytes]]] = None
+        self._csv_rows: Dict[int, bytes] = {}
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """
+        根据当前药材列表重新建立索引
+
+        n-gram 索引（text_index）和 TF-IDF 索引（similarity_index）建立最慢、占用内存最多，
+        在第一次使用时才建立，见 _lazy_index
+        """
+        self.name_index = None
+        self.pinyin_index = None
+        self.plain_pinyin_index = None
+        self.property_index = None
+        self.fuzzy_index = None
+        self.dosage_index = None
+        self.category_index = None
+        self._lazy_indexes: Dict[str, object] = {}
+        if self.use_index:
+            self.name_index = HashIndex('name')
+            self.pinyin_index = HashIndex('pinyin')
+            self.plain_pinyin_index = HashIndex('pinyin', strip_tones)
+            self.property_index = PropertyIndex()
+            self.fuzzy_index = FuzzyIndex()
+            self.dosage_index = DosageIndex()
+            self.category_index = CategoryIndex(CATEGORY_FIELDS)
+            with metrics.timer(STAGE_SECONDS, stage="build_indexes"):
+                for herb_id, herb in enumerate(self.herbs):
+                    self._index_herb(herb_id, herb)
+
+    @property
+    def text_index(self) -> Optional[NgramIndex]:
+        """Config.INDEX_FIELDS 的 n-gram 倒排索引，第一次子串查询时建立；use_index 为False时为None"""
+        return self._lazy_index("text_index", lambda: NgramIndex(Config.INDEX_FIELDS, Config.NGRAM_SIZE))
+
+    @property
+    def similarity_index(self) -> Optional[TfidfIndex]:
+        """TF-IDF 相似度索引，第一次相似度查询时建立；use_index 为False时为None"""
+        return self._lazy_index("similarity_index", TfidfIndex)
+
+    def _lazy_index(self, name: str, factory) -> Optional[object]:
+        """返回延迟建立的索引，尚未建立时用当前药材列表建立"""
+        if not self.use_index:
+            return None
+        index = self._lazy_indexes.get(name)
+        if index is None:
+            index = factory()
+            with metrics.timer(STAGE_SECONDS, stage=f"build_{name}"):
+                for herb_id, herb in enumerate(self.herbs):
+                    index.add(herb_id, herb)
+            self._lazy_indexes[name] = index
+        return index
+
+    def _indexes(self) -> list:
+        """所有已建立的索引，尚未建立的延迟索引不在其中"""
+        indexes = [self.name_index, self.pinyin_index, self.plain_pinyin_index,
+                   self.property_index, self.fuzzy_index, self.dosage_index, self.category_index]
+        return [index for index in indexes if index is not None] + list(self._lazy_indexes.values())
+
+    def _index_herb(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材加入所有索引"""
+        for index in self._indexes():
+            index.add(herb_id, herb)
+
+    def _pack(self, herb: Dict[str, str]) -> Dict[str, str]:
+        """开启压缩存储时压缩药材的冷字段"""
+        return herb if self.compressor is None else self.compressor.compress(herb)
+
+    def add_herb(self, herb: Dict[str, str]):
+        """添加单味药材，并同步更新索引"""
+        herb = self._pack(herb)
+        super().add_herb(herb)
+        self._index_herb(len(self.herbs) - 1, herb)
+        # 手动添加的药材不属于任何文件条目，之后的增量解析需要从头开始
+        self._entries = None
+        self._source = None
 
-    def to_dataframe(self) -> pd.DataFrame:
+    def refresh_from_txt_file(self, file_path: str, export_path: str = None) -> Dict[str, List[str]]:
+        """
+        增量地用修改后的txt文件更新数据库
+
+        记录每个条目（从表头到下一个表头）的内容哈希，与上次解析的结果比较，
+        只重新解析新增或内容变化的条目。与上次的文本比较，只在首尾未修改部分之间
+        重新匹配表头，其余条目的位置整体平移。药材数量不变时只在索引中替换变化的药材，
+        否则在不重新解析的情况下重建索引。首次调用（或数据库并非由本方法建立）时
+        需要完整解析一次。
+
+        给出 export_path 时同时更新该CSV文件，见 _update_csv_export。
+        Markdown 教材的条目依赖章节层级，不支持增量更新，需要用 from_txt_file 重新加载。
+
+        返回 added、removed、changed 三个药材名列表
+        """
+        if Path(file_path).suffix.lower() in MARKDOWN_SUFFIXES:
+            raise ValueError(f"增量更新只支持整理后的txt文件，Markdown 教材请用 from_txt_file 重新加载: {file_path}")
+
+        parser = HerbParser()
+        with open(file_path, 'r', encoding='utf-8') as f:
+            text = f.read()
+
+        if self._entries is None:
+            old_entries = [(None, herb) for herb in self.herbs]
+        else:
+            old_entries = self._entries
+        old_source = self._source
+        first, last, entries = self._scan_changed_entries(parser, text, len(old_entries))
+
+        # 按条目指纹对齐新旧条目，未变化的条目直接复用上次的解析结果
+        new_entries = []
+        added, removed, changed = [], [], []
+        matcher = SequenceMatcher(None, [fingerprint for fingerprint, _ in old_entries[first:last]],
+                                  [fingerprint for _, _, fingerprint in entries], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                new_entries.extend(old_entries[first + i1:first + i2])
+                continue
+            old_herbs = [herb for _, herb in old_entries[first + i1:first + i2] if herb is not None]
+            new_herbs = []
+            for match, end_pos, fingerprint in entries[j1:j2]:
+                herb = parser.build_herb(match, text, end_pos)
+                if herb is not None:
+                    herb = self._pack(herb)
+                new_entries.append((fingerprint, herb))
+                if herb is not None:
+                    new_herbs.append(herb)
+            # 按药材名对应新旧药材，名称相同而内容不同的视为修改
+            old_by_name = {}
+            for herb in old_herbs:
+                old_by_name.setdefault(herb['name'], []).append(herb)
+            for herb in new_herbs:
+                same_name = old_by_name.get(herb['name'])
+                if same_name:
+                    if same_name.pop(0) != herb:
+                        changed.append(herb['name'])
+                else:
+                    added.append(herb['name'])
+            removed.extend(name for name, herbs in old_by_name.items() for _ in herbs)
+
+        # 修改范围之后的条目内容不变，只是表头位置随文本长度的变化平移
+        starts = [match.start() for match, _, _ in entries]
+        if old_source is not None and (first, last) != (0, len(old_entries)):
+            old_text, old_starts = old_source
+            delta = len(text) - len(old_text)
+            starts = old_starts[:first] + starts + [start + delta for start in old_starts[last:]]
+        new_entries = old_entries[:first] + new_entries + old_entries[last:]
+
+        old_herbs = self.herbs
+        self.herbs = [herb for _, herb in new_entries if herb is not None]
+        self._entries = new_entries
+        self._source = (text, starts)
+        if added or removed or changed:
+            self.invalidate()
+
+        if len(self.herbs) == len(old_herbs):
+            # 药材位置不变，只在索引中替换发生变化的药材
+            for herb_id, (old_herb, new_herb) in enumerate(zip(old_herbs, self.herbs)):
+                if old_herb is not new_herb and old_herb != new_herb:
+                    for index in self._indexes():
+                        index.remove(herb_id, old_herb)
+                        index.add(herb_id, new_herb)
+        else:
+            self._build_indexes()
+
+        if export_path is not None:
+            self._update_csv_export(export_path)
+
+        logger.info(f"增量更新完成: 新增 {len(added)}，删除 {len(removed)}，修改 {len(changed)}")
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def _scan_changed_entries(self, parser: HerbParser, text: str, count: int) -> Tuple[int, int, List[tuple]]:
+        """
+        找出与上次解析的文本相比可能变化的条目，返回 (first, last, 新条目)
+
+        上次的 count 个条目中 [first, last) 需要替换为新条目 (表头匹配项, 结束位置, 指纹)。
+        修改可能破坏所在条目和下一个条目的表头，因此从修改处所在条目的前一个条目开始
+        重新匹配，到第一个表头完全位于未修改的尾部中的条目为止。没有上次的文本时扫描全文。
+        """
+        def scan(start: int = 0, end: int = None) -> List[tuple]:
+            return [(match, end_pos, hash(text[match.start():end_pos]))
+                    for match, end_pos in parser.iter_entries(text, start, end)]
+
+        if self._source is None:
+            return 0, count, scan()
+
+        old_text, starts = self._source
+        limit = min(len(old_text), len(text))
+        prefix = _common_prefix_length(old_text, text, limit)
+        if prefix == len(old_text) == len(text):
+            return count, count, []
+        suffix = _common_suffix_length(old_text, text, limit - prefix)
+
+        first = max(bisect_right(starts, prefix) - 2, 0)
+        last = bisect_left(starts, len(old_text) - suffix)
+        begin = starts[first] if first > 0 else 0
+        end = starts[last] + len(text) - len(old_text) if last < len(starts) else len(text)
+        entries = scan(begin, end)
+        # 出处可以跨行，表头跨过 end 时之后的条目边界也可能变化，改为扫描全文
+        if entries and entries[-1][0].end() > end:
+            return 0, count, scan()
+        return first, last, entries
+
+    def _csv_row(self, values: Iterable[str]) -> bytes:
+        """把一行取值序列化为CSV，格式与 export_to_csv 一致"""
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator=os.linesep).writerow(values)
+        return buffer.getvalue().encode('utf-8')
+
+    def _update_csv_export(self, file_path: str):
+        """
+        把药材写入CSV文件，内容与 export_to_csv 相同，但只重写第一个变化的行之后的部分
+
+        每味药材序列化后的行按条目指纹缓存，未变化的条目不再重新序列化。
+        上次增量导出的是同一文件且文件大小未变时，从第一个不同的行开始覆盖写入并截断，
+        之前的内容保持不动；否则写入整个文件。
+        """
+        with metrics.timer(STAGE_SECONDS, stage="csv_update"):
+            columns = herb_columns(self.herbs)
+            rows = [self._csv_row(columns)]
+            previous = self._csv_export
+            # 列发生变化时缓存的行不再可用
+            reusable = self._csv_rows if previous is not None and previous[1][0] == rows[0] else {}
+            cached = {}
+            for fingerprint, herb in self._entries or [(None, herb) for herb in self.herbs]:
+                if herb is None:
+                    continue
+                row = reusable.get(fingerprint)
+                if row is None:
+                    row = self._csv_row([herb.get(column, "") for column in columns])
+                if fingerprint is not None:
+                    cached[fingerprint] = row
+                rows.append(row)
+            self._csv_rows = cached
+
+            path = os.path.abspath(file_path)
+            if (previous is not None and previous[0] == path and os.path.exists(path)
+                    and os.path.getsize(path) == sum(len(row) for row in previous[1])):
+                first = offset = 0
+                for old_row, row in zip(previous[1], rows):
+                    if old_row != row:
+                        break
+                    first += 1
+                    offset += len(row)
+                with open(path, 'r+b') as f:
+                    f.seek(offset)
+                    f.write(b"".join(rows[first:]))
+                    f.truncate()
+            else:
+                with open(path, 'wb') as f:
+                    f.write(b"".join(rows))
+            self._csv_export = (path, rows)
+
+    @cached_query
+    def get_herbs_by_name(self, name: str) -> List[Dict[str, str]]:
+        """根据名称查找药材，使用名称哈希索引"""
+        if self.name_index is None:
+            return super().get_herbs_by_name(name)
+        return [self.herbs[i] for i in self.name_index.get(name)]
+
+    @cached_query
+    def get_herbs_by_pinyin(self, pinyin: str, exact: bool = False) -> List[Dict[str, str]]:
+        """
+        根据拼音查找药材，使用拼音哈希索引
+
+        exact 为False时忽略声调、大小写和空格，如 "mahuang" 可以查到麻黄
+        """
+        index = self.pinyin_index if exact else self.plain_pinyin_index
+        if index is None:
+            return super().get_herbs_by_pinyin(pinyin, exact)
+        return [self.herbs[i] for i in index.get(pinyin)]
+
+    @cached_query
+    def fuzzy_search(self, query: str, k: int = None,
+                     max_distance: int = None) -> List[Tuple[Dict[str, str], int]]:
+        """按名称或拼音模糊查找药材，使用 q-gram 索引，参数和返回值见 BaseHerbDatabase.fuzzy_search"""
+        if self.fuzzy_index is None:
+            return super().fuzzy_search(query, k, max_distance)
+        k = Config.FUZZY_TOP_K if k is None else k
+        return [(self.herbs[herb_id], distance)
+                for herb_id, distance in self.fuzzy_index.search(query, k, max_distance)]
+
+    @cached_query
+    def get_herbs_by_field(self, field: str, value: str) -> List[Dict[str, str]]:
+        """
+        查找指定字段包含value的药材
+
+        字段已建 n-gram 索引时先由倒排表求出候选药材，再逐个校验子串，
+        结果与全表扫描一致
+        """
+        candidates = None
+        if self.text_index is not None:
+            candidates = self.text_index.candidates(field, value)
+        if candidates is None:
+            return super().get_herbs_by_field(field, value)
+        herbs = self.herbs
+        return [herbs[i] for i in candidates if value in herbs[i][field]]
+
+    @cached_query
+    def get_herbs_by_dosage(self, low: float = None, high: float = None, max_dose: float = None,
+                            unit: str = "g") -> List[Dict[str, str]]:
+        """根据常规剂量查找药材，使用剂量区间索引，参数见 BaseHerbDatabase.get_herbs_by_dosage"""
+        if self.dosage_index is None:
+            return super().get_herbs_by_dosage(low, high, max_dose, unit)
+        return [self.herbs[i] for i in self.dosage_index.query(low, high, max_dose, unit)]
+
+    @cached_query
+    def get_herbs_by_category(self, category: str) -> List[Dict[str, str]]:
+        """根据章、类别或节查找药材，使用章节层级索引"""
+        if self.category_index is None:
+            return super().get_herbs_by_category(category)
+        return [self.herbs[i] for i in self.category_index.get(category)]
+
+    def _similarity_index(self, herbs: List[Dict[str, str]]) -> TfidfIndex:
+        """使用建库时建立的 TF-IDF 索引"""
+        if self.similarity_index is None:
+            return super()._similarity_index(herbs)
+        return self.similarity_index
+
+    @cached_query
+    def similar_herbs(self, name: str, k: int = None) -> List[Tuple[Dict[str, str], float]]:
+        """查找与指定药材最相似的药材，使用名称哈希索引定位药材，参数和返回值见 BaseHerbDatabase.similar_herbs"""
+        if self.name_index is None:
+            return super().similar_herbs(name, k)
+        herb_ids = self.name_index.get(name)
+        if not herb_ids:
+            return []
+        herbs = self.herbs
+        return [(herbs[i], score) for i, score in self.similarity_index.similar(herb_ids[0], k)]
+
+    @metrics.timed(STAGE_SECONDS, stage="dataframe")
+    def to_dataframe(self, columns: Iterable[str] = None,
+                     categorical: Union[bool, Iterable[str]] = False) -> "pd.DataFrame":
         """
         将药材数据转换为pandas DataFrame
+
+        columns 指定需要的列及顺序，默认为所有药材字段的并集；除药材字段外还可以选择
+        由【药性】解析得到的 flavors、nature 和 meridians 列（多个取值以"、"连接）。
+        categorical 为True时把 Config.CATEGORICAL_COLUMNS 中的列转换为分类类型，
+        也可以直接给出列名。普通字典按列直接读取，不生成中间的字典列表；压缩存储等其他记录
+        先逐行转换为字典，每味药材只解压一次（见 exporters.as_rows）。
         """
-        if not self.herbs:
-            return pd.DataFrame()
+        # pandas 导入较慢，只在需要时导入，使不生成 DataFrame 的命令启动更快
+        import pandas as pd
+
+        herbs = as_rows(self.herbs)
+        available = herb_columns(herbs)
+        columns = available if columns is None else list(columns)
+        for column in columns:
+            if column not in available and column not in PROPERTY_COLUMNS:
+                raise KeyError(column)
 
-        # 确保所有字典具有相同的键，以避免DataFrame创建时的问题
-        all_keys = set()
-        for herb in self.herbs:
-            all_keys.update(herb.keys())
+        if categorical is True:
+            categorical = Config.CATEGORICAL_COLUMNS
+        categorical = set(categorical or ())
 
-        # 用空字符串填充缺失的键
-        normalized_herbs = []
-        for herb in self.herbs:
-            normalized_herb = {key: herb.get(key, "") for key in all_keys}
-            normalized_herbs.append(normalized_herb)
+        properties = None
+        if any(column in PROPERTY_COLUMNS for column in columns):
+            properties = self._describe_properties()
 
-        return pd.DataFrame(normalized_herbs)
+        data = {}
+        for column in columns:
+            if column in PROPERTY_COLUMNS and column not in available:
+                values = [value if isinstance(value, str) else "、".join(value)
+                          for value in (parsed[column] for parsed in properties)]
+            else:
+                values = [herb.get(column, "") for herb in herbs]
+            if column == "nature" and column in categorical:
+                # 四气按寒热程度排序，无法识别的记为缺失值
+                data[column] = pd.Categorical([value or None for value in values],
+                                              categories=NATURES, ordered=True)
+            elif column in categorical:
+                data[column] = pd.Categorical(values)
+            else:
+                data[column] = values
+        return pd.DataFrame(data, columns=columns)
+
+    def _describe_properties(self) -> List[Dict[str, object]]:
+        """所有药材解析后的五味、四气和归经，已建索引时直接从药性索引解码"""
+        if self.property_index is not None:
+            return [self.property_index.describe(i) for i in range(len(self.herbs))]
+        return [parse_properties(herb.get('properties') or "") for herb in self.herbs]
 
     def export_to_csv(self, file_path: str, encoding: str = 'utf-8'):
         """
         将药材数据导出到CSV文件
         """
         df = self.to_dataframe()
-        df.to_csv(file_path, index=False, encoding=encoding)
+        with metrics.timer(STAGE_SECONDS, stage="csv_write"):
+            df.to_csv(file_path, index=False, encoding=encoding)
+
+    def export_to_jsonl(self, file_path: str, encoding: str = 'utf-8'):
+        """
+        将药材数据逐行导出到JSON Lines文件
+        """
+        write_jsonl(self.herbs, file_path, encoding=encoding)
+
+    def export_to_parquet(self, file_path: str, batch_size: int = None):
+        """
+        将药材数据分批导出到Parquet文件（需要 pyarrow）
+        """
+        write_parquet(self.herbs, file_path, batch_size=batch_size)
+
+    def export_to_arrow(self, file_path: str, batch_size: int = None):
+        """
+        将药材数据分批导出到Arrow IPC文件（需要 pyarrow）
+        """
+        write_arrow(self.herbs, file_path, batch_size=batch_size)
+
+    def export(self, file_path: str, format: str = "csv"):
+        """
+        按指定格式（csv、jsonl、parquet、arrow）导出药材数据
+        """
+        if format == "csv":
+            self.export_to_csv(file_path)
+        elif format in WRITERS:
+            with metrics.timer(STAGE_SECONDS, stage=f"{format}_write"):
+                WRITERS[format](self.herbs, file_path)
+        else:
+            raise ValueError(f"不支持的导出格式: {format}")
 
     @classmethod
-    def from_txt_file(cls, file_path: str):
+    def from_txt_file(cls, file_path: str, workers: int = 1, compact: bool = False, cache: bool = None,
+                      use_mmap: bool = False, compress: Union[str, FieldCompressor, None] = None,
+                      use_index: bool = True):
         """
-        从txt文件创建HerbDatabase实例
+        从txt或Markdown文件创建HerbDatabase实例
+
+        use_index 为False时不建立任何索引（如只需导出数据时），compress 见类说明，其余参数含义见 load_herbs
         """
-        parser = HerbParser()
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        herbs = parser.extract_herb_info(content)
-        return cls(herbs)
\ No newline at end of file
+        return cls(load_herbs(file_path, workers=workers, compact=compact, cache=cache, use_mmap=use_mmap),
+                   use_index=use_index, compress=compress)
+
+
+def load_herbs(file_path: str, workers: int = 1, compact: bool = False,
+               cache: bool = None, use_mmap: bool = False) -> List[Dict[str, str]]:
+    """
+    从txt文件或Markdown教材（.md、.markdown）加载药材列表
+
+    Markdown 教材逐行流式解析，药材带有章节层级（见 HerbParser.iter_herbs_markdown），
+    不支持 compact、use_mmap 和 workers。
+    compact 为True时使用共享文本缓冲区的紧凑记录（HerbRecord）保存药材；
+    否则 use_mmap 为True时在内存映射的原始字节上解析，workers 大于1时使用多进程并行解析，
+    其余情况流式解析。
+    cache 为True时优先读取磁盘解析缓存，默认取 Config.CACHE_ENABLED
+    """
+    parser = HerbParser()
+    markdown = Path(file_path).suffix.lower() in MARKDOWN_SUFFIXES
+    if markdown and compact:
+        raise ValueError("Markdown 教材不支持紧凑记录（compact）")
+
+    def parse():
+        if markdown:
+            return parser.iter_herbs_markdown(file_path)
+        if compact:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return parser.extract_herb_records(f.read())
+        if use_mmap:
+            return parser.iter_herbs_mmap(file_path)
+        if workers > 1:
+            return parser.extract_herb_info_parallel(Path(file_path), workers=workers)
+        return parser.iter_herbs(file_path)
+
+    with metrics.timer(STAGE_SECONDS, stage="load"):
+        if Config.CACHE_ENABLED if cache is None else cache:
+            variant = "markdown" if markdown else "compact" if compact else "dict"
+            return ParseCache(pattern=parser.pattern).get_or_parse(file_path, parse, variant)
+        return list(parse())
@@ -0,0 +1,215 @@
+"""
+用法用量结构化解析模块
+
+把【用法用量】文本（如 "煎服， $3\\sim 10\\mathrm{g}$ ，先煎。"）中的剂量范围、单位、
+用法和特殊煎服要求解析出来，并按单位建立区间树，支持按剂量范围查找药材。
+"""
+import re
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+
+# 用法，值为匹配正则（教材中"入"常被识别为"人"）
+METHODS = {
+    "煎服": re.compile(r'煎服'),
+    "入丸散": re.compile(r'[入人]丸[、，]?散'),
+    "研末服": re.compile(r'研末(?:吞)?服|研粉吞服'),
+    "冲服": re.compile(r'冲服'),
+    "泡服": re.compile(r'泡服'),
+    "外用": re.compile(r'外用'),
+}
+
+# 特殊煎服要求和注意事项
+FLAGS = ("先煎", "后下", "包煎", "另煎", "烊化", "不宜久煎", "不宜入煎剂", "鲜品")
+
+# 剂量数字后面表示单位的非 LaTeX 字符；"次"表示服用次数而不是剂量
+_COUNT_UNITS = ("枚", "粒", "片", "只")
+
+_MATH_PATTERN = re.compile(r'\$([^$]*)\$')
+_AMOUNT_PATTERN = re.compile(
+    r'\s*(?P<min>\d+(?:\.\d+)?)\s*(?:\\sim\s*(?P<max>\d+(?:\.\d+)?))?\s*'
+    r'(?:\\mathrm\{\s*~?(?P<unit>[^}]*)\}|(?P<bare>g|ml))?\s*(?:_\{\\circ\})?\s*')
+
+Range = Tuple[float, float, str]
+
+
+def parse_dosage(text: str) -> Dict[str, object]:
+    """
+    解析用法用量文本
+
+    返回 min、max、unit（第一个带单位的剂量范围，通常是常规内服剂量；没有时为None、None、""），
+    ranges（文中所有 (最小值, 最大值, 单位) 剂量范围，单个剂量的最小值等于最大值）、
+    methods（用法列表）和 flags（特殊要求列表）。
+    """
+    ranges: List[Range] = []
+    for match in _MATH_PATTERN.finditer(text):
+        amount = _AMOUNT_PATTERN.fullmatch(match.group(1))
+        if amount is None:
+            # 百分比浓度等其他公式
+            continue
+        unit = amount.group('unit') or amount.group('bare') or ""
+        unit = unit.replace(" ", "")
+        if not unit:
+            following = text[match.end():].lstrip()[:1]
+            if following in _COUNT_UNITS:
+                unit = following
+            elif following == "次":
+                continue
+        low = float(amount.group('min'))
+        high = float(amount.group('max')) if amount.group('max') else low
+        ranges.append((low, high, unit))
+
+    primary = next((item for item in ranges if item[2]), (None, None, ""))
+    return {
+        "min": primary[0],
+        "max": primary[1],
+        "unit": primary[2],
+        "ranges": ranges,
+        "methods": [method for method, pattern in METHODS.items() if pattern.search(text)],
+        "flags": [flag for flag in FLAGS if flag in text],
+    }
+
+
+class IntervalTree:
+    """
+    静态的中心区间树
+
+    每个结点取所有端点的中位数为中心，保存跨过中心的区间（分别按起点升序、终点降序排列），
+    完全在中心左侧和右侧的区间放入左右子树。查找与 [low, high] 相交的区间为 O(log N + k)。
+    """
+
+    def __init__(self, intervals: List[Tuple[float, float, int]]):
+        self.root = self._build(intervals)
+
+    def _build(self, intervals):
+        if not intervals:
+            return None
+        endpoints = sorted(value for low, high, _ in intervals for value in (low, high))
+        center = endpoints[len(endpoints) // 2]
+        left = [item for item in intervals if item[1] < center]
+        right = [item for item in intervals if item[0] > center]
+        spanning = [item for item in intervals if item[0] <= center <= item[1]]
+        by_low = sorted(spanning, key=lambda item: item[0])
+        by_high = sorted(spanning, key=lambda item: item[1], reverse=True)
+        return (center, by_low, by_high, self._build(left), self._build(right))
+
+    def overlapping(self, low: float, high: float) -> List[int]:
+        """与闭区间 [low, high] 相交的区间的编号"""
+        result = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            center, by_low, by_high, left, right = node
+            if high < center:
+                # 跨过中心的区间终点都不小于 center > high，只需检查起点
+                for item in by_low:
+                    if item[0] > high:
+                        break
+                    result.append(item[2])
+                stack.append(left)
+            elif low > center:
+                for item in by_high:
+                    if item[1] < low:
+                        break
+                    result.append(item[2])
+                stack.append(right)
+            else:
+                result.extend(item[2] for item in by_low)
+                stack.append(left)
+                stack.append(right)
+        return result
+
+
+class DosageIndex:
+    """
+    剂量区间索引
+
+    按单位分别为各药材的常规剂量范围建立区间树，并保存按最大剂量排序的数组，
+    "剂量范围与 15～30 g 相交"和"最大剂量不超过 3 g"的查找都是 O(log N + k)。
+    区间树和数组在药材变化后的下一次查找时重新生成。
+    """
+
+    def __init__(self):
+        self._ranges: List[Optional[Range]] = []
+        self._trees: Optional[Dict[str, Tuple[IntervalTree, List[float], List[int]]]] = None
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """
+        把一味药材加入索引
+
+        herb_id 等于当前药材数时追加，小于当前药材数时替换该位置（用于增量更新）
+        """
+        parsed = parse_dosage(herb.get('dosage') or "")
+        self._set(herb_id, (parsed["min"], parsed["max"], parsed["unit"]) if parsed["unit"] else None)
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """清空某个位置的剂量，直到被 add 替换"""
+        self._set(herb_id, None)
+
+    def _set(self, herb_id: int, dose: Optional[Range]):
+        if herb_id == len(self._ranges):
+            self._ranges.append(dose)
+        else:
+            self._ranges[herb_id] = dose
+        self._trees = None
+
+    def _trees_by_unit(self) -> Dict[str, Tuple[IntervalTree, List[float], List[int]]]:
+        if self._trees is None:
+            grouped: Dict[str, List[Tuple[float, float, int]]] = {}
+            for herb_id, dose in enumerate(self._ranges):
+                if dose is not None:
+                    grouped.setdefault(dose[2], []).append((dose[0], dose[1], herb_id))
+            self._trees = {}
+            for unit, intervals in grouped.items():
+                by_high = sorted(intervals, key=lambda item: item[1])
+                self._trees[unit] = (IntervalTree(intervals),
+                                     [item[1] for item in by_high], [item[2] for item in by_high])
+        return self._trees
+
+    def query(self, low: float = None, high: float = None, max_dose: float = None,
+              unit: str = "g") -> List[int]:
+        """
+        返回满足条件的药材编号（升序）
+
+        low、high 给出时要求剂量范围与 [low, high] 相交（缺省一端不限），
+        max_dose 给出时要求最大剂量不超过 max_dose；条件同时满足。low 大于 high 时抛出ValueError。
+        """
+        check_range(low, high)
+        entry = self._trees_by_unit().get(unit)
+        if entry is None:
+            return []
+        tree, highs, ids = entry
+        result = None
+        if low is not None or high is not None:
+            result = set(tree.overlapping(float('-inf') if low is None else low,
+                                          float('inf') if high is None else high))
+        if max_dose is not None:
+            capped = ids[:bisect_right(highs, max_dose)]
+            result = set(capped) if result is None else result.intersection(capped)
+        if result is None:
+            result = ids
+        return sorted(result)
+
+    def describe(self, herb_id: int) -> Optional[Range]:
+        """某味药材的常规剂量 (最小值, 最大值, 单位)，无法识别时为None"""
+        return self._ranges[herb_id]
+
+
+def check_range(low: Optional[float], high: Optional[float]):
+    """检查剂量范围的下限不大于上限"""
+    if low is not None and high is not None and low > high:
+        raise ValueError(f"剂量范围的下限 {low} 大于上限 {high}")
+
+
+def dose_matches(dose: Optional[Range], low: float = None, high: float = None,
+                 max_dose: float = None, unit: str = "g") -> bool:
+    """判断剂量 (最小值, 最大值, 单位) 是否满足 DosageIndex.query 的条件，供全表扫描使用"""
+    if dose is None or dose[2] != unit:
+        return False
+    if low is not None and dose[1] < low:
+        return False
+    if high is not None and dose[0] > high:
+        return False
+    return max_dose is None or dose[1] <= max_dose
@@ -0,0 +1,118 @@
+"""
+流式导出模块
+
+直接从药材记录逐行或分批写出，不经过 DataFrame，内存占用与批大小而非数据总量相关。
+Parquet/Arrow 导出需要安装可选依赖 pyarrow。
+"""
+import json
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Union
+
+from .config import Config
+
+
+def herb_columns(herbs: Iterable[Dict[str, str]]) -> List[str]:
+    """所有药材字段的并集，按首次出现的顺序排列"""
+    columns = {}
+    for herb in herbs:
+        for key in herb.keys():
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def as_rows(herbs: Iterable[Mapping[str, str]]) -> List[Dict[str, str]]:
+    """
+    把药材转换为普通字典，供按列读取
+
+    压缩存储的药材（CompressedHerb）按列读取时每列都要解压一次，超出解压缓存后反复解压；
+    先逐行转换，每味药材只解压一次。普通字典原样返回
+    """
+    return [herb if isinstance(herb, dict) else dict(herb) for herb in herbs]
+
+
+def _batches(herbs: Iterable[Dict[str, str]], batch_size: int) -> Iterator[List[Dict[str, str]]]:
+    """把药材按 batch_size 分批"""
+    iterator = iter(herbs)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def write_jsonl(herbs: Iterable[Dict[str, str]], file_path: Union[str, Path], encoding: str = 'utf-8'):
+    """逐行写出JSON Lines文件，每行一味药材"""
+    with open(file_path, 'w', encoding=encoding) as f:
+        for herb in herbs:
+            f.write(json.dumps(dict(herb), ensure_ascii=False))
+            f.write('\n')
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("导出 Parquet/Arrow 格式需要安装 pyarrow: uv add pyarrow") from e
+    return pyarrow
+
+
+def _record_batches(herbs: List[Dict[str, str]], batch_size: int):
+    """把药材分批转换为 Arrow RecordBatch，低基数列使用字典编码"""
+    pa = _require_pyarrow()
+    columns = herb_columns(herbs)
+    fields = []
+    for column in columns:
+        if column in Config.DICTIONARY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    schema = pa.schema(fields)
+
+    # 字典编码列在各批之间共用一份只增不减的词表，后一批的字典是前一批的扩展，
+    # 这样 Arrow IPC 文件中只需写入字典增量
+    vocabularies = {field.name: {} for field in schema if pa.types.is_dictionary(field.type)}
+
+    def generate():
+        for batch in _batches(herbs, batch_size):
+            batch = as_rows(batch)
+            arrays = []
+            for field in schema:
+                values = [herb.get(field.name, "") for herb in batch]
+                vocabulary = vocabularies.get(field.name)
+                if vocabulary is None:
+                    arrays.append(pa.array(values, type=pa.string()))
+                    continue
+                indices = [vocabulary.setdefault(value, len(vocabulary)) for value in values]
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(indices, type=pa.int32()), pa.array(list(vocabulary), type=pa.string())))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    return schema, generate()
+
+
+def write_parquet(herbs: List[Dict[str, str]], file_path: Union[str, Path], batch_size: int = None):
+    """分批写出Parquet文件，每批作为一个行组"""
+    _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    schema, batches = _record_batches(herbs, batch_size or Config.EXPORT_BATCH_SIZE)
+    with pq.ParquetWriter(str(file_path), schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+def write_arrow(herbs: List[Dict[str, str]], file_path: Union[str, Path], batch_size: int = None):
+    """分批写出Arrow IPC（Feather V2）文件"""
+    pa = _require_pyarrow()
+
+    schema, batches = _record_batches(herbs, batch_size or Config.EXPORT_BATCH_SIZE)
+    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with pa.OSFile(str(file_path), 'wb') as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+
+
+# 导出格式 -> 导出函数
+WRITERS = {
+    "jsonl": write_jsonl,
+    "parquet": write_parquet,
+    "arrow": write_arrow,
+}
@@ -1,90 +1,556 @@
+import os
 import re
+import mmap
 import logging
-from typing import List, Dict, Optional
+from itertools import islice, repeat
+from pathlib import Path
+from typing import List, Dict, Optional, Iterator, Iterable, Tuple, Union, TextIO
 from .config import Config
+from .instrumentation import (ENTRIES_TOTAL, FILTERED_TOTAL, HERBS_TOTAL, STAGE_SECONDS, UNMATCHED_HEADERS_TOTAL,
+                              metrics)
+from .records import HerbRecord
 
 
 # 创建模块日志记录器
 logger = logging.getLogger(__name__)
 
+# 需要过滤掉的条目名前缀，如"附药"、"附方"等
+FILTERED_PREFIXES = ("附药", "附方", "附录")
+
+# 按 Markdown 教材解析的文件后缀
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+
+# 从 Markdown 教材解析时为每味药材标注的章节层级字段
+CATEGORY_FIELDS = ("chapter", "category", "subcategory")
+
+# Markdown 标题标记；OCR 偶尔把标题接在上一段句末，如 "……等作用。# 白茅根"
+_MD_HEADING = re.compile(r'^#+\s*')
+_MD_INLINE_HEADING = re.compile(r'(?<=。)#+\s+')
+# "第八章"、"第十章泻下药"、"第十六章 消食药" 等章标题，以及 "第一节 发散风寒药" 等节标题
+_CHAPTER_HEADING = re.compile(r'^(第[一二三四五六七八九十百零]+章)\s*(.*)$')
+_SECTION_HEADING = re.compile(r'^第[一二三四五六七八九十百零]+节\s*(.*)$')
+# 单独成行的药名标题，及以拼音开头、带出处的下一行标题
+_MD_NAME_LINE = re.compile(r'[\u4e00-\u9fa5 ]+')
+_MD_PINYIN_LINE = re.compile(r'[a-zA-ZāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜüÁÀÉÈÓÒ].*《')
+# OCR 损坏的拼音出处标题可能缺少《》，如 "Lionsing（名：别是"，只要求以拼音字母开头
+_MD_PINYIN_HEADING = re.compile(r'[a-zA-ZāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜüÁÀÉÈÓÒ]')
+# 不符合 PARSER_PATTERN 的药名标题（如 "檀香Lionsing（名：别是"），出处缺失时第 3 组为 None
+_MD_LOOSE_HEADER = re.compile(
+    r'[。$]\n([\u4e00-\u9fa5 ]+?)\s*([a-zA-ZāáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜüÁÀÉÈÓÒ]+)[^\n《]*(?:《([^》]+)》)?')
+
+
+def _utf8_alternation(chars: Iterable[str], extra: Iterable[bytes] = ()) -> bytes:
+    """
+    把字符集合转换为匹配其 UTF-8 编码的字节正则分组
+
+    extra 为放在分组最前面的其他字节正则分支，如 rb'[a-zA-Z]'
+    """
+    branches = list(extra) + [re.escape(ch.encode('utf-8')) for ch in chars]
+    return b"(?:" + b"|".join(branches) + b")"
+
+
+# 与 Config.PARSER_PATTERN 等价的 UTF-8 字节正则，用于在内存映射的原始字节上匹配表头
+# [\u4e00-\u9fa5 ] 按 UTF-8 编码拆成若干字节区间
+_CJK_BYTES = (rb'(?:\xe4[\xb8-\xbf][\x80-\xbf]|[\xe5-\xe8][\x80-\xbf][\x80-\xbf]'
+              rb'|\xe9[\x80-\xbd][\x80-\xbf]|\xe9\xbe[\x80-\xa5]| )')
+# str 正则中的 \s 匹配所有 Unicode 空白字符（均位于 U+3000 及以下）
+_SPACE_BYTES = _utf8_alternation(chr(c) for c in range(0x3001) if chr(c).isspace())
+_PINYIN_BYTES = _utf8_alternation("āáǎàēéěèīíǐìōóǒòūúǔùǖǘǚǜü", extra=(rb'[a-zA-Z]',))
+DEFAULT_BYTES_PATTERN = (
+    rb'(?:\xe3\x80\x82|\$)\n^(' + _CJK_BYTES + rb'+)' + _SPACE_BYTES + rb'*('
+    + _PINYIN_BYTES + rb'+).*\xe3\x80\x8a((?:(?!\xe3\x80\x8b)[\s\S])+)\xe3\x80\x8b'
+)
+
 
 class HerbParser:
     """
     中药信息解析器类
     """
 
-    def __init__(self, pattern: str = None):
+    def __init__(self, pattern: str = None, bytes_pattern: bytes = None):
         self.pattern = pattern or Config.PARSER_PATTERN
+        # 需要多行匹配
+        self.regex = re.compile(self.pattern, re.MULTILINE)
+        # 内存映射模式使用的字节正则，自定义 pattern 时需要同时提供对应的 bytes_pattern
+        if bytes_pattern is None and self.pattern == Config.PARSER_PATTERN:
+            bytes_pattern = DEFAULT_BYTES_PATTERN
+        self.bytes_regex = re.compile(bytes_pattern, re.MULTILINE) if bytes_pattern else None
 
     def extract_herb_info(self, text: str) -> List[Dict[str, str]]:
         """
         从txt文本中提取中药信息，使用提供的正则表达式
         """
         logger.info("开始提取中药信息")
+        herbs = self._extract_herbs(text)
+        logger.info(f"成功提取 {len(herbs)} 味中药信息")
+        return herbs
+
+    def _extract_herbs(self, text: str) -> List[Dict[str, str]]:
+        """
+        extract_herb_info 的具体实现，不输出日志，供并行解析的工作进程复用
+        """
+        with metrics.timer(STAGE_SECONDS, stage="match_headers"):
+            entries = list(self.iter_entries(text))
         herbs = []
+        with metrics.timer(STAGE_SECONDS, stage="extract_sections"):
+            for match, end_pos in entries:
+                herb = self.build_herb(match, text, end_pos)
+                if herb is not None:
+                    herbs.append(herb)
+        metrics.inc(ENTRIES_TOTAL, len(entries))
+        metrics.inc(HERBS_TOTAL, len(herbs))
+        return herbs
 
-        # 需要多行匹配
-        matches = list(re.finditer(self.pattern, text, re.MULTILINE))
+    def iter_entries(self, text: str, start: int = 0, end: int = None) -> Iterator[Tuple[re.Match, int]]:
+        """
+        遍历文本中的所有条目（含会被过滤的附药等），产出 (表头匹配项, 条目结束位置)
+
+        下一个条目表头的开始就是当前条目的结束，最后一个条目截止到文本末尾。
+        给出 start 和 end 时只遍历表头在 [start, end) 中的条目，最后一个条目截止到 end，
+        此时 end 应为某个条目表头的开始（或文本末尾）。
+        """
+        end = len(text) if end is None else end
+        matches = []
+        for match in self.regex.finditer(text, start):
+            if match.start() >= end:
+                break
+            matches.append(match)
         logger.debug(f"找到 {len(matches)} 个匹配项")
+        for i, match in enumerate(matches):
+            end_pos = matches[i + 1].start() if i < len(matches) - 1 else end
+            yield match, end_pos
 
-        # 创建一个列表，包含所有匹配的位置和信息
-        herb_positions = []
-        for match in matches:
-            name = match.group(1).strip()
-            pinyin = match.group(2).strip()
-            source = "《" + match.group(3).strip() + "》"  # 重新添加《》
-            herb_positions.append({
-                'start': match.start(),
-                'end': match.end(),
-                'name': name,
-                'pinyin': pinyin,
-                'source': source
-            })
-
-        # 遍历每个药材条目，提取完整内容
-        for i, herb_pos in enumerate(herb_positions):
-            # 确定当前条目的开始位置
-            # 找到当前匹配项后，实际药材条目是从匹配行的下一行开始的
-            start_pos = herb_pos['start']
-            # 向后查找，找到下一个换行符，然后是药材信息的开始
-            newline_pos = text.find('\n', start_pos)
-            if newline_pos != -1:
-                start_pos = newline_pos + 1
-
-            # 确定当前条目的结束位置
-            if i < len(herb_positions) - 1:
-                # 下一个药材条目的开始就是当前条目的结束
-                end_pos = herb_positions[i + 1]['start']
-            else:
-                # 如果是最后一个药材，结束位置是文本末尾
-                end_pos = len(text)
-
-            # 提取完整内容
-            herb_content = text[start_pos:end_pos]
-
-            # 提取各个部分
-            parts = {
-                "name": herb_pos['name'],
-                "pinyin": herb_pos['pinyin'],
-                "source": herb_pos['source'],
-                "properties": self.extract_section(herb_content, "【药性】"),
-                "efficacy": self.extract_section(herb_content, "【功效】"),
-                "application": self.extract_section(herb_content, "【应用】"),
-                "dosage": self.extract_section(herb_content, "【用法用量】"),
-                "precautions": self.extract_section(herb_content, "【使用注意】"),
-                "modern_research": self.extract_section(herb_content, "【现代研究】"),
-                "full_content": herb_content
-            }
-
-            # 过滤掉不需要的条目，如"附药"、"附方"等
-            if not (parts["name"].startswith("附药") or parts["name"].startswith("附方") or parts["name"].startswith("附录")):
-                herbs.append(parts)
-            else:
-                logger.debug(f"跳过过滤条目: {parts['name']}")
+    def extract_herb_info_parallel(self, text_or_paths: Union[str, Path, Iterable[Union[str, Path]]],
+                                   workers: int = None) -> List[Dict[str, str]]:
+        """
+        多进程并行提取中药信息
+
+        text_or_paths 为 str 时视为待解析的文本；为 Path 或路径列表时依次读取各个文件，
+        每个文件单独解析（与逐个文件调用 extract_herb_info 的结果相同）。
+        文本在药材表头行处切分成若干分片，由进程池并行解析后按原顺序合并，
+        结果与串行解析完全一致。
+        """
+        workers = workers or os.cpu_count() or 1
+
+        if isinstance(text_or_paths, str):
+            texts = [text_or_paths]
+        elif isinstance(text_or_paths, Path):
+            texts = [text_or_paths.read_text(encoding='utf-8')]
+        else:
+            texts = [Path(path).read_text(encoding='utf-8') for path in text_or_paths]
+
+        logger.info(f"开始并行提取中药信息，进程数: {workers}")
+        shards = []
+        for text in texts:
+            shards.extend(self.split_shards(text, workers * Config.PARALLEL_SHARDS_PER_WORKER))
+
+        # 分片太少时不值得启动进程池
+        if workers <= 1 or len(shards) <= 1:
+            herbs = [herb for shard in shards for herb in self._extract_herbs(shard)]
+        else:
+            # 进程池相关模块导入较慢，只在真正需要多进程时导入
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_extract_shard, repeat(self.pattern), shards)
+                herbs = [herb for shard_herbs in results for herb in shard_herbs]
+
+        logger.info(f"成功提取 {len(herbs)} 味中药信息")
+        return herbs
+
+    def split_shards(self, text: str, n_shards: int) -> List[str]:
+        """
+        在药材表头行处把文本切分为最多n_shards个分片
+
+        除第一个分片外，每个分片都从某个药材表头匹配项的起始位置开始，
+        因此各分片单独解析后依次拼接的结果与整体解析一致。
+        小于 Config.PARALLEL_MIN_SHARD_SIZE 的分片会与相邻分片合并。
+        """
+        step = max(len(text) // max(n_shards, 1), Config.PARALLEL_MIN_SHARD_SIZE)
+        boundaries = [0]
+        pos = step
+        while pos < len(text):
+            match = self.regex.search(text, pos)
+            if match is None:
+                break
+            boundaries.append(match.start())
+            pos = match.start() + step
+        boundaries.append(len(text))
+        return [text[start:end] for start, end in zip(boundaries, boundaries[1:])]
+
+    def iter_herbs(self, source: Union[str, Path, TextIO],
+                   chunk_size: int = None) -> Iterator[Dict[str, str]]:
+        """
+        流式解析药材文件，逐块读取并在每个条目结束位置确定后立即产出
+
+        source 可以是文件路径或已打开的文本文件对象。缓冲区只保留尚未结束的条目，
+        因此内存占用取决于最大的单个条目而不是文件大小。产出结果与
+        extract_herb_info 完全一致。
+        """
+        chunk_size = chunk_size or Config.STREAM_CHUNK_SIZE
+        if hasattr(source, 'read'):
+            yield from self._iter_herbs_from_stream(source, chunk_size)
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                yield from self._iter_herbs_from_stream(f, chunk_size)
+
+    def _iter_herbs_from_stream(self, stream: TextIO, chunk_size: int) -> Iterator[Dict[str, str]]:
+        """
+        iter_herbs 的具体实现
+        """
+        buffer = ""
+        eof = False
+        count = 0
+        entries = 0
+        while not eof:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+            # 只有表头所在行已经完整读入的匹配项才是确定的，
+            # 否则贪婪的 .* 在读入更多数据后可能得到不同的结果
+            with metrics.timer(STAGE_SECONDS, stage="match_headers"):
+                matches = []
+                for match in self.regex.finditer(buffer):
+                    if not eof and buffer.find('\n', match.end()) == -1:
+                        break
+                    matches.append(match)
+
+            if eof:
+                # 文件结束，最后一个药材的结束位置是文本末尾
+                matches.append(None)
+            if len(matches) < 2:
+                continue
+
+            # 先构造本块中已结束的全部条目再产出，使计时不包含调用方处理药材的时间
+            with metrics.timer(STAGE_SECONDS, stage="extract_sections"):
+                herbs = []
+                for match, next_match in zip(matches, matches[1:]):
+                    end_pos = next_match.start() if next_match is not None else len(buffer)
+                    herb = self.build_herb(match, buffer, end_pos)
+                    if herb is not None:
+                        herbs.append(herb)
+            entries += len(matches) - 1
+            count += len(herbs)
+            yield from herbs
+
+            # 丢弃已产出的条目，缓冲区从最后一个尚未结束的条目表头开始
+            if matches[-1] is not None:
+                buffer = buffer[matches[-1].start():]
+
+        metrics.inc(ENTRIES_TOTAL, entries)
+        metrics.inc(HERBS_TOTAL, count)
+        logger.debug(f"流式解析共产出 {count} 味中药信息")
+
+    def iter_herbs_mmap(self, file_path: Union[str, Path]) -> Iterator[Dict[str, str]]:
+        """
+        以内存映射方式解析药材文件
+
+        表头匹配直接在 mmap 的原始字节上进行，只有成为字段值的条目文本才会被解码，
+        不需要把整个文件解码为一个 str。多个进程解析同一文件时共享页缓存。
+        条目按约 Config.STREAM_CHUNK_SIZE 字节分批构造后产出，各阶段计时与 iter_herbs 一致。
+        产出结果与 extract_herb_info 完全一致。
+        """
+        if self.bytes_regex is None:
+            raise ValueError("自定义解析正则时需要提供对应的 bytes_pattern 才能使用内存映射模式")
+
+        with open(file_path, 'rb') as f:
+            # 空文件无法建立内存映射
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                with metrics.timer(STAGE_SECONDS, stage="match_headers"):
+                    matches = list(self.bytes_regex.finditer(buffer))
+                ends = [match.start() for match in matches[1:]] + [len(buffer)]
+                count = 0
+                i = 0
+                while i < len(matches):
+                    # 先构造本批的全部条目再产出，使计时不包含调用方处理药材的时间
+                    limit = matches[i].start() + Config.STREAM_CHUNK_SIZE
+                    with metrics.timer(STAGE_SECONDS, stage="extract_sections"):
+                        herbs = []
+                        while True:
+                            herb = self._build_herb_from_bytes(matches[i], buffer, ends[i])
+                            if herb is not None:
+                                herbs.append(herb)
+                            i += 1
+                            if i == len(matches) or matches[i].start() >= limit:
+                                break
+                    count += len(herbs)
+                    yield from herbs
+        metrics.inc(ENTRIES_TOTAL, len(ends))
+        metrics.inc(HERBS_TOTAL, count)
+
+    def extract_herb_info_mmap(self, file_path: Union[str, Path]) -> List[Dict[str, str]]:
+        """
+        以内存映射方式从文件中提取中药信息，见 iter_herbs_mmap
+        """
+        logger.info("开始提取中药信息（内存映射）")
+        herbs = list(self.iter_herbs_mmap(file_path))
+        logger.info(f"成功提取 {len(herbs)} 味中药信息")
+        return herbs
 
+    def _build_herb_from_bytes(self, match: re.Match, buffer: mmap.mmap, end_pos: int) -> Optional[Dict[str, str]]:
+        """
+        根据字节表头匹配项构造药材字典，只解码该条目的文本，被过滤的条目返回None
+        """
+        name = match.group(1).decode('utf-8').strip()
+        if self._is_filtered(name):
+            return None
+
+        newline_pos = buffer.find(b'\n', match.start())
+        start_pos = newline_pos + 1 if newline_pos != -1 else match.start()
+        herb_content = buffer[start_pos:end_pos].decode('utf-8')
+
+        sections = self.split_sections(herb_content)
+        parts = {
+            "name": name,
+            "pinyin": match.group(2).decode('utf-8').strip(),
+            "source": "《" + match.group(3).decode('utf-8').strip() + "》",  # 重新添加《》
+        }
+        for title, field in Config.SECTION_FIELDS.items():
+            parts[field] = sections.get(title, "")
+        parts["full_content"] = herb_content
+        return parts
+
+    def iter_markdown_lines(self, lines: Iterable[str]) -> Iterator[Tuple[str, bool]]:
+        """
+        把 Markdown 教材的各行规范化为与 herb.txt 相同的文本行，产出 (行, 是否为标题)
+
+        去掉标题标记和空行，拆开接在句末的标题，并把单独成行的药名标题与其后的
+        拼音出处行合并为一行（如 "麻黄" 和 "Máhuáng（《神农本草经》）"）；
+        以拼音开头的标题即使缺少出处也会合并。
+        """
+        pending: Optional[Tuple[str, bool]] = None
+        for raw in lines:
+            for i, part in enumerate(_MD_INLINE_HEADING.split(raw.rstrip('\r\n'))):
+                heading = i > 0 or _MD_HEADING.match(part) is not None
+                line = _MD_HEADING.sub('', part, count=1) if heading else part
+                if not line.strip():
+                    continue
+                # 拼音出处行在教材中不一定标记为标题
+                if (pending is not None and pending[1] and _MD_NAME_LINE.fullmatch(pending[0])
+                        and (_MD_PINYIN_LINE.match(line) or heading and _MD_PINYIN_HEADING.match(line))):
+                    pending = (pending[0] + line, True)
+                    continue
+                if pending is not None:
+                    yield pending
+                pending = (line, heading)
+        if pending is not None:
+            yield pending
+
+    def iter_herbs_markdown(self, source: Union[str, Path, TextIO]) -> Iterator[Dict[str, str]]:
+        """
+        流式解析 Markdown 教材（如 data/raw/herb.md），逐行读取并跟踪章节层级
+
+        每味药材除 extract_herb_info 的各字段外，还带有所在的 chapter（如 "第八章"）、
+        category（如 "解表药"）和 subcategory（如 "发散风寒药"，没有分节时为空字符串）。
+        各字段与对规范化后的文本（见 iter_markdown_lines）调用 extract_herb_info 的结果一致；
+        例外是表头因 OCR 错误不符合解析正则的药名标题（如 "檀香"），纯文本解析会把它并入
+        上一味药材，这里仍按标题拆成单独的条目，出处为空字符串，并记录警告和
+        UNMATCHED_HEADERS_TOTAL 计数。
+        """
+        if hasattr(source, 'read'):
+            yield from self._iter_herbs_from_markdown(source)
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                yield from self._iter_herbs_from_markdown(f)
+
+    def _iter_herbs_from_markdown(self, stream: TextIO) -> Iterator[Dict[str, str]]:
+        """
+        iter_herbs_markdown 的具体实现
+
+        条目表头要求上一行以"。"或"$"结尾，条目从表头到下一个表头之前；
+        与 extract_herb_info 一致，后面还有条目时不含本条目最后一行末尾的字符。
+        不符合解析正则的标题行再用 _MD_LOOSE_HEADER 匹配，避免两味药材合并为一条。
+        与 iter_herbs 一样按约 Config.STREAM_CHUNK_SIZE 个字符分块，分别记录匹配表头和
+        构造已结束条目的耗时。
+        """
+        context = dict.fromkeys(CATEGORY_FIELDS, "")
+        expect_category = False
+        previous = ""
+        # 当前条目：(表头前一行的末字符, 条目各行, 表头处的章节层级, 匹配表头的正则)
+        entry: Optional[Tuple[str, List[str], Dict[str, str], re.Pattern]] = None
+        entries = count = 0
+
+        def finish(entry, last: bool) -> Optional[Dict[str, str]]:
+            prefix, entry_lines, tags, regex = entry
+            segment = prefix + "\n" + "\n".join(entry_lines) + "\n"
+            match = regex.match(segment)
+            herb = self.build_herb(match, segment, len(segment) if last else len(segment) - 2)
+            if herb is not None:
+                herb.update(tags)
+            return herb
+
+        for chunk in _line_chunks(self.iter_markdown_lines(stream), Config.STREAM_CHUNK_SIZE):
+            finished = []
+            with metrics.timer(STAGE_SECONDS, stage="match_headers"):
+                for line, heading in chunk:
+                    if heading:
+                        chapter = _CHAPTER_HEADING.match(line)
+                        section = _SECTION_HEADING.match(line)
+                        if chapter:
+                            context = {"chapter": chapter.group(1), "category": chapter.group(2).strip(),
+                                       "subcategory": ""}
+                            # 类别名称可能与章标题同行，也可能是下一个标题
+                            expect_category = not context["category"]
+                        elif section:
+                            context = dict(context, subcategory=section.group(1).strip())
+                            expect_category = False
+                        elif expect_category:
+                            context = dict(context, category=line.strip())
+                            expect_category = False
+
+                    regex = None
+                    if previous[-1:] in ("。", "$"):
+                        header = previous[-1] + "\n" + line
+                        if self.regex.match(header):
+                            regex = self.regex
+                        elif heading and _MD_LOOSE_HEADER.match(header):
+                            logger.warning(f"表头不符合解析正则，按标题拆分为单独的条目: {line}")
+                            metrics.inc(UNMATCHED_HEADERS_TOTAL)
+                            regex = _MD_LOOSE_HEADER
+                    if regex is not None:
+                        if entry is not None:
+                            finished.append(entry)
+                        entries += 1
+                        entry = (previous[-1], [line], context, regex)
+                    elif entry is not None:
+                        entry[1].append(line)
+                    previous = line
+
+            if not finished:
+                continue
+            # 先构造本块中已结束的全部条目再产出，使计时不包含调用方处理药材的时间
+            with metrics.timer(STAGE_SECONDS, stage="extract_sections"):
+                herbs = [herb for herb in (finish(done, last=False) for done in finished) if herb is not None]
+            count += len(herbs)
+            yield from herbs
+
+        if entry is not None:
+            with metrics.timer(STAGE_SECONDS, stage="extract_sections"):
+                herb = finish(entry, last=True)
+            if herb is not None:
+                count += 1
+                yield herb
+        metrics.inc(ENTRIES_TOTAL, entries)
+        metrics.inc(HERBS_TOTAL, count)
+
+    def extract_herb_info_markdown(self, file_path: Union[str, Path]) -> List[Dict[str, str]]:
+        """
+        从 Markdown 教材中提取带章节层级的中药信息，见 iter_herbs_markdown
+        """
+        logger.info("开始提取中药信息（Markdown）")
+        herbs = list(self.iter_herbs_markdown(file_path))
         logger.info(f"成功提取 {len(herbs)} 味中药信息")
         return herbs
 
+    def extract_herb_records(self, text: str) -> List[HerbRecord]:
+        """
+        从txt文本中提取紧凑的药材记录
+
+        结果与 extract_herb_info 的内容相同，但各章节和 full_content 只保存
+        指向 text 的偏移量，所有记录共享同一份文本。
+        """
+        logger.info("开始提取中药信息（紧凑记录）")
+        records = []
+        for match, end_pos in self.iter_entries(text):
+            name = match.group(1).strip()
+            if self._is_filtered(name):
+                continue
+
+            start_pos = self._content_start(match, text)
+            sections = self.section_spans(text, start_pos, end_pos)
+            spans = {field: sections[title] for title, field in Config.SECTION_FIELDS.items()
+                     if title in sections}
+            spans["full_content"] = (start_pos, end_pos)
+            records.append(HerbRecord(name, match.group(2).strip(),
+                                      "《" + match.group(3).strip() + "》", text, spans))
+
+        logger.info(f"成功提取 {len(records)} 味中药信息")
+        return records
+
+    def _is_filtered(self, name: str) -> bool:
+        """
+        是否为需要过滤掉的条目，如"附药"、"附方"等
+        """
+        if name.startswith(FILTERED_PREFIXES):
+            logger.debug(f"跳过过滤条目: {name}")
+            metrics.inc(FILTERED_TOTAL, prefix=name[:2])
+            return True
+        return False
+
+    def _content_start(self, match: re.Match, text: str) -> int:
+        """
+        实际药材条目是从匹配项中第一个换行符的下一行开始的
+        """
+        newline_pos = text.find('\n', match.start())
+        return newline_pos + 1 if newline_pos != -1 else match.start()
+
+    def build_herb(self, match: re.Match, text: str, end_pos: int) -> Optional[Dict[str, str]]:
+        """
+        根据表头匹配项和条目结束位置构造药材字典，被过滤的条目返回None
+        """
+        name = match.group(1).strip()
+        if self._is_filtered(name):
+            return None
+
+        # 提取完整内容
+        herb_content = text[self._content_start(match, text):end_pos]
+
+        # 一次扫描切分出全部章节，再映射到各个字段
+        sections = self.split_sections(herb_content)
+        source = match.group(3)
+        parts = {
+            "name": name,
+            "pinyin": match.group(2).strip(),
+            "source": "《" + source.strip() + "》" if source else "",  # 重新添加《》
+        }
+        for title, field in Config.SECTION_FIELDS.items():
+            parts[field] = sections.get(title, "")
+        parts["full_content"] = herb_content
+        return parts
+
+    def split_sections(self, content: str) -> Dict[str, str]:
+        """
+        一次线性扫描切分出所有【…】章节，返回 标题 -> 内容 的字典
+
+        每个章节的内容截止到下一个"【"，与 extract_section 的结果一致；
+        同一标题出现多次时保留第一次出现的内容。
+        """
+        sections = {}
+        # 第一段位于首个"【"之前，不属于任何章节
+        for piece in content.split('【')[1:]:
+            title, sep, body = piece.partition('】')
+            if sep and title not in sections:
+                sections[title] = body.strip()
+        return sections
+
+    def section_spans(self, text: str, start: int = 0, end: int = None) -> Dict[str, Tuple[int, int]]:
+        """
+        与 split_sections 相同地切分 text[start:end] 中的章节，但不复制文本，
+        返回 标题 -> (起点, 终点) 的字典，偏移量相对于整个 text
+        """
+        end = len(text) if end is None else end
+        spans = {}
+        pos = text.find('【', start, end)
+        while pos != -1:
+            next_pos = text.find('【', pos + 1, end)
+            stop = end if next_pos == -1 else next_pos
+            close = text.find('】', pos + 1, stop)
+            if close != -1:
+                title = text[pos + 1:close]
+                if title not in spans:
+                    # 与 str.strip() 一致地去掉首尾空白
+                    body_start, body_end = close + 1, stop
+                    while body_start < body_end and text[body_start].isspace():
+                        body_start += 1
+                    while body_end > body_start and text[body_end - 1].isspace():
+                        body_end -= 1
+                    spans[title] = (body_start, body_end)
+            pos = next_pos
+        return spans
+
     def extract_section(self, content: str, section_title: str) -> str:
         """
         提取指定标题下的内容
@@ -99,11 +565,32 @@ class HerbParser:
         """
         从文件中提取前n味药材的完整信息
         """
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        herbs = self.extract_herb_info(content)
-        return herbs[:n]
+        # 读取到第n味药材后立即停止，不再读取文件剩余部分
+        herbs = self.iter_herbs(file_path)
+        try:
+            return list(islice(herbs, n))
+        finally:
+            herbs.close()
+
+
+def _line_chunks(lines: Iterable[Tuple[str, bool]], chunk_size: int) -> Iterator[List[Tuple[str, bool]]]:
+    """把 iter_markdown_lines 产出的行按约 chunk_size 个字符分块"""
+    chunk, size = [], 0
+    for item in lines:
+        chunk.append(item)
+        size += len(item[0]) + 1
+        if size >= chunk_size:
+            yield chunk
+            chunk, size = [], 0
+    if chunk:
+        yield chunk
+
+
+def _extract_shard(pattern: str, shard: str) -> List[Dict[str, str]]:
+    """
+    并行解析的工作进程入口，解析单个文本分片
+    """
+    return HerbParser(pattern)._extract_herbs(shard)
 
 
 class HerbDatabase:
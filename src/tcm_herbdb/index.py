@@ -0,0 +1,340 @@
+"""
+药材索引模块
+"""
+import unicodedata
+from bisect import insort
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import Config
+
+
+def strip_tones(pinyin: str) -> str:
+    """
+    去掉拼音的声调、空格和隔音符并转为小写，如 "Máhuáng" -> "mahuang"
+    """
+    decomposed = unicodedata.normalize('NFD', pinyin.lower())
+    return "".join(ch for ch in decomposed
+                   if not unicodedata.combining(ch) and ch not in " '’-")
+
+
+def is_cjk(text: str) -> bool:
+    """文本中是否含有汉字"""
+    return any('一' <= char <= '鿿' or '㐀' <= char <= '䶿' for char in text)
+
+
+class HashIndex:
+    """
+    字段值哈希索引，记录 字段值 -> 药材编号列表，用于O(1)的精确查找
+
+    normalize 用于在建索引和查询时统一规范化字段值，如去掉拼音声调。
+    """
+
+    def __init__(self, field: str, normalize: Callable[[str], str] = None):
+        self.field = field
+        self.normalize = normalize
+        self.entries: Dict[str, List[int]] = {}
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材加入索引，herb_id 为其在数据库列表中的位置"""
+        key = self._key(herb.get(self.field) or "")
+        insort(self.entries.setdefault(key, []), herb_id)
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材从索引中移除，herb 须与加入时的内容相同"""
+        key = self._key(herb.get(self.field) or "")
+        ids = self.entries.get(key)
+        if ids and herb_id in ids:
+            ids.remove(herb_id)
+            if not ids:
+                del self.entries[key]
+
+    def get(self, value: str) -> List[int]:
+        """返回字段值等于value（规范化后）的药材编号"""
+        return self.entries.get(self._key(value), [])
+
+    def _key(self, value: str) -> str:
+        return self.normalize(value) if self.normalize else value
+
+
+class CategoryIndex:
+    """
+    章节层级索引，记录 章/类别/节名称 -> 药材编号列表
+
+    同一名称在任一层级出现均可查到，如 "第八章"、"解表药" 和 "发散风寒药"；
+    同时按出现顺序记录各类别下的节，用于按类别浏览。
+    """
+
+    def __init__(self, fields: Iterable[str] = ("chapter", "category", "subcategory")):
+        self.fields = tuple(fields)
+        self.entries: Dict[str, List[int]] = {}
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材加入索引，没有章节层级的药材不加入"""
+        for key in self._keys(herb):
+            insort(self.entries.setdefault(key, []), herb_id)
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材从索引中移除，herb 须与加入时的内容相同"""
+        for key in self._keys(herb):
+            ids = self.entries.get(key)
+            if ids and herb_id in ids:
+                ids.remove(herb_id)
+                if not ids:
+                    del self.entries[key]
+
+    def get(self, name: str) -> List[int]:
+        """返回属于该章、类别或节的药材编号"""
+        return self.entries.get(name, [])
+
+    def _keys(self, herb: Dict[str, str]) -> Set[str]:
+        return {herb.get(field) for field in self.fields} - {None, ""}
+
+
+class NgramIndex:
+    """
+    字符 n-gram 倒排索引
+
+    对每个字段记录 n-gram -> 药材编号集合 的倒排表（同时记录单字，以支持单字查询）。
+    查询时对子串的各个 n-gram 倒排表求交集得到候选集合，再由调用方做子串校验，
+    因此结果与逐条做 in 判断完全一致。
+    """
+
+    def __init__(self, fields: Iterable[str], n: int = 2):
+        self.n = n
+        self.postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in fields}
+        self.size = 0
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材加入索引，herb_id 为其在数据库列表中的位置"""
+        for field, postings in self.postings.items():
+            text = herb.get(field) or ""
+            for gram in self._grams(text):
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = {herb_id}
+                else:
+                    posting.add(herb_id)
+        self.size = max(self.size, herb_id + 1)
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材从索引中移除，herb 须与加入时的内容相同"""
+        for field, postings in self.postings.items():
+            text = herb.get(field) or ""
+            for gram in self._grams(text):
+                posting = postings.get(gram)
+                if posting is not None:
+                    posting.discard(herb_id)
+                    if not posting:
+                        del postings[gram]
+
+    def candidates(self, field: str, query: str) -> Optional[List[int]]:
+        """
+        返回可能包含 query 的药材编号（升序）
+
+        字段未建索引时返回None，调用方应回退到全表扫描。
+        """
+        postings = self.postings.get(field)
+        if postings is None:
+            return None
+        if not query:
+            # 空串是任何字符串的子串
+            return list(range(self.size))
+
+        grams = self._query_grams(query)
+        lists = []
+        for gram in grams:
+            posting = postings.get(gram)
+            if not posting:
+                return []
+            lists.append(posting)
+        lists.sort(key=len)
+        return sorted(lists[0].intersection(*lists[1:]))
+
+    def _grams(self, text: str) -> Set[str]:
+        """文本中出现的所有单字和 n-gram"""
+        grams = set(text)
+        for i in range(len(text) - self.n + 1):
+            grams.add(text[i:i + self.n])
+        return grams
+
+    def _query_grams(self, query: str) -> Set[str]:
+        """查询子串需要命中的 n-gram，长度不足n时退化为单字"""
+        if len(query) < self.n:
+            return set(query)
+        return {query[i:i + self.n] for i in range(len(query) - self.n + 1)}
+
+
+def levenshtein(a: str, b: str, max_distance: int = None) -> int:
+    """
+    两个字符串的编辑距离（插入、删除、替换各计1）
+
+    给出 max_distance 时，距离超过该值一律返回 max_distance + 1
+    """
+    if max_distance is not None and abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    distance = _bit_parallel_distance(_pattern_bits(b), a)
+    if max_distance is not None and distance > max_distance:
+        return max_distance + 1
+    return distance
+
+
+def _pattern_bits(pattern: str) -> Tuple[Dict[str, int], int]:
+    """模式串中每个字符出现位置的位向量，以及模式串长度"""
+    positions: Dict[str, int] = {}
+    for i, char in enumerate(pattern):
+        positions[char] = positions.get(char, 0) | 1 << i
+    return positions, len(pattern)
+
+
+def _bit_parallel_distance(bits: Tuple[Dict[str, int], int], text: str) -> int:
+    """
+    Myers/Hyyrö 位并行算法计算编辑距离
+
+    动态规划矩阵的一整列以整数的各个二进制位表示，每个文本字符只需常数次位运算
+    """
+    positions, m = bits
+    if m == 0:
+        return len(text)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    plus, minus, distance = mask, 0, m
+    for char in text:
+        eq = positions.get(char, 0)
+        xv = eq | minus
+        xh = (((eq & plus) + plus) ^ plus) | eq
+        horizontal_plus = minus | (~(xh | plus) & mask)
+        horizontal_minus = plus & xh
+        if horizontal_plus & last:
+            distance += 1
+        elif horizontal_minus & last:
+            distance -= 1
+        horizontal_plus = ((horizontal_plus << 1) | 1) & mask
+        horizontal_minus = (horizontal_minus << 1) & mask
+        plus = horizontal_minus | (~(xv | horizontal_plus) & mask)
+        minus = horizontal_plus & xv
+    return distance
+
+
+def fuzzy_distance(query: str, max_distance: int = None) -> int:
+    """
+    模糊查找允许的编辑距离
+
+    未给出 max_distance 时按查询长度确定（每3个字允许1处错误，至少1处），
+    且不超过 Config.FUZZY_MAX_DISTANCE，避免很短的查询匹配到几乎所有药材
+    """
+    if max_distance is not None:
+        return max_distance
+    return min(Config.FUZZY_MAX_DISTANCE, max(1, len(query) // 3))
+
+
+class QGramIndex:
+    """
+    q-gram 近似匹配索引
+
+    与查询串编辑距离不超过d的字符串，与查询串至少共有 (len(query) - q + 1) - q*d 个 q-gram，
+    长度相差也不超过d。先用 q-gram 倒排表计数筛出满足这两个条件的候选，
+    再逐个计算编辑距离校验，结果与对所有字符串计算编辑距离一致。
+    """
+
+    def __init__(self, q: int = 2):
+        self.q = q
+        # 规范化后的字符串 -> 药材编号集合
+        self.keys: Dict[str, Set[int]] = {}
+        # 字符串长度 -> 该长度的字符串集合
+        self.lengths: Dict[int, Set[str]] = {}
+        # q-gram -> {字符串: 该 q-gram 在字符串中出现的次数}
+        self.postings: Dict[str, Dict[str, int]] = {}
+
+    def add(self, key: str, herb_id: int):
+        """加入一个字符串及对应的药材编号"""
+        ids = self.keys.get(key)
+        if ids is None:
+            self.keys[key] = {herb_id}
+            self.lengths.setdefault(len(key), set()).add(key)
+            for gram, count in self._grams(key).items():
+                self.postings.setdefault(gram, {})[key] = count
+        else:
+            ids.add(herb_id)
+
+    def remove(self, key: str, herb_id: int):
+        """移除字符串对应的药材编号"""
+        ids = self.keys.get(key)
+        if ids is None:
+            return
+        ids.discard(herb_id)
+        if not ids:
+            del self.keys[key]
+            self.lengths[len(key)].discard(key)
+            for gram in self._grams(key):
+                posting = self.postings[gram]
+                del posting[key]
+                if not posting:
+                    del self.postings[gram]
+
+    def search(self, query: str, max_distance: int) -> List[Tuple[int, str, Set[int]]]:
+        """返回距离不超过 max_distance 的 (距离, 字符串, 药材编号集合)，按距离升序"""
+        shared: Dict[str, int] = {}
+        for gram, count in self._grams(query).items():
+            for key, key_count in self.postings.get(gram, {}).items():
+                shared[key] = shared.get(key, 0) + min(count, key_count)
+
+        candidates = []
+        for length in range(max(0, len(query) - max_distance), len(query) + max_distance + 1):
+            # 较长的一方决定至少需要共有的 q-gram 数
+            threshold = (max(length, len(query)) - self.q + 1) - self.q * max_distance
+            if threshold <= 0:
+                candidates.extend(self.lengths.get(length, ()))
+            else:
+                candidates.extend(key for key in self.lengths.get(length, ())
+                                  if shared.get(key, 0) >= threshold)
+
+        bits = _pattern_bits(query)
+        results = []
+        for key in candidates:
+            distance = _bit_parallel_distance(bits, key)
+            if distance <= max_distance:
+                results.append((distance, key, self.keys[key]))
+        results.sort(key=lambda result: result[0])
+        return results
+
+    def _grams(self, text: str) -> Dict[str, int]:
+        grams: Dict[str, int] = {}
+        for i in range(len(text) - self.q + 1):
+            gram = text[i:i + self.q]
+            grams[gram] = grams.get(gram, 0) + 1
+        return grams
+
+
+class FuzzyIndex:
+    """
+    名称和拼音的模糊查找索引
+
+    名称按单字、去掉声调的拼音按双字母各建一个 q-gram 索引。中文查询在名称中查找，
+    其他查询去掉声调、空格后在拼音中查找，如 "ma huang"、"mahaung" 都能找到麻黄。
+    """
+
+    def __init__(self):
+        self.names = QGramIndex(q=1)
+        self.pinyins = QGramIndex(q=2)
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材加入索引"""
+        self.names.add(herb.get('name') or "", herb_id)
+        self.pinyins.add(strip_tones(herb.get('pinyin') or ""), herb_id)
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """把一味药材从索引中移除，herb 须与加入时的内容相同"""
+        self.names.remove(herb.get('name') or "", herb_id)
+        self.pinyins.remove(strip_tones(herb.get('pinyin') or ""), herb_id)
+
+    def search(self, query: str, k: int, max_distance: int = None) -> List[Tuple[int, int]]:
+        """
+        返回最多k个 (药材编号, 编辑距离)，按距离、编号升序
+
+        max_distance 为None时按查询长度确定，见 fuzzy_distance
+        """
+        index, key = (self.names, query) if is_cjk(query) else (self.pinyins, strip_tones(query))
+        matches = sorted((distance, herb_id)
+                         for distance, _, ids in index.search(key, fuzzy_distance(key, max_distance))
+                         for herb_id in ids)
+        return [(herb_id, distance) for distance, herb_id in matches[:k]]
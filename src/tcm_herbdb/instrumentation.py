@@ -0,0 +1,270 @@
+"""
+运行指标模块
+
+记录解析、建立索引、导出各阶段的耗时和条目计数，以及每个查询方法的延迟分布，
+可以输出 Prometheus 文本格式或按阶段汇总的耗时表。默认关闭，关闭时每个埋点只检查一次开关，
+几乎没有额外开销；通过环境变量 TCM_HERBDB_METRICS=1、metrics.enable() 或命令行 --profile 开启。
+
+    from tcm_herbdb import metrics
+    metrics.enable()
+    db = HerbDatabase.from_txt_file("data/processed/herb.txt", cache=False)
+    db.get_herbs_by_efficacy("解表")
+    print(metrics.report())
+    print(metrics.to_prometheus())
+"""
+import contextlib
+import functools
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import Config
+
+
+# 指标名称
+STAGE_SECONDS = "tcm_herbdb_stage_seconds"
+QUERY_SECONDS = "tcm_herbdb_query_seconds"
+ENTRIES_TOTAL = "tcm_herbdb_parsed_entries_total"
+HERBS_TOTAL = "tcm_herbdb_parsed_herbs_total"
+FILTERED_TOTAL = "tcm_herbdb_filtered_entries_total"
+UNMATCHED_HEADERS_TOTAL = "tcm_herbdb_unmatched_headers_total"
+
+# 内置指标的说明，输出 Prometheus 格式时作为 HELP 行
+HELP = {
+    STAGE_SECONDS: "各处理阶段的耗时（秒）",
+    QUERY_SECONDS: "各查询方法的延迟（秒），含命中查询缓存的调用",
+    ENTRIES_TOTAL: "解析到的条目数（含被过滤的附药等）",
+    HERBS_TOTAL: "解析得到的药材数",
+    FILTERED_TOTAL: "按名称前缀过滤掉的条目数",
+    UNMATCHED_HEADERS_TOTAL: "表头不符合解析正则、按 Markdown 标题拆分出的条目数",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# 收集器在导出时被调用，返回 (指标名, 标签, 取值) 形式的瞬时值
+Collector = Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]
+
+
+class Histogram:
+    """
+    固定桶边界的直方图，记录落入各桶的次数、总和、次数和最大值
+    """
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        # 最后一个桶对应 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+
+class _Timer:
+    """记录 with 代码块耗时的上下文管理器，代码块抛出异常时同样记录"""
+
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+# 关闭时 timer 返回的空上下文管理器，不计时
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class MetricsRegistry:
+    """
+    计数器和直方图的注册表
+
+    指标按 (名称, 标签) 区分，首次记录时自动创建。除内置指标外，可以用 register_collector
+    注册收集器，在导出时提供额外的瞬时值（如查询缓存大小），以 gauge 类型输出。
+    """
+
+    def __init__(self, enabled: bool = False, buckets: Iterable[float] = None):
+        self.enabled = enabled
+        self.buckets = tuple(buckets or Config.METRICS_BUCKETS)
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._help: Dict[str, str] = dict(HELP)
+        self._collectors: List[Collector] = []
+
+    def enable(self):
+        """开始记录指标"""
+        self.enabled = True
+
+    def disable(self):
+        """停止记录指标，已记录的数据保留"""
+        self.enabled = False
+
+    def reset(self):
+        """清空已记录的计数器和直方图，保留收集器"""
+        self._counters.clear()
+        self._histograms.clear()
+
+    def describe(self, name: str, help_text: str):
+        """设置指标说明"""
+        self._help[name] = help_text
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        """计数器加 amount"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        """向直方图记录一个取值"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def timer(self, name: str, **labels: str):
+        """
+        记录 with 代码块耗时的上下文管理器，如 with metrics.timer(STAGE_SECONDS, stage="csv_write")
+
+        关闭时返回不计时的空上下文管理器
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str, **labels: str) -> Callable:
+        """记录函数每次调用耗时的装饰器，是否计时在调用时判断"""
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, name, labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def register_collector(self, collector: Collector) -> Collector:
+        """注册收集器，返回 collector 本身，因此也可以用作装饰器"""
+        self._collectors.append(collector)
+        return collector
+
+    def unregister_collector(self, collector: Collector):
+        """移除已注册的收集器"""
+        self._collectors.remove(collector)
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        """计数器的当前值，未记录过时为0"""
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """直方图，未记录过时为None"""
+        return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def _collect(self) -> Dict[str, List[Tuple[Labels, float]]]:
+        gauges: Dict[str, List[Tuple[Labels, float]]] = {}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                gauges.setdefault(name, []).append((tuple(sorted(labels.items())), value))
+        return gauges
+
+    def to_prometheus(self) -> str:
+        """以 Prometheus 文本格式（0.0.4）输出全部指标"""
+        lines = []
+
+        def header(name: str, kind: str):
+            if name in self._help:
+                lines.append(f"# HELP {name} {_escape_help(self._help[name])}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for name, samples in _group(self._counters.items()).items():
+            header(name, "counter")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for name, samples in _group(self._histograms.items()).items():
+            header(name, "histogram")
+            for labels, histogram in samples:
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = labels + (("le", _format_value(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        for name, samples in self._collect().items():
+            header(name, "gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def report(self) -> str:
+        """按阶段和查询方法汇总的耗时表，供 --profile 输出"""
+        lines = []
+        for name, samples in _group(self._histograms.items()).items():
+            lines.append(self._help.get(name, name))
+            lines.append(f"  {'':<28}{'次数':>8}{'总耗时(ms)':>14}{'平均(ms)':>12}{'最大(ms)':>12}")
+            for labels, histogram in samples:
+                label = ",".join(value for _, value in labels) or name
+                lines.append(f"  {label:<28}{histogram.count:>10}{histogram.sum * 1000:>16.3f}"
+                             f"{histogram.sum / histogram.count * 1000:>14.3f}{histogram.max * 1000:>14.3f}")
+        counters = _group(self._counters.items())
+        if counters:
+            lines.append("计数")
+            for name, samples in counters.items():
+                for labels, value in samples:
+                    lines.append(f"  {name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+def _group(items) -> Dict[str, list]:
+    """把 ((名称, 标签), 取值) 按名称分组，组内按标签排序"""
+    groups: Dict[str, list] = {}
+    for (name, labels), value in sorted(items, key=lambda item: item[0]):
+        groups.setdefault(name, []).append((labels, value))
+    return groups
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{key}="{_escape_label(value)}"' for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# 全局默认注册表，各模块的埋点都记录到这里
+metrics = MetricsRegistry(enabled=Config.METRICS_ENABLED)
@@ -0,0 +1,164 @@
+"""
+药性结构化解析模块
+
+把【药性】文本（如 "辛、微苦，温。归肺、膀胱经。"）拆分为五味、四气和归经，
+并以位掩码形式保存，支持对整个数据库做向量化的多条件筛选。
+"""
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, List, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# 五味（含淡、涩），位置即位掩码中的位序号
+FLAVORS = ("辛", "甘", "酸", "苦", "咸", "淡", "涩")
+
+# 四气及其程度修饰，位置即编码值
+NATURES = ("大寒", "寒", "微寒", "凉", "平", "微温", "温", "热", "大热")
+
+# 归经，位置即位掩码中的位序号
+MERIDIANS = ("肺", "大肠", "胃", "脾", "心", "小肠", "膀胱", "肾", "心包", "三焦", "胆", "肝")
+
+# 无法识别四气时的编码值
+UNKNOWN_NATURE = -1
+
+_MERIDIAN_PATTERN = re.compile(r'归(.+?)经')
+_TOXICITY_PATTERN = re.compile(r'[有无][大小]?毒')
+_TOKEN_SEPARATORS = re.compile(r'[、，,；;。\s]+')
+
+
+def parse_properties(text: str) -> Dict[str, object]:
+    """
+    解析药性文本，返回 flavors（五味列表）、nature（四气，含微/大修饰，无法识别时为空串）
+    和 meridians（归经列表）
+
+    五味的"微"修饰会被忽略，如"微苦"记为"苦"。
+    """
+    meridians = []
+    match = _MERIDIAN_PATTERN.search(text)
+    if match:
+        for token in _TOKEN_SEPARATORS.split(match.group(1)):
+            if token in MERIDIANS and token not in meridians:
+                meridians.append(token)
+        text = text[:match.start()]
+
+    flavors = []
+    nature = ""
+    for token in _TOKEN_SEPARATORS.split(_TOXICITY_PATTERN.sub("", text)):
+        if token in NATURES:
+            nature = nature or token
+            continue
+        flavor = token.removeprefix("微")
+        if flavor in FLAVORS and flavor not in flavors:
+            flavors.append(flavor)
+
+    return {"flavors": flavors, "nature": nature, "meridians": meridians}
+
+
+def to_mask(values: Iterable[str], vocabulary: tuple) -> int:
+    """把取值集合编码为位掩码，遇到未知取值时抛出ValueError"""
+    mask = 0
+    for value in values:
+        if value not in vocabulary:
+            raise ValueError(f"未知的取值: {value}，可选值为 {'、'.join(vocabulary)}")
+        mask |= 1 << vocabulary.index(value)
+    return mask
+
+
+def from_mask(mask: int, vocabulary: tuple) -> List[str]:
+    """把位掩码解码为取值列表"""
+    return [value for bit, value in enumerate(vocabulary) if mask >> bit & 1]
+
+
+class PropertyIndex:
+    """
+    药性位掩码索引
+
+    每味药材对应一个五味位掩码、一个四气编码和一个归经位掩码，
+    以 NumPy 数组保存，多条件筛选是对整列的位运算。
+    """
+
+    def __init__(self):
+        self._flavors: List[int] = []
+        self._natures: List[int] = []
+        self._meridians: List[int] = []
+        self._arrays = None
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """
+        把一味药材加入索引
+
+        herb_id 等于当前药材数时追加，小于当前药材数时替换该位置（用于增量更新）
+        """
+        parsed = parse_properties(herb.get('properties') or "")
+        self._set(herb_id,
+                  to_mask(parsed["flavors"], FLAVORS),
+                  NATURES.index(parsed["nature"]) if parsed["nature"] else UNKNOWN_NATURE,
+                  to_mask(parsed["meridians"], MERIDIANS))
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """清空某个位置的药性，使其不再匹配任何条件，直到被 add 替换"""
+        self._set(herb_id, 0, UNKNOWN_NATURE, 0)
+
+    def _set(self, herb_id: int, flavors: int, nature: int, meridians: int):
+        if herb_id == len(self._natures):
+            self._flavors.append(flavors)
+            self._natures.append(nature)
+            self._meridians.append(meridians)
+        else:
+            self._flavors[herb_id] = flavors
+            self._natures[herb_id] = nature
+            self._meridians[herb_id] = meridians
+        # 数组在下次查询时重新生成
+        self._arrays = None
+
+    @property
+    def arrays(self) -> Dict[str, "np.ndarray"]:
+        """flavors、natures、meridians 三列的 NumPy 数组"""
+        if self._arrays is None:
+            # NumPy 导入较慢，第一次查询时才导入
+            import numpy as np
+            self._arrays = {
+                "flavors": np.array(self._flavors, dtype=np.uint8),
+                "natures": np.array(self._natures, dtype=np.int8),
+                "meridians": np.array(self._meridians, dtype=np.uint16),
+            }
+        return self._arrays
+
+    def query(self, flavors: Iterable[str] = None,
+              natures: Union[str, Iterable[str]] = None,
+              meridians: Iterable[str] = None) -> "np.ndarray":
+        """
+        返回满足条件的药材编号（升序）
+
+        flavors 和 meridians 要求药材包含全部给定取值，natures 要求四气等于其中之一；
+        为None的条件不参与筛选。
+        """
+        import numpy as np
+
+        arrays = self.arrays
+        selected = np.ones(len(arrays["natures"]), dtype=bool)
+        if flavors:
+            required = to_mask(flavors, FLAVORS)
+            selected &= (arrays["flavors"] & required) == required
+        if natures:
+            natures = [natures] if isinstance(natures, str) else list(natures)
+            for nature in natures:
+                if nature not in NATURES:
+                    raise ValueError(f"未知的取值: {nature}，可选值为 {'、'.join(NATURES)}")
+            codes = [NATURES.index(nature) for nature in natures]
+            selected &= np.isin(arrays["natures"], codes)
+        if meridians:
+            required = to_mask(meridians, MERIDIANS)
+            selected &= (arrays["meridians"] & required) == required
+        return np.flatnonzero(selected)
+
+    def describe(self, herb_id: int) -> Dict[str, object]:
+        """返回某味药材解析后的五味、四气和归经"""
+        nature = self._natures[herb_id]
+        return {
+            "flavors": from_mask(self._flavors[herb_id], FLAVORS),
+            "nature": NATURES[nature] if nature != UNKNOWN_NATURE else "",
+            "meridians": from_mask(self._meridians[herb_id], MERIDIANS),
+        }
@@ -0,0 +1,462 @@
+"""
+组合查询模块
+
+用谓词（Contains、Equals、Pinyin、Attributes、Dosage）和 AND / OR / NOT 组合出查询条件，
+也可以用 parse_query 从字符串解析，如 "efficacy:解表 AND NOT precautions:孕妇"、
+"meridian:肺 AND dose:3-10g"。
+
+执行时规划器先估计各条件的候选行数，用命中行数最少的可索引条件做索引扫描，
+其余条件按估计行数从少到多依次作为过滤器作用于候选集合；explain 给出所选计划
+以及每一步的实际行数。数据库没有索引时退化为全表扫描。
+"""
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .dosage import check_range, dose_matches, parse_dosage
+from .index import strip_tones
+from .properties import FLAVORS, MERIDIANS, NATURES, parse_properties, to_mask
+from .records import FIELDS
+
+
+class Predicate(ABC):
+    """
+    查询谓词基类
+
+    子类实现 matches（判断单味药材是否满足条件）、candidates（用数据库索引给出
+    可能满足条件的药材编号，不能使用索引时返回None）和 describe。
+    """
+
+    @abstractmethod
+    def matches(self, herb: Dict[str, str]) -> bool:
+        """判断单味药材是否满足条件"""
+
+    def candidates(self, db) -> Optional[List[int]]:
+        """可能满足条件的药材编号（升序），是真实结果的超集；不能使用索引时返回None"""
+        return None
+
+    @abstractmethod
+    def describe(self) -> str:
+        """条件的文字描述，用于 explain"""
+
+    def __and__(self, other: "Predicate") -> "And":
+        return And(self, other)
+
+    def __or__(self, other: "Predicate") -> "Or":
+        return Or(self, other)
+
+    def __invert__(self) -> "Not":
+        return Not(self)
+
+    def __repr__(self) -> str:
+        return f"<{type(self).__name__} {self.describe()}>"
+
+
+def _check_field(field: str):
+    if field not in FIELDS:
+        raise KeyError(field)
+
+
+class Contains(Predicate):
+    """字段包含子串 value"""
+
+    def __init__(self, field: str, value: str):
+        _check_field(field)
+        self.field = field
+        self.value = value
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        return self.value in (herb.get(self.field) or "")
+
+    def candidates(self, db) -> Optional[List[int]]:
+        index = getattr(db, 'text_index', None)
+        return index.candidates(self.field, self.value) if index is not None else None
+
+    def describe(self) -> str:
+        return f"{self.field} 包含 {self.value!r}"
+
+
+class Equals(Predicate):
+    """字段值等于 value，name 和 pinyin 使用哈希索引"""
+
+    _INDEXES = {"name": "name_index", "pinyin": "pinyin_index"}
+
+    def __init__(self, field: str, value: str):
+        _check_field(field)
+        self.field = field
+        self.value = value
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        return herb.get(self.field) == self.value
+
+    def candidates(self, db) -> Optional[List[int]]:
+        index = getattr(db, self._INDEXES.get(self.field, ''), None)
+        return index.get(self.value) if index is not None else None
+
+    def describe(self) -> str:
+        return f"{self.field} = {self.value!r}"
+
+
+class Pinyin(Predicate):
+    """拼音忽略声调、大小写和空格后等于 value"""
+
+    def __init__(self, value: str):
+        self.value = value
+        self.plain = strip_tones(value)
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        return strip_tones(herb.get('pinyin') or "") == self.plain
+
+    def candidates(self, db) -> Optional[List[int]]:
+        index = getattr(db, 'plain_pinyin_index', None)
+        return index.get(self.value) if index is not None else None
+
+    def describe(self) -> str:
+        return f"pinyin ≈ {self.plain!r}"
+
+
+class Attributes(Predicate):
+    """
+    结构化药性条件，含义同 get_herbs_by_attributes：flavors 和 meridians 要求包含全部给定取值，
+    natures 要求四气等于其中之一
+    """
+
+    def __init__(self, flavors: Iterable[str] = None, natures: Union[str, Iterable[str]] = None,
+                 meridians: Iterable[str] = None):
+        self.flavors = list(flavors or [])
+        self.natures = [natures] if isinstance(natures, str) else list(natures or [])
+        self.meridians = list(meridians or [])
+        # 提前检查取值，未知取值抛出ValueError
+        self._flavor_mask = to_mask(self.flavors, FLAVORS)
+        self._meridian_mask = to_mask(self.meridians, MERIDIANS)
+        to_mask(self.natures, NATURES)
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        parsed = parse_properties(herb.get('properties') or "")
+        if to_mask(parsed["flavors"], FLAVORS) & self._flavor_mask != self._flavor_mask:
+            return False
+        if self.natures and parsed["nature"] not in self.natures:
+            return False
+        return to_mask(parsed["meridians"], MERIDIANS) & self._meridian_mask == self._meridian_mask
+
+    def candidates(self, db) -> Optional[List[int]]:
+        index = getattr(db, 'property_index', None)
+        if index is None:
+            return None
+        return index.query(self.flavors, self.natures, self.meridians).tolist()
+
+    def describe(self) -> str:
+        parts = []
+        if self.flavors:
+            parts.append(f"味 ⊇ {'、'.join(self.flavors)}")
+        if self.natures:
+            parts.append(f"性 ∈ {'、'.join(self.natures)}")
+        if self.meridians:
+            parts.append(f"归经 ⊇ {'、'.join(self.meridians)}")
+        return f"药性({'，'.join(parts)})"
+
+
+class Dosage(Predicate):
+    """常规剂量条件，含义同 get_herbs_by_dosage"""
+
+    def __init__(self, low: float = None, high: float = None, max_dose: float = None, unit: str = "g"):
+        check_range(low, high)
+        self.low = low
+        self.high = high
+        self.max_dose = max_dose
+        self.unit = unit
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        parsed = parse_dosage(herb.get('dosage') or "")
+        return dose_matches((parsed["min"], parsed["max"], parsed["unit"]),
+                            self.low, self.high, self.max_dose, self.unit)
+
+    def candidates(self, db) -> Optional[List[int]]:
+        index = getattr(db, 'dosage_index', None)
+        return index.query(self.low, self.high, self.max_dose, self.unit) if index is not None else None
+
+    def describe(self) -> str:
+        parts = []
+        if self.low is not None or self.high is not None:
+            low = "" if self.low is None else f"{self.low:g}"
+            high = "" if self.high is None else f"{self.high:g}"
+            parts.append(f"范围与 {low}~{high}{self.unit} 相交")
+        if self.max_dose is not None:
+            parts.append(f"最大剂量 ≤ {self.max_dose:g}{self.unit}")
+        return f"剂量({'，'.join(parts)})"
+
+
+class And(Predicate):
+    """所有子条件都满足"""
+
+    def __init__(self, *children: Predicate):
+        # 展开嵌套的 And，便于规划器选择驱动条件
+        self.children: Tuple[Predicate, ...] = tuple(
+            grandchild for child in children
+            for grandchild in (child.children if isinstance(child, And) else (child,)))
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        return all(child.matches(herb) for child in self.children)
+
+    def candidates(self, db) -> Optional[List[int]]:
+        lists = [ids for ids in (child.candidates(db) for child in self.children) if ids is not None]
+        if not lists:
+            return None
+        lists.sort(key=len)
+        return sorted(set(lists[0]).intersection(*lists[1:]))
+
+    def describe(self) -> str:
+        return "(" + " AND ".join(child.describe() for child in self.children) + ")"
+
+
+class Or(Predicate):
+    """任一子条件满足"""
+
+    def __init__(self, *children: Predicate):
+        self.children: Tuple[Predicate, ...] = tuple(
+            grandchild for child in children
+            for grandchild in (child.children if isinstance(child, Or) else (child,)))
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        return any(child.matches(herb) for child in self.children)
+
+    def candidates(self, db) -> Optional[List[int]]:
+        # 只有所有子条件都能使用索引时，并集才是完整的候选集合
+        union = set()
+        for child in self.children:
+            ids = child.candidates(db)
+            if ids is None:
+                return None
+            union.update(ids)
+        return sorted(union)
+
+    def describe(self) -> str:
+        return "(" + " OR ".join(child.describe() for child in self.children) + ")"
+
+
+class Not(Predicate):
+    """子条件不满足"""
+
+    def __init__(self, child: Predicate):
+        self.child = child
+
+    def matches(self, herb: Dict[str, str]) -> bool:
+        return not self.child.matches(herb)
+
+    def describe(self) -> str:
+        return f"NOT {self.child.describe()}"
+
+
+class PlanStep:
+    """查询计划中的一步：索引扫描、全表扫描或过滤"""
+
+    def __init__(self, operation: str, predicate: Optional[Predicate], estimate: Optional[int]):
+        self.operation = operation
+        self.predicate = predicate
+        self.estimate = estimate
+        self.rows: Optional[int] = None
+
+    def __repr__(self) -> str:
+        return f"PlanStep({self.operation!r}, {self.predicate!r}, estimate={self.estimate}, rows={self.rows})"
+
+
+class QueryPlan:
+    """
+    查询计划
+
+    第一步确定候选集合（索引扫描或全表扫描），之后各步依次过滤候选集合。
+    """
+
+    def __init__(self, predicate: Predicate, steps: List[PlanStep], candidates: Optional[List[int]],
+                 filters: List[Tuple[Predicate, Optional[set]]]):
+        self.predicate = predicate
+        self.steps = steps
+        # 驱动条件的索引候选（全表扫描时为None），以及各过滤条件的索引候选集合
+        self._candidates = candidates
+        self._filters = filters
+
+    def execute(self, herbs: Sequence[Dict[str, str]]) -> List[int]:
+        """执行计划，返回满足条件的药材编号（升序），并记录每一步的行数"""
+        scan = self.steps[0]
+        if scan.predicate is None:
+            ids = list(range(len(herbs)))
+        else:
+            ids = [i for i in self._candidates if scan.predicate.matches(herbs[i])]
+        scan.rows = len(ids)
+
+        for step, (predicate, candidates) in zip(self.steps[1:], self._filters):
+            if candidates is not None:
+                # 可索引的条件先用候选集合排除，再逐条校验
+                ids = [i for i in ids if i in candidates and predicate.matches(herbs[i])]
+            else:
+                ids = [i for i in ids if predicate.matches(herbs[i])]
+            step.rows = len(ids)
+        return ids
+
+    def explain(self) -> str:
+        """以文本形式展示计划，执行后包含每一步的实际行数"""
+        lines = [f"查询: {self.predicate.describe()}"]
+        for number, step in enumerate(self.steps, 1):
+            line = f"{number}. {step.operation} {step.predicate.describe() if step.predicate else ''}".rstrip()
+            if step.estimate is not None:
+                line += f"  估计 {step.estimate} 行"
+            if step.rows is not None:
+                line += f"  -> {step.rows} 行"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def plan_query(db, predicate: Predicate) -> QueryPlan:
+    """
+    为查询条件生成执行计划
+
+    顶层 AND 的各子条件中，索引候选行数最少的一个作为驱动条件做索引扫描，
+    其余可索引条件按候选行数从少到多、不可索引的条件按原顺序排在最后依次过滤。
+    """
+    conjuncts = predicate.children if isinstance(predicate, And) else (predicate,)
+    estimated = [(conjunct, conjunct.candidates(db)) for conjunct in conjuncts]
+    indexed = sorted((item for item in estimated if item[1] is not None), key=lambda item: len(item[1]))
+    unindexed = [item for item in estimated if item[1] is None]
+
+    if indexed:
+        driver, candidates = indexed.pop(0)
+        steps = [PlanStep("索引扫描", driver, len(candidates))]
+    else:
+        candidates = None
+        steps = [PlanStep("全表扫描", None, db.get_herb_count())]
+
+    filters = []
+    for conjunct, ids in indexed + unindexed:
+        steps.append(PlanStep("过滤", conjunct, len(ids) if ids is not None else None))
+        filters.append((conjunct, set(ids) if ids is not None else None))
+
+    return QueryPlan(predicate, steps, candidates, filters)
+
+
+# 查询字符串中表示结构化药性条件（Attributes）的字段及对应的参数名
+_ATTRIBUTE_FIELDS = {"flavor": "flavors", "nature": "natures", "meridian": "meridians"}
+
+# 剂量条件的值：范围（可省略一端）或单个剂量，后接单位（默认为 g），如 3-10g、15-、-3、10
+_DOSE_PATTERN = re.compile(r'(?P<low>\d+(?:\.\d+)?)?\s*(?:(?P<dash>[-~～])\s*(?P<high>\d+(?:\.\d+)?)?)?'
+                           r'\s*(?P<unit>[^\d\s.\-~～]*)')
+
+# 多个取值之间的分隔符
+_VALUE_SEPARATORS = re.compile(r'[,，、]')
+
+_TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|(\w+)\s*([:=~])\s*(?:"([^"]*)"|([^\s()"]+))|([^\s()]+))')
+
+
+def parse_query(text: str) -> Predicate:
+    """
+    从字符串解析查询条件
+
+    条件写作 字段:值（包含子串）、字段=值（等于）或 pinyin~值（忽略声调的拼音），
+    值含空格时用双引号括起；条件之间用 AND、OR、NOT 和括号组合，优先级 NOT > AND > OR，
+    相邻条件之间省略运算符时按 AND 处理。如 'efficacy:解表 AND NOT (precautions:孕妇 OR name=麻黄)'。
+
+    以下字段表示结构化条件，可以使用药性索引和剂量索引：
+        flavor:辛,苦  meridian:肺,胃   五味、归经包含全部给定取值（Attributes）
+        nature:温,热                  四气为其中之一（Attributes）
+        dose:3-10g  dose:15-  dose:10  剂量范围与给定范围相交，单位默认为 g（Dosage）
+        max_dose:3g                   最大剂量不超过给定值（Dosage）
+    格式错误时抛出ValueError。
+    """
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        match = _TOKEN_PATTERN.match(text, pos)
+        if match is None or match.end() == pos:
+            break
+        pos = match.end()
+        open_paren, close_paren, field, op, quoted, bare, word = match.groups()
+        if open_paren or close_paren:
+            tokens.append(open_paren or close_paren)
+        elif field:
+            value = quoted if quoted is not None else bare
+            if field in _ATTRIBUTE_FIELDS or field in ("dose", "max_dose"):
+                if op != ':':
+                    raise ValueError(f"{field} 字段只支持 : 条件")
+                tokens.append(_structured_predicate(field, value))
+            elif op == '~':
+                if field != 'pinyin':
+                    raise ValueError(f"只有 pinyin 字段支持 ~ 匹配: {field}")
+                tokens.append(Pinyin(value))
+            else:
+                try:
+                    tokens.append(Contains(field, value) if op == ':' else Equals(field, value))
+                except KeyError:
+                    raise ValueError(f"未知的字段: {field}") from None
+        elif word.upper() in ("AND", "OR", "NOT"):
+            tokens.append(word.upper())
+        else:
+            raise ValueError(f"无法解析的查询片段: {word}")
+    if text[pos:].strip():
+        raise ValueError(f"无法解析的查询片段: {text[pos:]}")
+
+    position = 0
+
+    def peek():
+        return tokens[position] if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        position += 1
+        return tokens[position - 1]
+
+    def parse_or() -> Predicate:
+        children = [parse_and()]
+        while peek() == "OR":
+            take()
+            children.append(parse_and())
+        return children[0] if len(children) == 1 else Or(*children)
+
+    def parse_and() -> Predicate:
+        children = [parse_not()]
+        while peek() not in (None, "OR", ")"):
+            if peek() == "AND":
+                take()
+            children.append(parse_not())
+        return children[0] if len(children) == 1 else And(*children)
+
+    def parse_not() -> Predicate:
+        if peek() == "NOT":
+            take()
+            return Not(parse_not())
+        token = take() if peek() is not None else None
+        if token == "(":
+            predicate = parse_or()
+            if peek() != ")":
+                raise ValueError("查询中的括号不匹配")
+            take()
+            return predicate
+        if isinstance(token, Predicate):
+            return token
+        raise ValueError(f"查询条件不完整: {text!r}")
+
+    predicate = parse_or()
+    if peek() is not None:
+        raise ValueError(f"查询中的括号不匹配: {text!r}")
+    return predicate
+
+
+def _structured_predicate(field: str, value: str) -> Predicate:
+    """由查询字符串中的 flavor、nature、meridian、dose 或 max_dose 条件生成谓词，见 parse_query"""
+    if field in _ATTRIBUTE_FIELDS:
+        values = [item for item in _VALUE_SEPARATORS.split(value) if item]
+        if not values:
+            raise ValueError(f"{field} 条件缺少取值")
+        return Attributes(**{_ATTRIBUTE_FIELDS[field]: values})
+
+    match = _DOSE_PATTERN.fullmatch(value)
+    if match is None or (match.group("low") is None and match.group("high") is None):
+        raise ValueError(f"无法解析的剂量: {value}")
+    low = float(match.group("low")) if match.group("low") else None
+    high = float(match.group("high")) if match.group("high") else None
+    unit = match.group("unit") or "g"
+    if field == "max_dose":
+        if match.group("dash"):
+            raise ValueError(f"max_dose 只接受单个剂量: {value}")
+        return Dosage(max_dose=low, unit=unit)
+    if not match.group("dash"):
+        high = low
+    return Dosage(low, high, unit=unit)
@@ -0,0 +1,146 @@
+"""
+查询结果缓存模块
+
+以查询方法名和参数为键缓存查询结果，容量有限时淘汰最久未使用的结果，
+可以设置过期时间。数据库每次修改都会递增版本号，版本号变化时清空缓存，
+因此不会返回修改之前的查询结果。开启运行指标时同时记录每次查询的延迟。
+"""
+import functools
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from .instrumentation import QUERY_SECONDS, metrics
+
+
+class QueryCache:
+    """
+    有容量上限和过期时间的LRU查询结果缓存
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        # maxsize 为0时不缓存；ttl 为None时结果不过期（单位：秒）
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, version: int):
+        """
+        查找缓存结果，未命中时返回 (False, None)
+
+        version 与缓存中记录的数据库版本号不同时，先清空所有旧结果
+        """
+        self._check_version(version)
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires = entry
+            if expires is None or time.monotonic() < expires:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value, version: int):
+        """写入查询结果，超出容量时淘汰最久未使用的结果"""
+        if self.maxsize <= 0:
+            return
+        self._check_version(version)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _check_version(self, version: int):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def clear(self):
+        """清空缓存，保留命中统计"""
+        self._entries.clear()
+
+    def info(self) -> Dict[str, object]:
+        """命中次数、未命中次数、当前条目数、容量和过期时间"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _freeze(value) -> Hashable:
+    """把列表、集合等参数转换为可哈希的形式，用作缓存键"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+def timed_query(method: Callable) -> Callable:
+    """
+    查询方法装饰器，开启运行指标时按方法名记录最外层查询的延迟到 QUERY_SECONDS
+
+    查询方法内部调用的其他被装饰方法不再单独计时
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not metrics.enabled or self._in_timed_query:
+            return method(self, *args, **kwargs)
+        self._in_timed_query = True
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._in_timed_query = False
+            metrics.observe(QUERY_SECONDS, time.perf_counter() - start, method=method.__name__)
+
+    return wrapper
+
+
+def cached_query(method: Callable) -> Callable:
+    """
+    查询方法装饰器，按方法名和参数缓存查询结果
+
+    被装饰方法所属的对象需要有 query_cache（QueryCache）和 version（数据库版本号）属性。
+    缓存的是结果列表的副本，调用方修改返回的列表不会影响缓存。
+    查询方法内部调用的其他被装饰方法不再单独缓存，命中统计只记录最外层的查询。
+    同时按 timed_query 记录最外层查询的延迟（含命中缓存的调用）。
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = getattr(self, 'query_cache', None)
+        if cache is None or cache.maxsize <= 0 or self._in_cached_query:
+            return method(self, *args, **kwargs)
+        try:
+            key = (method.__name__, _freeze(args), _freeze(sorted(kwargs.items())))
+        except TypeError:
+            # 参数不可哈希时直接查询
+            return method(self, *args, **kwargs)
+
+        found, result = cache.get(key, self.version)
+        if found:
+            return list(result)
+
+        version = self.version
+        self._in_cached_query = True
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            self._in_cached_query = False
+        cache.put(key, list(result), version)
+        return result
+
+    return timed_query(wrapper)
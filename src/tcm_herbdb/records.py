@@ -0,0 +1,71 @@
+"""
+紧凑药材记录模块
+"""
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, Tuple
+
+from .config import Config
+
+
+# 直接保存字符串的短字段
+SCALAR_FIELDS = ("name", "pinyin", "source")
+
+# 以 (起点, 终点) 偏移量保存、访问时才切片生成的长字段
+SPAN_FIELDS = tuple(Config.SECTION_FIELDS.values()) + ("full_content",)
+
+# 字段顺序与 extract_herb_info 生成的字典一致
+FIELDS = SCALAR_FIELDS + SPAN_FIELDS
+
+_SPAN_INDEX = {field: i for i, field in enumerate(SPAN_FIELDS)}
+
+
+class HerbRecord(Mapping):
+    """
+    紧凑的药材记录
+
+    各章节和 full_content 只以偏移量的形式指向整份语料共享的文本缓冲区，
+    访问时才切片生成字符串，避免每味药材都持有一份条目文本的拷贝。
+    支持与字典相同的只读访问方式（herb['name']、herb.get、keys、items 等），
+    与内容相同的字典比较时相等。
+    """
+
+    __slots__ = ("name", "pinyin", "source", "_text", "_spans")
+
+    def __init__(self, name: str, pinyin: str, source: str, text: str, spans: Dict[str, Tuple[int, int]]):
+        # 来源等短字符串大量重复，驻留后只保留一份
+        self.name = sys.intern(name)
+        self.pinyin = sys.intern(pinyin)
+        self.source = sys.intern(source)
+        self._text = text
+        self._spans = array('Q')
+        for field in SPAN_FIELDS:
+            self._spans.extend(spans.get(field, (0, 0)))
+
+    def __getitem__(self, key: str) -> str:
+        if key in SCALAR_FIELDS:
+            return getattr(self, key)
+        i = _SPAN_INDEX[key] * 2
+        return self._text[self._spans[i]:self._spans[i + 1]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __contains__(self, key) -> bool:
+        return key in SCALAR_FIELDS or key in _SPAN_INDEX
+
+    def span(self, field: str) -> Tuple[int, int]:
+        """返回长字段在共享文本中的 (起点, 终点) 偏移量"""
+        i = _SPAN_INDEX[field] * 2
+        return self._spans[i], self._spans[i + 1]
+
+    def to_dict(self) -> Dict[str, str]:
+        """生成普通字典"""
+        return {field: self[field] for field in FIELDS}
+
+    def __repr__(self) -> str:
+        return f"HerbRecord(name={self.name!r}, pinyin={self.pinyin!r}, source={self.source!r})"
@@ -0,0 +1,332 @@
+"""
+查询服务模块
+
+基于标准库 asyncio 的 HTTP/JSON 查询服务。数据库在启动时加载一次，之后所有请求共享，
+支持 TCP 端口或 Unix 套接字、多个连接并发、HTTP/1.1 长连接，结果列表以分块传输编码
+分批写出，不必先在内存中拼出完整的响应。
+
+接口（均为 GET，返回 JSON）：
+    /health                                  服务状态和药材数
+    /herbs?name=麻黄  /herbs?pinyin=mahuang   按名称或拼音查找（pinyin 可加 exact=1）
+    /herbs?category=解表药                    按章、类别或节查找（需从 Markdown 教材加载）
+    /search?field=efficacy&value=解表         字段子串查找
+    /query?q=efficacy:解表 AND properties:温  组合查询（语法见 parse_query，如 meridian:肺 AND dose:3-10g），
+                                             加 explain=1 时附带执行计划
+    /fuzzy?q=ma huang&k=5                    模糊查找，结果附带 distance
+    /dosage?low=15&high=30  /dosage?max_dose=3  按常规剂量查找
+    /similar?name=麻黄  /similar?q=恶寒发热无汗  按 TF-IDF 相似度查找，结果附带 score，可加 k=N
+    /metrics                                 Prometheus 文本格式的运行指标（需开启运行指标）
+返回药材列表的接口都支持 fields=name,pinyin（只返回指定字段）和 limit=N。
+"""
+import asyncio
+import json
+import logging
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from .config import Config
+from .herb_parser import CATEGORY_FIELDS
+from .instrumentation import metrics
+from .records import FIELDS
+
+
+# 创建模块日志记录器
+logger = logging.getLogger(__name__)
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """以指定状态码返回给客户端的错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class HerbServer:
+    """
+    中药数据库查询服务
+
+    查询在事件循环所在的线程中同步执行（单次查询通常在毫秒以内），
+    因此数据库及其索引、查询缓存不需要加锁。
+    """
+
+    def __init__(self, db, host: str = None, port: int = None, unix_socket: str = None):
+        self.db = db
+        self.host = host or Config.SERVER_HOST
+        self.port = Config.SERVER_PORT if port is None else port
+        self.unix_socket = unix_socket
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> asyncio.AbstractServer:
+        """开始监听，返回 asyncio 服务对象"""
+        if self.unix_socket:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path=self.unix_socket)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        return self.server
+
+    @property
+    def address(self) -> str:
+        """实际监听的地址，端口为0时为系统分配的端口"""
+        if self.unix_socket:
+            return f"unix:{self.unix_socket}"
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def serve_forever(self):
+        """开始监听并一直运行，直到被取消"""
+        if self.server is None:
+            await self.start()
+        logger.info(f"查询服务已启动: {self.address}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接上的所有请求，长连接在空闲超时或客户端要求关闭时结束"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                                  Config.SERVER_KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._write_response(writer, "HTTP/1.1", 413, {"error": "请求头过长"}, False)
+                    break
+
+                try:
+                    method, target, version, headers = _parse_head(head)
+                except ValueError:
+                    await self._write_response(writer, "HTTP/1.1", 400, {"error": "无法解析的请求"}, False)
+                    break
+
+                # 丢弃请求体，使同一连接上的下一个请求保持对齐
+                length = _content_length(headers)
+                if length is None:
+                    await self._write_response(writer, "HTTP/1.1", 400, {"error": "无效的 Content-Length"}, False)
+                    break
+                if length:
+                    try:
+                        await reader.readexactly(length)
+                    except asyncio.IncompleteReadError:
+                        await self._write_response(writer, "HTTP/1.1", 400, {"error": "请求体不完整"}, False)
+                        break
+
+                keep_alive = _keep_alive(version, headers)
+                status, head_payload, herbs = self.dispatch(method, target)
+                await self._write_response(writer, version, status, head_payload, keep_alive, herbs)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def dispatch(self, method: str, target: str) -> Tuple[int, Union[Dict[str, object], str],
+                                                          Optional[Iterator[Dict[str, object]]]]:
+        """
+        执行一个请求，返回 (状态码, 响应对象, 药材迭代器)
+
+        药材迭代器不为None时作为响应对象的 results 字段分批写出，写出时才逐个复制和选择字段；
+        响应对象为字符串时按纯文本返回
+        """
+        url = urlsplit(target)
+        params = {key: values[0] for key, values in parse_qs(url.query, keep_blank_values=True).items()}
+        logger.debug(f"{method} {target}")
+        try:
+            if method != "GET":
+                raise HTTPError(405, f"不支持的请求方法: {method}")
+            handler = self._routes().get(url.path)
+            if handler is None:
+                raise HTTPError(404, f"未知的接口: {url.path}")
+            payload, herbs = handler(params)
+            if herbs is not None:
+                payload["count"], herbs = _project(herbs, params)
+            return 200, payload, herbs
+        except HTTPError as e:
+            return e.status, {"error": e.message}, None
+        except (KeyError, ValueError) as e:
+            return 400, {"error": f"参数错误: {e}"}, None
+        except Exception as e:
+            logger.exception(f"处理请求失败: {target}")
+            return 500, {"error": str(e)}, None
+
+    def _routes(self):
+        return {
+            "/health": self._health,
+            "/herbs": self._herbs,
+            "/search": self._search,
+            "/query": self._query,
+            "/fuzzy": self._fuzzy,
+            "/dosage": self._dosage,
+            "/similar": self._similar,
+            "/metrics": self._metrics,
+        }
+
+    def _health(self, params):
+        return {"status": "ok", "herbs": self.db.get_herb_count()}, None
+
+    def _herbs(self, params):
+        if "name" in params:
+            return {}, self.db.get_herbs_by_name(params["name"])
+        if "pinyin" in params:
+            return {}, self.db.get_herbs_by_pinyin(params["pinyin"], exact=_flag(params, "exact"))
+        if "category" in params:
+            return {}, self.db.get_herbs_by_category(params["category"])
+        raise HTTPError(400, "需要 name、pinyin 或 category 参数")
+
+    def _search(self, params):
+        return {}, self.db.get_herbs_by_field(_required(params, "field"), _required(params, "value"))
+
+    def _query(self, params):
+        condition = _required(params, "q")
+        if _flag(params, "explain"):
+            plan, results = self.db.query_with_plan(condition)
+            return {"plan": plan.explain()}, results
+        return {}, self.db.query(condition)
+
+    def _fuzzy(self, params):
+        matches = self.db.fuzzy_search(_required(params, "q"), k=_number(params, "k", int),
+                                       max_distance=_number(params, "max_distance", int))
+        return {}, [dict(herb, distance=distance) for herb, distance in matches]
+
+    def _dosage(self, params):
+        return {}, self.db.get_herbs_by_dosage(_number(params, "low"), _number(params, "high"),
+                                               _number(params, "max_dose"), params.get("unit", "g"))
+
+    def _similar(self, params):
+        k = _number(params, "k", int)
+        if "name" in params:
+            matches = self.db.similar_herbs(params["name"], k)
+        else:
+            matches = self.db.similarity_search(_required(params, "q"), k)
+        return {}, [dict(herb, score=score) for herb, score in matches]
+
+    def _metrics(self, params):
+        return metrics.to_prometheus(), None
+
+    async def _write_response(self, writer: asyncio.StreamWriter, version: str, status: int,
+                              payload: Union[Dict[str, object], str], keep_alive: bool,
+                              herbs: Optional[Iterable[Dict[str, object]]] = None):
+        """写出响应；HTTP/1.1 下药材列表以分块传输编码分批写出"""
+        content_type = ("text/plain; version=0.0.4; charset=utf-8" if isinstance(payload, str)
+                        else "application/json; charset=utf-8")
+        headers = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                   f"Content-Type: {content_type}",
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+
+        if herbs is None or version == "HTTP/1.0":
+            # HTTP/1.0 不支持分块传输，一次写出完整的响应
+            if herbs is not None:
+                payload = dict(payload, results=list(herbs))
+            text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+            body = text.encode("utf-8")
+            headers.append(f"Content-Length: {len(body)}")
+            writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("utf-8") + body)
+            await writer.drain()
+            return
+
+        headers.append("Transfer-Encoding: chunked")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("utf-8"))
+        opening = json.dumps(payload, ensure_ascii=False)[:-1]
+        _write_chunk(writer, f"{opening}{', ' if payload else ''}\"results\": [")
+        iterator = iter(herbs)
+        first = True
+        while batch := list(islice(iterator, Config.SERVER_STREAM_BATCH)):
+            text = ", ".join(json.dumps(herb, ensure_ascii=False) for herb in batch)
+            _write_chunk(writer, text if first else ", " + text)
+            first = False
+            await writer.drain()
+        _write_chunk(writer, "]}")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def _write_chunk(writer: asyncio.StreamWriter, text: str):
+    data = text.encode("utf-8")
+    writer.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+
+def _parse_head(head: bytes) -> Tuple[str, str, str, Dict[str, str]]:
+    """解析请求行和请求头，格式错误时抛出ValueError"""
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, version = lines[0].split(" ")
+    if not version.startswith("HTTP/"):
+        raise ValueError(version)
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def _content_length(headers: Dict[str, str]) -> Optional[int]:
+    """请求体长度，没有 Content-Length 时为0，不是非负整数时返回None"""
+    value = headers.get("content-length", "")
+    if not value:
+        return 0
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return int(value)
+
+
+def _keep_alive(version: str, headers: Dict[str, str]) -> bool:
+    """HTTP/1.1 默认保持连接，HTTP/1.0 需要客户端显式要求"""
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def _project(herbs: List[Dict[str, object]], params: Dict[str, str]) -> Tuple[int, Iterator[Dict[str, object]]]:
+    """
+    按 fields 和 limit 参数选择字段和截取结果，返回 (结果数, 药材迭代器)
+
+    参数在调用时检查，字段选择和复制在迭代时逐个进行，写出响应时才读取（及解压）药材字段
+    """
+    limit = _number(params, "limit", int)
+    count = len(herbs) if limit is None else min(len(herbs), limit)
+    selected = islice(herbs, limit)
+    if "fields" in params:
+        fields = [field for field in params["fields"].split(",") if field]
+        for field in fields:
+            if field not in FIELDS and field not in CATEGORY_FIELDS:
+                raise HTTPError(400, f"未知的字段: {field}")
+        fields += ["distance", "score"]
+        return count, ({field: herb[field] for field in fields if field in herb} for herb in selected)
+    # 普通字典直接写出，压缩存储等其他记录逐个转换为字典
+    return count, (herb if isinstance(herb, dict) else dict(herb) for herb in selected)
+
+
+def _required(params: Dict[str, str], name: str) -> str:
+    if name not in params:
+        raise HTTPError(400, f"缺少参数: {name}")
+    return params[name]
+
+
+def _flag(params: Dict[str, str], name: str) -> bool:
+    return params.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _number(params: Dict[str, str], name: str, kind=float):
+    if name not in params:
+        return None
+    try:
+        return kind(params[name])
+    except ValueError:
+        raise HTTPError(400, f"参数 {name} 不是有效的数字: {params[name]}") from None
+
+
+async def serve(db, host: str = None, port: int = None, unix_socket: str = None):
+    """启动查询服务并一直运行"""
+    await HerbServer(db, host, port, unix_socket).serve_forever()
@@ -0,0 +1,176 @@
+"""
+相似度检索模块
+
+把药材的功效、应用和药性文本按字符 n-gram 表示为 TF-IDF 向量，回答"与麻黄相似的药材"
+和"与一段症状描述最相关的药材"两类查询。TF-IDF 矩阵按 词项 × 药材 的方向以 CSR 数组
+（indptr、indices、data）保存，查询是一次稀疏矩阵与查询向量的乘积：只取出查询中出现的词项
+所在的行，用一次 np.bincount 累加出所有药材的余弦相似度，再用 argpartition 取前 k 个。
+批量查询时所有查询的乘积也在同一次 bincount 中完成。
+"""
+import re
+from array import array
+from collections import Counter
+from itertools import chain
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from .config import Config
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+# 汉字和字母以外的字符（标点、数字、空白等）把文本断开，n-gram 不跨越这些位置
+_SEPARATORS = re.compile(r'[^\u3400-\u4dbf\u4e00-\u9fffa-z]+')
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = None) -> Counter:
+    """
+    统计文本中长度在 ngram_range 范围内的字符 n-gram 的出现次数
+
+    字母转为小写，ngram_range 默认取 Config.SIMILARITY_NGRAM_RANGE
+    """
+    low, high = ngram_range or Config.SIMILARITY_NGRAM_RANGE
+    # 分隔处统一替换为空格，整段文本一次切分，再去掉跨越空格的 n-gram
+    text = _SEPARATORS.sub(" ", text.lower())
+    counts = Counter()
+    for n in range(low, high + 1):
+        counts.update(text if n == 1 else map("".join, zip(*(text[i:] for i in range(n)))))
+    for gram in [gram for gram in counts if " " in gram]:
+        del counts[gram]
+    return counts
+
+
+class TfidfIndex:
+    """
+    基于字符 n-gram TF-IDF 向量和余弦相似度的相似药材索引
+
+    每味药材的 Config.SIMILARITY_FIELDS 字段合在一起作为一篇文档。词频取 1 + log(tf)，
+    逆文档频率取 log((1 + N) / (1 + df)) + 1，文档向量按 L2 范数归一化。
+    各药材的词项计数在 add 时保存，TF-IDF 矩阵在下次查询时重新生成。
+    """
+
+    def __init__(self, fields: Iterable[str] = None, ngram_range: Tuple[int, int] = None):
+        self.fields = tuple(Config.SIMILARITY_FIELDS if fields is None else fields)
+        self.ngram_range = tuple(ngram_range or Config.SIMILARITY_NGRAM_RANGE)
+        self.vocabulary: Dict[str, int] = {}
+        # 每味药材的 (词项编号数组, 出现次数数组)
+        self._documents: List[Tuple[array, array]] = []
+        self._matrix = None
+
+    def add(self, herb_id: int, herb: Dict[str, str]):
+        """
+        把一味药材加入索引
+
+        herb_id 等于当前药材数时追加，小于当前药材数时替换该位置（用于增量更新）
+        """
+        # 各字段以空格连接，n-gram 不跨越字段
+        counts = char_ngrams(" ".join(herb.get(field) or "" for field in self.fields), self.ngram_range)
+        vocabulary = self.vocabulary
+        new_grams = [gram for gram in counts if gram not in vocabulary]
+        vocabulary.update(zip(new_grams, range(len(vocabulary), len(vocabulary) + len(new_grams))))
+        terms = array('i', map(vocabulary.__getitem__, counts))
+        self._set(herb_id, (terms, array('i', counts.values())))
+
+    def remove(self, herb_id: int, herb: Dict[str, str]):
+        """清空某个位置的文档，使其不再出现在结果中，直到被 add 替换"""
+        self._set(herb_id, (array('i'), array('i')))
+
+    def _set(self, herb_id: int, document: Tuple[array, array]):
+        if herb_id == len(self._documents):
+            self._documents.append(document)
+        else:
+            self._documents[herb_id] = document
+        # 逆文档频率随之变化，矩阵在下次查询时重新生成
+        self._matrix = None
+
+    @property
+    def matrix(self) -> Dict[str, "np.ndarray"]:
+        """
+        词项 × 药材 的 TF-IDF 矩阵，CSR 形式的 indptr、indices（药材编号）、data，以及各词项的 idf
+        """
+        if self._matrix is None:
+            # NumPy 导入较慢，第一次查询时才导入
+            import numpy as np
+
+            documents = self._documents
+            lengths = np.fromiter((len(terms) for terms, _ in documents), dtype=np.int64, count=len(documents))
+            nnz = int(lengths.sum())
+            terms = np.fromiter(chain.from_iterable(terms for terms, _ in documents), dtype=np.int64, count=nnz)
+            tf = np.fromiter(chain.from_iterable(counts for _, counts in documents), dtype=np.float64, count=nnz)
+            docs = np.repeat(np.arange(len(documents)), lengths)
+
+            df = np.bincount(terms, minlength=len(self.vocabulary))
+            idf = np.log((1 + len(documents)) / (1 + df)) + 1
+            weights = (1 + np.log(tf)) * idf[terms]
+            norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=len(documents)))
+            weights /= np.where(norms > 0, norms, 1)[docs]
+
+            order = np.argsort(terms, kind="stable")
+            indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+            np.cumsum(df, out=indptr[1:])
+            self._matrix = {"indptr": indptr, "indices": docs[order], "data": weights[order], "idf": idf}
+        return self._matrix
+
+    def search(self, text: str, k: int = None) -> List[Tuple[int, float]]:
+        """返回与文本最相似的最多k个 (药材编号, 余弦相似度)，按相似度降序、编号升序，不含相似度为0的药材"""
+        return self.search_many([text], k)[0]
+
+    def search_many(self, texts: Iterable[str], k: int = None) -> List[List[Tuple[int, float]]]:
+        """批量查询，所有查询在同一次矩阵乘积中完成，结果与逐个调用 search 一致"""
+        queries = []
+        for text in texts:
+            counts = char_ngrams(text, self.ngram_range)
+            queries.append([(self.vocabulary[gram], count) for gram, count in counts.items()
+                            if gram in self.vocabulary])
+        return self._top_k(self._scores(queries), k)
+
+    def similar(self, herb_id: int, k: int = None) -> List[Tuple[int, float]]:
+        """返回与某味药材最相似的最多k个 (药材编号, 余弦相似度)，不含该药材本身"""
+        terms, counts = self._documents[herb_id]
+        scores = self._scores([list(zip(terms, counts))])
+        scores[0, herb_id] = 0
+        return self._top_k(scores, k)[0]
+
+    def _scores(self, queries: List[List[Tuple[int, int]]]) -> "np.ndarray":
+        """各查询与所有药材的余弦相似度，形状为 (查询数, 药材数)"""
+        import numpy as np
+
+        matrix = self.matrix
+        n_docs = len(self._documents)
+        if not queries or n_docs == 0:
+            return np.zeros((len(queries), n_docs))
+        lengths = np.fromiter((len(query) for query in queries), dtype=np.int64, count=len(queries))
+        pairs = np.array(list(chain.from_iterable(queries)), dtype=np.int64).reshape(-1, 2)
+        rows = np.repeat(np.arange(len(queries)), lengths)
+        terms = pairs[:, 0]
+
+        # 查询向量同样取 1 + log(tf) 乘以 idf，再按 L2 范数归一化
+        weights = (1 + np.log(pairs[:, 1])) * matrix["idf"][terms]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(queries)))
+        weights /= np.where(norms > 0, norms, 1)[rows]
+
+        # 取出查询词项所在的行：第 i 个词项对应 data[indptr[t]:indptr[t + 1]]
+        starts = matrix["indptr"][terms]
+        counts = matrix["indptr"][terms + 1] - starts
+        total = int(counts.sum())
+        positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        products = matrix["data"][positions] * np.repeat(weights, counts)
+        cells = np.repeat(rows, counts) * n_docs + matrix["indices"][positions]
+        return np.bincount(cells, weights=products, minlength=len(queries) * n_docs).reshape(len(queries), n_docs)
+
+    @staticmethod
+    def _top_k(scores: "np.ndarray", k: Optional[int]) -> List[List[Tuple[int, float]]]:
+        """每一行中相似度最高的前k个 (药材编号, 相似度)，不含相似度为0的药材"""
+        import numpy as np
+
+        k = Config.SIMILARITY_TOP_K if k is None else k
+        results = []
+        for row in scores:
+            candidates = np.flatnonzero(row > 0)
+            if 0 < k < len(candidates):
+                candidates = candidates[np.argpartition(-row[candidates], k - 1)[:k]]
+            elif k <= 0:
+                candidates = candidates[:0]
+            candidates = candidates[np.lexsort((candidates, -row[candidates]))]
+            results.append([(int(herb_id), float(row[herb_id])) for herb_id in candidates])
+        return results
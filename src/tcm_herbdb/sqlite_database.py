@@ -0,0 +1,230 @@
+"""
+SQLite 存储后端模块
+
+药材各字段保存在 herbs 表中，名称、拼音和章节层级建普通索引；文本章节另建 FTS5
+（trigram 分词）外部内容虚拟表，子串查询下推到 SQL 中完成。
+多个进程可以共享同一个数据库文件，无需各自解析语料并常驻内存；from_txt_file 记录
+所载入文件的内容指纹，用同一文件再次打开时不会重复写入。
+"""
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .cache import ParseCache
+from .config import Config
+from .database import BaseHerbDatabase, load_herbs
+from .herb_parser import CATEGORY_FIELDS
+from .index import strip_tones
+from .query_cache import cached_query
+from .similarity import TfidfIndex
+from .records import FIELDS
+
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS herbs (
+    id INTEGER PRIMARY KEY,
+    {", ".join(f"{field} TEXT NOT NULL DEFAULT ''" for field in FIELDS)},
+    plain_pinyin TEXT NOT NULL DEFAULT '',
+    {", ".join(f"{field} TEXT" for field in CATEGORY_FIELDS)}
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS herbs_name ON herbs(name);
+CREATE INDEX IF NOT EXISTS herbs_pinyin ON herbs(pinyin);
+CREATE INDEX IF NOT EXISTS herbs_plain_pinyin ON herbs(plain_pinyin);
+CREATE VIRTUAL TABLE IF NOT EXISTS herbs_fts USING fts5(
+    {", ".join(Config.INDEX_FIELDS)},
+    content='herbs', content_rowid='id', tokenize='trigram case_sensitive 1'
+);
+"""
+
+# 章节层级列在旧版本建立的数据库文件中不存在，打开时补上后再建索引
+_CATEGORY_INDEXES = "\n".join(f"CREATE INDEX IF NOT EXISTS herbs_{field} ON herbs({field});"
+                              for field in CATEGORY_FIELDS)
+
+# 药材不带章节层级（从txt解析）时章节层级列为 NULL，读出时不含这些键
+_COLUMNS = ", ".join(FIELDS + CATEGORY_FIELDS)
+_SELECT = f"SELECT {_COLUMNS} FROM herbs"
+_INSERT = (f"INSERT INTO herbs ({_COLUMNS}, plain_pinyin) "
+           f"VALUES ({', '.join('?' * (len(FIELDS) + len(CATEGORY_FIELDS) + 1))})")
+_INSERT_FTS = (f"INSERT INTO herbs_fts (rowid, {', '.join(Config.INDEX_FIELDS)}) "
+               f"SELECT id, {', '.join(Config.INDEX_FIELDS)} FROM herbs WHERE id > ?")
+
+
+def _glob_escape(value: str) -> str:
+    """转义 GLOB 通配符，使其按字面匹配"""
+    return value.replace('[', '[[]').replace('*', '[*]').replace('?', '[?]')
+
+
+class SQLiteHerbDatabase(BaseHerbDatabase):
+    """
+    以 SQLite 为存储后端的中药数据库
+
+    提供与 BaseHerbDatabase 相同的查询接口，查询结果为字典列表，
+    顺序与药材加入数据库的顺序一致。herbs 中的药材追加到数据库已有的药材之后；
+    从文件建立数据库请使用 from_txt_file，它会替换而不是追加。
+    """
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:", herbs: List[Dict[str, str]] = None,
+                 cache_size: int = None, cache_ttl: Optional[float] = None):
+        # 其他进程写入同一数据库文件时不会使本进程的查询缓存失效，可以设置 cache_ttl 限制过期时间
+        self._init_query_cache(cache_size, cache_ttl)
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        # (建立时的数据版本, TF-IDF 索引)，见 _similarity_index
+        self._tfidf: Optional[Tuple[Tuple[int, int], TfidfIndex]] = None
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(herbs)")}
+            for field in CATEGORY_FIELDS:
+                if field not in columns:
+                    self.conn.execute(f"ALTER TABLE herbs ADD COLUMN {field} TEXT")
+            self.conn.executescript(_CATEGORY_INDEXES)
+        if herbs:
+            self.add_herbs(herbs)
+
+    def add_herb(self, herb: Dict[str, str]):
+        """添加单味药材"""
+        self.add_herbs([herb])
+
+    def add_herbs(self, herbs: Iterable[Dict[str, str]]):
+        """在一个事务中批量添加药材，并同步更新全文索引"""
+        with self.conn:
+            self._insert(herbs)
+            # 数据库不再与载入的文件一致，再次 from_txt_file 时重新载入
+            self.conn.execute("DELETE FROM meta WHERE key = 'source'")
+        self.invalidate()
+
+    def load_txt_file(self, file_path: str, workers: int = 1, cache: bool = None) -> bool:
+        """
+        在一个事务中用txt或Markdown文件的药材替换数据库中的全部药材，参数含义见 load_herbs
+
+        数据库记录上次载入文件的内容指纹（见 ParseCache.key），文件及解析配置未变化时不解析也不写入，
+        返回是否重新载入
+        """
+        fingerprint = ParseCache().key(file_path, "sqlite")
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        if row is not None and row[0] == fingerprint:
+            return False
+        herbs = load_herbs(file_path, workers=workers, cache=cache)
+        with self.conn:
+            self.conn.execute("INSERT INTO herbs_fts (herbs_fts) VALUES ('delete-all')")
+            self.conn.execute("DELETE FROM herbs")
+            self._insert(herbs)
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (fingerprint,))
+        self.invalidate()
+        return True
+
+    def _insert(self, herbs: Iterable[Dict[str, str]]):
+        """写入药材并同步更新全文索引，由调用方负责事务"""
+        rows = ([herb.get(field) or "" for field in FIELDS] + [herb.get(field) for field in CATEGORY_FIELDS]
+                + [strip_tones(herb.get('pinyin') or "")] for herb in herbs)
+        last_id = self.conn.execute("SELECT coalesce(max(id), 0) FROM herbs").fetchone()[0]
+        self.conn.executemany(_INSERT, rows)
+        self.conn.execute(_INSERT_FTS, (last_id,))
+
+    @cached_query
+    def get_herbs_by_name(self, name: str) -> List[Dict[str, str]]:
+        """根据名称查找药材"""
+        return self._query(f"{_SELECT} WHERE name = ? ORDER BY id", (name,))
+
+    @cached_query
+    def get_herbs_by_pinyin(self, pinyin: str, exact: bool = False) -> List[Dict[str, str]]:
+        """
+        根据拼音查找药材
+
+        exact 为False时忽略声调、大小写和空格，如 "mahuang" 可以查到麻黄
+        """
+        if exact:
+            return self._query(f"{_SELECT} WHERE pinyin = ? ORDER BY id", (pinyin,))
+        return self._query(f"{_SELECT} WHERE plain_pinyin = ? ORDER BY id", (strip_tones(pinyin),))
+
+    @cached_query
+    def get_herbs_by_field(self, field: str, value: str) -> List[Dict[str, str]]:
+        """
+        查找指定字段包含value的药材
+
+        已建全文索引的字段使用 FTS5 trigram 索引（区分大小写的 GLOB），
+        trigram 无法索引不足3个字的子串，此时在 herbs 表上扫描。
+        结果与 Python 的 in 判断一致
+        """
+        if field not in FIELDS:
+            raise KeyError(field)
+        pattern = f"*{_glob_escape(value)}*"
+        if field in Config.INDEX_FIELDS and len(value) >= 3:
+            sql = (f"SELECT {', '.join('h.' + f for f in FIELDS + CATEGORY_FIELDS)} FROM herbs_fts "
+                   f"JOIN herbs h ON h.id = herbs_fts.rowid "
+                   f"WHERE herbs_fts.{field} GLOB ? ORDER BY h.id")
+        else:
+            sql = f"{_SELECT} WHERE {field} GLOB ? ORDER BY id"
+        return self._query(sql, (pattern,))
+
+    @cached_query
+    def get_herbs_by_category(self, category: str) -> List[Dict[str, str]]:
+        """根据章、类别或节查找药材，参数见 BaseHerbDatabase.get_herbs_by_category"""
+        if not category:
+            return []
+        condition = " OR ".join(f"{field} = ?" for field in CATEGORY_FIELDS)
+        return self._query(f"{_SELECT} WHERE {condition} ORDER BY id", (category,) * len(CATEGORY_FIELDS))
+
+    def get_categories(self) -> Dict[str, List[str]]:
+        """返回 类别 -> 该类别下的节列表，均按在教材中出现的顺序排列"""
+        categories: Dict[str, List[str]] = {}
+        for category, subcategory in self.conn.execute(
+                "SELECT category, subcategory FROM herbs WHERE category != '' ORDER BY id"):
+            subcategories = categories.setdefault(category, [])
+            if subcategory and subcategory not in subcategories:
+                subcategories.append(subcategory)
+        return categories
+
+    def get_all_herbs(self) -> List[Dict[str, str]]:
+        """
+        获取所有药材，每次调用都从数据库读取整张表
+
+        未下推到 SQL 的查询（药性、剂量、相似度等）沿用 BaseHerbDatabase 的实现，每次调用读取一次
+        """
+        return self._query(f"{_SELECT} ORDER BY id")
+
+    def _similarity_index(self, herbs: List[Dict[str, str]]) -> TfidfIndex:
+        """
+        复用上次建立的 TF-IDF 索引
+
+        本连接（version）和其他连接（PRAGMA data_version）都未修改数据库时索引仍然有效
+        """
+        key = (self.version, self.conn.execute("PRAGMA data_version").fetchone()[0])
+        if self._tfidf is None or self._tfidf[0] != key:
+            self._tfidf = (key, super()._similarity_index(herbs))
+        return self._tfidf[1]
+
+    def get_herb_count(self) -> int:
+        """获取药材总数"""
+        return self.conn.execute("SELECT count(*) FROM herbs").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, str]]:
+        herbs = []
+        for row in self.conn.execute(sql, params):
+            herb = dict(row)
+            for field in CATEGORY_FIELDS:
+                if herb[field] is None:
+                    del herb[field]
+            herbs.append(herb)
+        return herbs
+
+    @classmethod
+    def from_txt_file(cls, file_path: str, db_path: Union[str, Path] = ":memory:",
+                      workers: int = 1, cache: bool = None):
+        """
+        打开 SQLite 数据库并载入txt或Markdown文件的药材，参数含义见 load_herbs
+
+        数据库已载入过内容相同的文件时直接使用，否则替换其中的全部药材，见 load_txt_file
+        """
+        db = cls(db_path)
+        db.load_txt_file(file_path, workers=workers, cache=cache)
+        return db
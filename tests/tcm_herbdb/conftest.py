@@ -0,0 +1,16 @@
+"""
+测试公用配置
+"""
+import pytest
+
+from tcm_herbdb import Config
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_cache_dir(tmp_path_factory):
+    """解析缓存写到临时目录，测试不读写用户的 ~/.cache/tcm_herbdb（子进程同样生效）"""
+    cache_dir = tmp_path_factory.mktemp("parse_cache")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Config, "CACHE_DIR", cache_dir)
+        patch.setenv("TCM_HERBDB_CACHE_DIR", str(cache_dir))
+        yield cache_dir
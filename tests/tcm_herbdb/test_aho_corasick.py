@@ -0,0 +1,44 @@
+"""
+Aho-Corasick 多模式串匹配的测试文件
+"""
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import AhoCorasick, ExtendedHerbDatabase
+
+
+class TestAhoCorasick:
+    """AhoCorasick 类和 search_many 的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {data_file}")
+        cls.db = ExtendedHerbDatabase.from_txt_file(data_file)
+
+    def test_overlapping_matches(self):
+        """测试互相重叠、互为前后缀的查询词都能被找到"""
+        automaton = AhoCorasick(["he", "she", "his", "hers", "he"])
+        assert automaton.terms == ["he", "she", "his", "hers"], "重复的查询词应该被去除"
+        matches = [(automaton.terms[term_id], end) for term_id, end in automaton.iter_matches("ushers")]
+        assert sorted(matches) == [("he", 4), ("hers", 6), ("she", 4)]
+        assert automaton.find("ahishe") == {0, 1, 2}
+
+    def test_search_many_matches_single_queries(self):
+        """测试批量查找的结果与逐个调用 get_herbs_by_field 一致"""
+        terms = ["解表", "清热", "止咳", "清热解毒", "活血", "不存在的功效"]
+        results = self.db.search_many(terms)
+        assert list(results) == terms
+        for term in terms:
+            assert results[term] == self.db.get_herbs_by_efficacy(term), f"{term} 的结果应该与单独查询一致"
+
+    def test_search_many_multiple_fields(self):
+        """测试在多个字段中查找时取各字段结果的并集"""
+        results = self.db.search_many(["肺", "麻黄"], fields=("properties", "application"))
+        for term, herbs in results.items():
+            expected = [herb for herb in self.db.herbs
+                        if term in herb["properties"] or term in herb["application"]]
+            assert herbs == expected
+        assert self.db.search_many([""])[""] == self.db.herbs, "空串应该匹配所有药材"
@@ -0,0 +1,97 @@
+"""
+ParseCache 类的测试文件
+"""
+import json
+import os
+import pickle
+import pytest
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import tcm_herbdb
+from tcm_herbdb import HerbParser, ParseCache
+
+
+class TestParseCache:
+    """ParseCache 类的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前定位数据文件"""
+        cls.data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not cls.data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {cls.data_file}")
+        cls.parser = HerbParser()
+
+    def test_cache_miss_then_hit(self, tmp_path):
+        """测试首次解析写入缓存，再次读取时命中缓存且结果一致"""
+        cache = ParseCache(tmp_path)
+        calls = []
+
+        def parse():
+            calls.append(1)
+            return self.parser.iter_herbs(self.data_file)
+
+        herbs = cache.get_or_parse(self.data_file, parse)
+        cached_herbs = cache.get_or_parse(self.data_file, parse)
+        assert len(calls) == 1, "第二次读取应该命中缓存而不重新解析"
+        assert cached_herbs == herbs, "缓存的结果应该与解析结果一致"
+        assert list(tmp_path.glob("*.pickle")), "应该生成缓存文件"
+
+    def test_key_changes_with_content(self, tmp_path):
+        """测试文件内容或结果形式变化时缓存键随之变化"""
+        copy = tmp_path / "herb.txt"
+        shutil.copy(self.data_file, copy)
+        cache = ParseCache(tmp_path / "cache")
+        key = cache.key(copy)
+        assert cache.key(copy, "compact") != key, "不同结果形式应该使用不同的缓存键"
+
+        with open(copy, "a", encoding="utf-8") as f:
+            f.write("。")
+        assert cache.key(copy) != key, "文件内容变化后缓存键应该变化"
+
+    def test_corrupt_cache_is_ignored(self, tmp_path):
+        """测试损坏的缓存文件会被忽略并重新解析"""
+        cache = ParseCache(tmp_path)
+        key = cache.key(self.data_file)
+        cache.path(key).write_bytes(b"not a pickle")
+        herbs = cache.get_or_parse(self.data_file, lambda: self.parser.iter_herbs(self.data_file))
+        assert len(herbs) > 0, "缓存损坏时应该重新解析"
+        assert cache.load(key) == herbs, "重新解析后应该覆盖损坏的缓存"
+
+    @pytest.mark.skipif(not hasattr(os, "getuid"), reason="需要 POSIX 文件权限")
+    def test_untrusted_cache_is_ignored(self, tmp_path):
+        """测试其他用户可写的缓存文件不会被反序列化"""
+        cache = ParseCache(tmp_path)
+        key = cache.key(self.data_file)
+        cache.path(key).write_bytes(pickle.dumps([{"name": "伪造"}]))
+        os.chmod(cache.path(key), 0o666)
+        assert cache.load(key) is None, "其他用户可写的缓存文件不应该被读取"
+        os.chmod(cache.path(key), 0o600)
+        assert cache.load(key) == [{"name": "伪造"}]
+
+    def test_library_cache_is_opt_in(self, tmp_path):
+        """测试库函数默认不写入解析缓存，命令行默认开启，缓存目录遵循 XDG_CACHE_HOME"""
+        script = (
+            "import json, sys\n"
+            "from tcm_herbdb import Config\n"
+            "from tcm_herbdb.database import load_herbs\n"
+            "load_herbs(sys.argv[1])\n"
+            "created = Config.CACHE_DIR.exists()\n"
+            "load_herbs(sys.argv[1], cache=True)\n"
+            "print(json.dumps([str(Config.CACHE_DIR), Config.CACHE_ENABLED, Config.CLI_CACHE_ENABLED, created,\n"
+            "                  len(list(Config.CACHE_DIR.glob('*.pickle'))), Config.CACHE_DIR.stat().st_mode & 0o777]))\n"
+        )
+        env = {key: value for key, value in os.environ.items()
+               if key not in ("TCM_HERBDB_CACHE", "TCM_HERBDB_CACHE_DIR")}
+        env.update(PYTHONPATH=str(Path(tcm_herbdb.__file__).parent.parent), XDG_CACHE_HOME=str(tmp_path))
+        completed = subprocess.run([sys.executable, "-c", script, str(self.data_file)], env=env,
+                                   capture_output=True, text=True, check=True)
+        cache_dir, enabled, cli_enabled, created, files, mode = json.loads(completed.stdout.splitlines()[-1])
+        assert cache_dir == str(tmp_path / "tcm_herbdb")
+        assert (enabled, cli_enabled, created) == (False, True, False), "库函数默认不应该创建缓存"
+        assert files == 1
+        if hasattr(os, "getuid"):
+            assert mode == 0o700, "缓存目录应该只对当前用户开放"
@@ -0,0 +1,118 @@
+"""
+压缩存储的测试文件
+"""
+import gc
+import pytest
+import tracemalloc
+from pathlib import Path
+
+from tcm_herbdb import CompressedHerb, ExtendedHerbDatabase, FieldCompressor, HerbParser, train_dictionary
+
+
+class TestCompression:
+    """FieldCompressor 类和压缩存储数据库的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        cls.data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not cls.data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {cls.data_file}")
+        cls.herbs = HerbParser().extract_herb_info(cls.data_file.read_text(encoding="utf-8"))
+
+    @pytest.mark.parametrize("codec", ["zlib", "lzma"])
+    def test_round_trip(self, codec):
+        """测试压缩后字段内容、顺序和字典式访问不变，冷字段压缩后明显变小"""
+        compressor = FieldCompressor.for_herbs(self.herbs, codec)
+        compressed = compressor.compress_all(self.herbs)
+        assert compressed == self.herbs
+        assert [list(herb) for herb in compressed] == [list(herb) for herb in self.herbs]
+
+        herb = compressed[0]
+        assert isinstance(herb, CompressedHerb)
+        assert herb.get("modern_research") == self.herbs[0]["modern_research"]
+        assert "full_content" in herb and "missing" not in herb
+        assert herb.get("missing", "") == ""
+        with pytest.raises(KeyError):
+            herb["missing"]
+
+        raw = sum(len("".join(herb[field] for field in compressor.fields).encode("utf-8")) for herb in self.herbs)
+        assert sum(herb.compressed_size for herb in compressed) * 2.5 < raw
+
+    def test_lru_cache(self):
+        """测试只有访问冷字段时才解压，最近解压的药材命中缓存，超出容量时淘汰"""
+        compressor = FieldCompressor(cache_size=2)
+        first, second, third = compressor.compress_all(self.herbs[:3])
+        first["name"], first["efficacy"]
+        assert compressor.info()["misses"] == 0
+
+        first["modern_research"], first["full_content"]
+        assert (compressor.hits, compressor.misses) == (1, 1)
+        second["modern_research"], third["modern_research"], first["modern_research"]
+        assert compressor.info() == {"hits": 1, "misses": 4, "size": 2, "maxsize": 2}
+
+    def test_dictionary(self):
+        """测试共享字典不超过给定大小，并能缩小压缩结果；lzma 不支持共享字典"""
+        texts = [herb["application"] for herb in self.herbs]
+        dictionary = train_dictionary(texts, size=4096)
+        assert 0 < len(dictionary) <= 4096
+        plain = sum(FieldCompressor().compress(herb).compressed_size for herb in self.herbs)
+        shared = sum(FieldCompressor(dictionary=dictionary).compress(herb).compressed_size for herb in self.herbs)
+        assert shared < plain
+        with pytest.raises(ValueError):
+            FieldCompressor("lzma", dictionary=dictionary)
+        with pytest.raises(ValueError):
+            FieldCompressor("bz2")
+
+    def test_database(self):
+        """测试压缩存储的数据库查询、添加药材和导出结果与不压缩时一致"""
+        db = ExtendedHerbDatabase(list(self.herbs), compress="zlib")
+        plain = ExtendedHerbDatabase(list(self.herbs))
+        assert all(isinstance(herb, CompressedHerb) for herb in db.herbs)
+        assert db.get_herbs_by_field("application", "风寒") == plain.get_herbs_by_field("application", "风寒")
+        assert db.get_herbs_by_name("麻黄") == plain.get_herbs_by_name("麻黄")
+        assert db.to_dataframe().equals(plain.to_dataframe())
+
+        db.add_herb(dict(self.herbs[0], name="测试药"))
+        assert isinstance(db.herbs[-1], CompressedHerb)
+        assert db.get_herbs_by_name("测试药")[0]["full_content"] == self.herbs[0]["full_content"]
+
+        shared = ExtendedHerbDatabase(list(self.herbs), compress=db.compressor)
+        assert shared.compressor is db.compressor
+        assert shared.herbs == self.herbs
+
+    def test_memory_saving(self):
+        """测试压缩存储使数据库的常驻内存（tracemalloc 统计）减少一半以上，且建库和建索引时不解压"""
+        text = self.data_file.read_text(encoding="utf-8")
+
+        def traced_size(**kwargs):
+            gc.collect()
+            tracemalloc.start()
+            try:
+                db = ExtendedHerbDatabase(HerbParser().extract_herb_info(text), **kwargs)
+                gc.collect()
+                return db, tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        _, plain = traced_size(use_index=False)
+        _, compressed = traced_size(use_index=False, compress="zlib")
+        assert compressed < plain * 0.6, f"压缩后 {compressed} 字节，未压缩 {plain} 字节"
+
+        db, indexed = traced_size(compress="zlib")
+        _, indexed_plain = traced_size()
+        assert indexed < indexed_plain * 0.75
+        assert db.compressor.misses == 0
+
+        # 索引读取的字段不压缩，建立延迟索引和校验子串时同样不解压
+        db.query("efficacy:解表 AND NOT precautions:孕妇")
+        db.get_herbs_by_field("application", "风寒")
+        assert db.compressor.misses == 0
+
+    def test_row_major_export(self, tmp_path):
+        """测试生成 DataFrame 和分批导出时每味药材只解压一次"""
+        db = ExtendedHerbDatabase(list(self.herbs), compress="zlib", use_index=False)
+        db.to_dataframe()
+        assert db.compressor.misses == len(self.herbs)
+        db.export_to_parquet(tmp_path / "herbs.parquet", batch_size=200)
+        assert db.compressor.misses == 2 * len(self.herbs)
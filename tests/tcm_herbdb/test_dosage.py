@@ -0,0 +1,59 @@
+"""
+用法用量结构化解析的测试文件
+"""
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import Dosage, ExtendedHerbDatabase, parse_dosage
+
+
+class TestDosage:
+    """parse_dosage、剂量区间索引和按剂量查找的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {data_file}")
+        cls.db = ExtendedHerbDatabase.from_txt_file(data_file)
+        cls.scan_db = ExtendedHerbDatabase(list(cls.db.herbs), use_index=False)
+
+    def test_parse_dosage(self):
+        """测试解析剂量范围、单位、用法和特殊要求"""
+        parsed = parse_dosage(r"煎服，  $9\sim 15\mathrm{g}$  ，先煎。外用适量。")
+        assert (parsed["min"], parsed["max"], parsed["unit"]) == (9, 15, "g")
+        assert parsed["methods"] == ["煎服", "外用"]
+        assert parsed["flags"] == ["先煎"]
+
+        parsed = parse_dosage(r"内服， $0.3 \sim 0.6\mathrm{g}$ ，宜入丸、散；1日用量不超过  $1.5\mathrm{g}$  。")
+        assert parsed["ranges"] == [(0.3, 0.6, "g"), (1.5, 1.5, "g")]
+        assert "入丸散" in parsed["methods"]
+
+        assert parse_dosage(r"$2\sim 3$  枚，沸水泡服。")["unit"] == "枚"
+        assert parse_dosage(r"每日  $2\sim 3$  次。")["ranges"] == [], "服用次数不是剂量"
+        assert parse_dosage(r"外用  $20\% \sim 30\%$  酊剂。")["ranges"] == [], "百分比浓度不是剂量"
+        assert parse_dosage("外用适量。")["min"] is None
+
+    def test_index_matches_scan(self):
+        """测试剂量区间索引与全表扫描结果一致"""
+        conditions = [(15, 30), (None, 3), (10, None), (None, None, 3), (3, 10, 9), (0, 100, None, "ml")]
+        for condition in conditions:
+            result = self.db.get_herbs_by_dosage(*condition)
+            assert result == self.scan_db.get_herbs_by_dosage(*condition), f"{condition} 的结果应该与全表扫描一致"
+
+        overlapping = self.db.get_herbs_by_dosage(15, 30)
+        assert any(herb["name"] == "猫爪草" for herb in overlapping), "猫爪草 15~30g 应该与 15~30g 相交"
+        for herb in self.db.get_herbs_by_dosage(max_dose=3):
+            assert parse_dosage(herb["dosage"])["max"] <= 3
+
+    def test_dosage_predicate(self):
+        """测试组合查询中的剂量条件使用区间索引"""
+        condition = Dosage(max_dose=0.1)
+        assert self.db.explain(condition).splitlines()[1].startswith("1. 索引扫描 剂量")
+        assert self.db.query(condition) == self.scan_db.query(condition)
+
+    def test_invalid_range(self):
+        """测试下限大于上限时抛出ValueError"""
+        with pytest.raises(ValueError):
+            self.db.get_herbs_by_dosage(30, 15)
@@ -0,0 +1,59 @@
+"""
+流式导出的测试文件
+"""
+import json
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import HerbDatabase, herb_columns
+
+
+class TestExporters:
+    """流式导出的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {data_file}")
+        cls.db = HerbDatabase.from_txt_file(str(data_file), cache=False)
+        cls.herbs = cls.db.herbs
+
+    def test_jsonl_round_trip(self, tmp_path):
+        """测试JSON Lines导出后逐行读回与原数据一致"""
+        output = tmp_path / "herbs.jsonl"
+        self.db.export_to_jsonl(str(output))
+        with open(output, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        assert rows == self.herbs, "JSON Lines每行应该对应一味药材"
+
+    def test_parquet_round_trip(self, tmp_path):
+        """测试Parquet分批导出的行组数、字典编码列和内容"""
+        pq = pytest.importorskip("pyarrow.parquet")
+        output = tmp_path / "herbs.parquet"
+        self.db.export_to_parquet(str(output), batch_size=100)
+
+        metadata = pq.ParquetFile(output).metadata
+        assert metadata.num_rows == len(self.herbs)
+        assert metadata.num_row_groups == -(-len(self.herbs) // 100), "每批应该写成一个行组"
+
+        table = pq.read_table(output)
+        assert table.schema.field("source").type.value_type == "string"
+        assert str(table.schema.field("source").type).startswith("dictionary"), "来源列应该使用字典编码"
+        assert table.column_names == herb_columns(self.herbs)
+        assert table.to_pylist() == self.herbs
+
+    def test_arrow_round_trip(self, tmp_path):
+        """测试Arrow IPC分批导出后读回与原数据一致"""
+        pa = pytest.importorskip("pyarrow")
+        output = tmp_path / "herbs.arrow"
+        self.db.export(str(output), format="arrow")
+        with pa.memory_map(str(output)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        assert table.to_pylist() == self.herbs
+
+    def test_unknown_format(self, tmp_path):
+        """测试不支持的导出格式抛出ValueError"""
+        with pytest.raises(ValueError):
+            self.db.export(str(tmp_path / "herbs.xml"), format="xml")
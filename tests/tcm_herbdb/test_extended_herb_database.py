@@ -3,6 +3,7 @@ ExtendedHerbDatabase 类的测试文件
 """
 import pytest
 import os
+import shutil
 import sys
 from pathlib import Path
 
@@ -41,6 +42,25 @@ class TestExtendedHerbDatabase:
         assert "pinyin" in actual_columns, "DataFrame应该包含pinyin列"
         assert "source" in actual_columns, "DataFrame应该包含source列"
 
+    def test_to_dataframe_projection(self):
+        """测试列投影、派生药性列和分类类型"""
+        columns = ["name", "efficacy", "source", "nature", "meridians"]
+        df = self.extended_db.to_dataframe(columns=columns, categorical=True)
+        assert list(df.columns) == columns, "DataFrame应该只包含指定的列且顺序一致"
+        assert df["name"].tolist() == [herb["name"] for herb in self.extended_db.herbs]
+        assert df["source"].dtype == "category", "source列应该是分类类型"
+        assert df["nature"].cat.ordered, "四气应该是有序分类"
+
+        mahuang = df[df["name"] == "麻黄"].iloc[0]
+        assert mahuang["nature"] == "温"
+        assert mahuang["meridians"] == "肺、膀胱"
+
+        full = self.extended_db.to_dataframe()
+        assert df["efficacy"].tolist() == full["efficacy"].tolist(), "投影列的内容应该与完整DataFrame一致"
+
+        with pytest.raises(KeyError):
+            self.extended_db.to_dataframe(columns=["name", "unknown"])
+
     def test_export_to_csv(self, tmp_path):
         """测试导出到CSV功能"""
         csv_file = tmp_path / "test_herbs.csv"
@@ -55,4 +75,69 @@ class TestExtendedHerbDatabase:
             # 检查是否包含预期的列名（顺序可能不同）
             assert "name" in content, "CSV文件应该包含name列"
             assert "pinyin" in content, "CSV文件应该包含pinyin列"
-            assert "source" in content, "CSV文件应该包含source列"
\ No newline at end of file
+            assert "source" in content, "CSV文件应该包含source列"
+
+    def test_from_txt_file_compact(self):
+        """测试紧凑存储模式与普通模式的数据和查询结果一致"""
+        compact_db = ExtendedHerbDatabase.from_txt_file(self.data_file, compact=True)
+        assert compact_db.get_herb_count() == self.extended_db.get_herb_count()
+        assert compact_db.get_herbs_by_efficacy("解表") == self.extended_db.get_herbs_by_efficacy("解表")
+        df = compact_db.to_dataframe()
+        assert len(df) == compact_db.get_herb_count(), "紧凑记录也应该能转换为DataFrame"
+
+    def test_refresh_from_txt_file(self, tmp_path):
+        """测试增量更新只报告变化的条目，且结果与完整解析一致"""
+        txt_file = tmp_path / "herb.txt"
+        shutil.copy(self.data_file, txt_file)
+        db = ExtendedHerbDatabase.from_txt_file(txt_file, cache=False)
+        assert db.refresh_from_txt_file(txt_file) == {"added": [], "removed": [], "changed": []}
+
+        content = txt_file.read_text(encoding="utf-8")
+        txt_file.write_text(content.replace("发汗解表，宣肺平喘", "发汗解表，宣肺定喘", 1), encoding="utf-8")
+        assert db.refresh_from_txt_file(txt_file) == {"added": [], "removed": [], "changed": ["麻黄"]}
+        assert [herb["name"] for herb in db.get_herbs_by_efficacy("宣肺定喘")] == ["麻黄"], "索引应该同步更新"
+        assert db.get_herbs_by_efficacy("宣肺平喘") == [], "旧内容不应该再被索引查到"
+
+        start, end = content.find("桂枝Guizhi"), content.find("紫苏叶Zisuy")
+        txt_file.write_text(content[:start] + content[end:], encoding="utf-8")
+        assert db.refresh_from_txt_file(txt_file) == {"added": [], "removed": ["桂枝"], "changed": ["麻黄"]}
+        expected = ExtendedHerbDatabase.from_txt_file(txt_file, cache=False)
+        assert db.herbs == expected.herbs, "增量更新结果应该与完整解析一致"
+        assert db.get_herbs_by_attributes(natures="温") == expected.get_herbs_by_attributes(natures="温")
+
+    def test_refresh_export(self, tmp_path):
+        """测试增量更新同时更新CSV导出，内容与完整导出一致，修改处之前的内容不重写"""
+        txt_file, csv_file, expected_csv = tmp_path / "herb.txt", tmp_path / "herbs.csv", tmp_path / "expected.csv"
+        shutil.copy(self.data_file, txt_file)
+        db = ExtendedHerbDatabase.from_txt_file(txt_file, cache=False)
+        db.refresh_from_txt_file(txt_file, export_path=csv_file)
+        db.export_to_csv(expected_csv)
+        assert csv_file.read_bytes() == expected_csv.read_bytes()
+
+        content = txt_file.read_text(encoding="utf-8")
+        last = content.rfind("【功效】")
+        txt_file.write_text(content[:last] + content[last:].replace("。", "。。", 1), encoding="utf-8")
+        before = csv_file.read_bytes()
+        changes = db.refresh_from_txt_file(txt_file, export_path=csv_file)
+        assert changes["changed"] == [db.herbs[-1]["name"]] and not changes["added"] and not changes["removed"]
+        ExtendedHerbDatabase.from_txt_file(txt_file, cache=False).export_to_csv(expected_csv)
+        after = csv_file.read_bytes()
+        assert after == expected_csv.read_bytes()
+        unchanged = before.rfind(("\n" + db.herbs[-1]["name"] + ",").encode("utf-8")) + 1
+        assert unchanged > 0 and after[:unchanged] == before[:unchanged]
+
+        # 在条目中间插入新的表头
+        first = content.find("紫苏叶Zisuy")
+        txt_file.write_text(content[:first] + "新药Xinyao（《测试》）\n正文。\n" + content[first:], encoding="utf-8")
+        assert db.refresh_from_txt_file(txt_file, export_path=csv_file)["added"] == ["新药"]
+        expected = ExtendedHerbDatabase.from_txt_file(txt_file, cache=False)
+        expected.export_to_csv(expected_csv)
+        assert db.herbs == expected.herbs
+        assert csv_file.read_bytes() == expected_csv.read_bytes()
+
+    def test_refresh_markdown(self, tmp_path):
+        """测试 Markdown 教材不支持增量更新"""
+        md_file = tmp_path / "herb.md"
+        md_file.write_text("# 麻黄\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="Markdown"):
+            ExtendedHerbDatabase().refresh_from_txt_file(md_file)
@@ -59,6 +59,44 @@ class TestHerbDatabase:
             for herb in found_herbs:
                 assert herb["name"] == first_herb_name, "返回的药材名称应该匹配"
 
+    def test_get_herbs_by_pinyin(self):
+        """测试按拼音查找药材功能，忽略声调、大小写和空格"""
+        found_herbs = self.database.get_herbs_by_pinyin("mahuang")
+        assert [herb["name"] for herb in found_herbs] == ["麻黄"], "去掉声调的拼音应该能查到麻黄"
+        assert self.database.get_herbs_by_pinyin("Má huáng") == found_herbs, "带声调和空格的拼音应该能查到麻黄"
+        assert self.database.get_herbs_by_pinyin("Máhuáng", exact=True) == found_herbs, "精确拼音应该能查到麻黄"
+        assert self.database.get_herbs_by_pinyin("mahuang", exact=True) == [], "精确查找不应忽略声调"
+
+    def test_hash_index_matches_scan(self):
+        """测试名称和拼音哈希索引与全表扫描结果一致"""
+        scan_db = ExtendedHerbDatabase(self.database.herbs, use_index=False)
+        for herb in self.database.herbs[:100]:
+            assert self.database.get_herbs_by_name(herb["name"]) == scan_db.get_herbs_by_name(herb["name"])
+            for exact in (True, False):
+                assert self.database.get_herbs_by_pinyin(herb["pinyin"], exact) == \
+                    scan_db.get_herbs_by_pinyin(herb["pinyin"], exact)
+
+    def test_fuzzy_search(self):
+        """测试容忍错别字、缺少声调和多余空格的模糊查找"""
+        for query in ("ma huang", "mahaung", "Máhuáng"):
+            matches = self.database.fuzzy_search(query)
+            assert matches[0][0]["name"] == "麻黄", f"{query} 应该首先匹配到麻黄"
+        herb, distance = self.database.fuzzy_search("桂支")[0]
+        assert herb["name"] == "桂枝" and distance == 1, "错一个字的名称应该匹配到桂枝"
+
+        matches = self.database.fuzzy_search("huangqin", k=3)
+        assert len(matches) <= 3
+        assert [distance for _, distance in matches] == sorted(distance for _, distance in matches)
+
+    def test_fuzzy_index_matches_scan(self):
+        """测试模糊查找索引与逐个计算编辑距离的结果一致"""
+        scan_db = ExtendedHerbDatabase(self.database.herbs, use_index=False)
+        queries = ["mahaung", "gui zhi", "chuanxiong", "当归尾", "人参", "麻", "zzz"]
+        for query in queries:
+            for max_distance in (None, 0, 1, 2):
+                assert self.database.fuzzy_search(query, k=50, max_distance=max_distance) == \
+                    scan_db.fuzzy_search(query, k=50, max_distance=max_distance), f"{query} 的模糊查找结果应该与全表扫描一致"
+
     def test_get_herbs_by_property(self):
         """测试按药性查找药材功能"""
         # 使用一个常见的药性进行测试
@@ -81,6 +119,46 @@ class TestHerbDatabase:
                 # 与上面类似，我们只是测试函数的执行
                 assert isinstance(found_herbs, list), "返回的应该是一个列表"
 
+    def test_indexed_search_matches_scan(self):
+        """测试 n-gram 索引查询与全表扫描结果一致"""
+        scan_db = ExtendedHerbDatabase(self.database.herbs, use_index=False)
+        for field in ("properties", "efficacy", "application", "precautions"):
+            for value in ("温", "归肺经", "解表", "清热解毒", "孕妇", "", "不存在的功效"):
+                assert self.database.get_herbs_by_field(field, value) == scan_db.get_herbs_by_field(field, value), \
+                    f"字段 {field} 查询 '{value}' 的结果应该与全表扫描一致"
+
+    def test_add_herb_updates_index(self):
+        """测试添加药材后索引同步更新"""
+        db = ExtendedHerbDatabase(list(self.database.herbs))
+        new_herb = dict(self.database.herbs[0], name="索引测试药材", efficacy="索引测试功效")
+        db.add_herb(new_herb)
+        assert db.get_herbs_by_efficacy("索引测试功效") == [new_herb], "新添加的药材应该能被索引查到"
+
+    def test_lazy_indexes(self):
+        """测试 n-gram 和 TF-IDF 索引在第一次查询时才建立，建立前添加的药材同样能查到"""
+        db = ExtendedHerbDatabase(list(self.database.herbs))
+        assert db._lazy_indexes == {}
+        new_herb = dict(self.database.herbs[0], name="延迟索引药材", efficacy="延迟索引功效")
+        db.add_herb(new_herb)
+        assert db.get_herbs_by_efficacy("延迟索引功效") == [new_herb]
+        assert list(db._lazy_indexes) == ["text_index"]
+        assert db.similar_herbs(self.database.herbs[0]["name"], k=1)[0][0] == new_herb
+        assert set(db._lazy_indexes) == {"text_index", "similarity_index"}
+
+        plain = ExtendedHerbDatabase.from_txt_file(self.data_file, use_index=False)
+        assert plain.text_index is None and plain.name_index is None
+        assert plain.get_herbs_by_name("麻黄") == self.database.get_herbs_by_name("麻黄")
+
+    def test_get_herbs_by_attributes(self):
+        """测试按结构化药性查找药材，且与不使用索引的结果一致"""
+        found_herbs = self.database.get_herbs_by_attributes(natures="温", meridians=["肺", "胃"])
+        assert "紫苏叶" in [herb["name"] for herb in found_herbs], "紫苏叶性温，归肺、脾、胃经"
+        for herb in found_herbs:
+            assert "温" in herb["properties"] and "肺" in herb["properties"] and "胃" in herb["properties"]
+
+        scan_db = ExtendedHerbDatabase(self.database.herbs, use_index=False)
+        assert found_herbs == scan_db.get_herbs_by_attributes(natures="温", meridians=["肺", "胃"])
+
     def test_get_all_herbs(self):
         """测试获取所有药材功能"""
         all_herbs = self.database.get_all_herbs()
@@ -2,6 +2,7 @@
 HerbParser 类的测试文件
 """
 import pytest
+import io
 import os
 import sys
 from pathlib import Path
@@ -67,6 +68,20 @@ class TestHerbParser:
         result = self.parser.extract_section(sample_content, "【功效】")
         assert result == "清热解毒，凉血消斑。"
 
+    def test_split_sections_matches_extract_section(self):
+        """测试 split_sections 与逐个调用 extract_section 的结果一致"""
+        for herb in self.herbs:
+            content = herb["full_content"]
+            sections = self.parser.split_sections(content)
+            for title in ("药性", "功效", "应用", "用法用量", "使用注意", "现代研究", "鉴别用药", "其他"):
+                expected = self.parser.extract_section(content, f"【{title}】")
+                assert sections.get(title, "") == expected, f"{herb['name']} 的【{title}】不一致"
+
+    def test_extra_sections_kept(self):
+        """测试【鉴别用药】和【其他】章节被保留"""
+        assert any(herb["differentiation"] for herb in self.herbs), "应该有药材包含【鉴别用药】"
+        assert any(herb["others"] for herb in self.herbs), "应该有药材包含【其他】"
+
     def test_get_first_n_herbs(self):
         """测试获取前n个药材的功能"""
         n = 5
@@ -74,6 +89,63 @@ class TestHerbParser:
         assert len(first_n_herbs) == n, f"应该返回{n}个药材"
         assert len(first_n_herbs) <= len(self.herbs), "返回的药材数量不应超过总数量"
 
+    def test_iter_herbs_matches_extract_herb_info(self):
+        """测试流式解析与一次性解析的结果一致"""
+        streamed = list(self.parser.iter_herbs(self.data_file))
+        assert streamed == self.herbs, "流式解析结果应该与 extract_herb_info 一致"
+
+    def test_iter_herbs_small_chunks(self):
+        """测试很小的读取块也不会错切条目边界"""
+        streamed = list(self.parser.iter_herbs(io.StringIO(self.content), chunk_size=100))
+        assert streamed == self.herbs, "小块读取的结果应该与 extract_herb_info 一致"
+
+    def test_get_first_n_herbs_matches_full_parse(self):
+        """测试提前结束的 get_first_n_herbs 与完整解析的前n个一致"""
+        assert self.parser.get_first_n_herbs(self.data_file, 3) == self.herbs[:3]
+
+    def test_split_shards_at_herb_headers(self):
+        """测试分片在药材表头处切分且拼接后与原文相同"""
+        shards = self.parser.split_shards(self.content, 4)
+        assert len(shards) > 1, "应该切分出多个分片"
+        assert "".join(shards) == self.content, "分片拼接后应该与原文相同"
+        for shard in shards[1:]:
+            assert self.parser.regex.match(shard), "除第一个分片外，每个分片都应该从药材表头开始"
+
+    def test_extract_herb_info_parallel(self):
+        """测试并行解析与串行解析的结果一致"""
+        herbs = self.parser.extract_herb_info_parallel(self.content, workers=2)
+        assert herbs == self.herbs, "并行解析结果应该与串行解析一致"
+
+        herbs = self.parser.extract_herb_info_parallel([self.data_file, self.data_file], workers=2)
+        assert herbs == self.herbs + self.herbs, "多个文件应该按顺序合并"
+
+    def test_extract_herb_records(self):
+        """测试紧凑记录与字典结果一致，且共享同一份文本"""
+        records = self.parser.extract_herb_records(self.content)
+        assert records == self.herbs, "紧凑记录的内容应该与 extract_herb_info 一致"
+        record = records[0]
+        assert dict(record) == self.herbs[0], "紧凑记录应该支持转换为字典"
+        assert record.get("efficacy") == self.herbs[0]["efficacy"], "紧凑记录应该支持字典式访问"
+        start, end = record.span("full_content")
+        assert self.content[start:end] == record["full_content"], "偏移量应该指向共享文本"
+
+    def test_extract_herb_info_mmap(self):
+        """测试内存映射解析与 extract_herb_info 的结果一致"""
+        herbs = self.parser.extract_herb_info_mmap(self.data_file)
+        assert herbs == self.herbs, "内存映射解析结果应该与 extract_herb_info 一致"
+
+    def test_mmap_header_edge_cases(self, tmp_path):
+        """测试全角空格、跨行来源和过滤条目在字节正则下的匹配与 str 正则一致"""
+        content = ("前言。\n麻黄\u3000Máhuáng（《神农本草经》）\n【药性】温。\n结束。\n"
+                   "桂 枝 Guìzhī xx《名医\n别录》\n【功效】解肌。$\n附药：苏梗Sugeng《本草》\n内容\n")
+        txt_file = tmp_path / "sample.txt"
+        txt_file.write_text(content, encoding="utf-8")
+        assert self.parser.extract_herb_info_mmap(txt_file) == self.parser.extract_herb_info(content)
+
+        empty_file = tmp_path / "empty.txt"
+        empty_file.write_text("", encoding="utf-8")
+        assert self.parser.extract_herb_info_mmap(empty_file) == []
+
     def test_herb_count_reasonable(self):
         """测试药材数量是否在合理范围内"""
         assert 400 <= len(self.herbs) <= 600, f"药材数量 {len(self.herbs)} 不在合理范围内"
\ No newline at end of file
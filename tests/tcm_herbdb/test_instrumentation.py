@@ -0,0 +1,125 @@
+"""
+运行指标的测试文件
+"""
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import ExtendedHerbDatabase, HerbParser, MetricsRegistry, metrics
+from tcm_herbdb.instrumentation import (ENTRIES_TOTAL, FILTERED_TOTAL, HERBS_TOTAL, QUERY_SECONDS,
+                                        STAGE_SECONDS)
+
+
+class TestInstrumentation:
+    """MetricsRegistry 类和各处埋点的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        cls.data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not cls.data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {cls.data_file}")
+        cls.text = cls.data_file.read_text(encoding="utf-8")
+
+    def setup_method(self):
+        metrics.reset()
+        metrics.enable()
+
+    def teardown_method(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_disabled_records_nothing(self):
+        """测试关闭时不记录任何指标"""
+        metrics.disable()
+        HerbParser().extract_herb_info(self.text)
+        with metrics.timer(STAGE_SECONDS, stage="test"):
+            pass
+        assert metrics.to_prometheus() == ""
+
+    def test_parse_stages_and_counters(self):
+        """测试解析的各阶段计时和条目计数，流式解析与整体解析一致"""
+        herbs = HerbParser().extract_herb_info(self.text)
+        for stage in ("match_headers", "extract_sections"):
+            assert metrics.histogram(STAGE_SECONDS, stage=stage).count == 1
+        assert metrics.counter_value(HERBS_TOTAL) == len(herbs)
+        filtered = sum(metrics.counter_value(FILTERED_TOTAL, prefix=prefix) for prefix in ("附药", "附方", "附录"))
+        assert metrics.counter_value(ENTRIES_TOTAL) == len(herbs) + filtered
+
+        metrics.reset()
+        streamed = list(HerbParser().iter_herbs(self.data_file, chunk_size=4096))
+        assert streamed == herbs
+        assert metrics.counter_value(HERBS_TOTAL) == len(herbs)
+        assert metrics.histogram(STAGE_SECONDS, stage="match_headers").count > 1
+
+    def test_mmap_and_markdown_stages(self):
+        """测试内存映射和 Markdown 解析记录与流式解析相同的阶段计时和计数"""
+        herbs = list(HerbParser().iter_herbs_mmap(self.data_file))
+        for stage in ("match_headers", "extract_sections"):
+            assert metrics.histogram(STAGE_SECONDS, stage=stage).count >= 1
+        assert metrics.counter_value(HERBS_TOTAL) == len(herbs)
+        filtered = sum(metrics.counter_value(FILTERED_TOTAL, prefix=prefix) for prefix in ("附药", "附方", "附录"))
+        assert metrics.counter_value(ENTRIES_TOTAL) == len(herbs) + filtered
+
+        metrics.reset()
+        markdown_file = self.data_file.parent.parent / "raw" / "herb.md"
+        herbs = list(HerbParser().iter_herbs_markdown(markdown_file))
+        for stage in ("match_headers", "extract_sections"):
+            assert metrics.histogram(STAGE_SECONDS, stage=stage).count > 1
+        assert metrics.counter_value(HERBS_TOTAL) == len(herbs)
+
+    def test_database_stages_and_query_latency(self, tmp_path):
+        """测试建立索引、导出阶段计时和查询延迟，嵌套查询只记录最外层"""
+        db = ExtendedHerbDatabase(HerbParser().extract_herb_info(self.text))
+        db.export_to_csv(str(tmp_path / "herbs.csv"))
+        for stage in ("build_indexes", "dataframe", "csv_write"):
+            assert metrics.histogram(STAGE_SECONDS, stage=stage).count == 1
+
+        db.get_herbs_by_property("温")
+        db.get_herbs_by_property("温")
+        assert metrics.histogram(QUERY_SECONDS, method="get_herbs_by_property").count == 2, "命中缓存的调用也应计时"
+        assert metrics.histogram(QUERY_SECONDS, method="get_herbs_by_field") is None
+
+        db.query("efficacy:解表")
+        db.query_with_plan("efficacy:解表")
+        assert metrics.histogram(QUERY_SECONDS, method="query").count == 1
+        assert metrics.histogram(QUERY_SECONDS, method="query_with_plan").count == 1, "query 内部的调用不单独计时"
+
+    def test_prometheus_format(self):
+        """测试 Prometheus 文本格式的计数器、累积直方图和收集器输出"""
+        registry = MetricsRegistry(enabled=True, buckets=(0.1, 1))
+        registry.inc("jobs_total", 2, kind='a"b')
+        for value in (0.05, 0.5, 5):
+            registry.observe("latency_seconds", value, stage="x")
+        registry.describe("latency_seconds", "耗时")
+        collector = registry.register_collector(lambda: [("cache_size", {}, 3)])
+
+        text = registry.to_prometheus()
+        assert 'jobs_total{kind="a\\"b"} 2' in text
+        assert "# HELP latency_seconds 耗时\n# TYPE latency_seconds histogram" in text
+        assert 'latency_seconds_bucket{stage="x",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{stage="x",le="1"} 2' in text
+        assert 'latency_seconds_bucket{stage="x",le="+Inf"} 3' in text
+        assert 'latency_seconds_count{stage="x"} 3' in text
+        assert "# TYPE cache_size gauge\ncache_size 3" in text
+
+        registry.unregister_collector(collector)
+        assert "cache_size" not in registry.to_prometheus()
+
+    def test_timed_and_report(self):
+        """测试计时装饰器在调用时判断开关，以及汇总表的内容"""
+        registry = MetricsRegistry()
+
+        @registry.timed(STAGE_SECONDS, stage="work")
+        def work():
+            return 42
+
+        assert work() == 42 and registry.histogram(STAGE_SECONDS, stage="work") is None
+        registry.enable()
+        assert work() == 42
+        assert registry.histogram(STAGE_SECONDS, stage="work").count == 1
+        assert "work" in registry.report()
+
+        with pytest.raises(ValueError):
+            with registry.timer(STAGE_SECONDS, stage="fail"):
+                raise ValueError
+        assert registry.histogram(STAGE_SECONDS, stage="fail").count == 1
@@ -0,0 +1,54 @@
+"""
+按需导入的测试文件
+"""
+import json
+import os
+import subprocess
+import sys
+import pytest
+from pathlib import Path
+
+import tcm_herbdb
+
+
+# 导入包或查看 CLI 帮助时不应加载的模块
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "asyncio", "sqlite3", "concurrent.futures.process",
+                 "tcm_herbdb.database", "tcm_herbdb.server")
+
+
+def loaded_modules(code: str):
+    """在新的解释器中执行 code，返回其中已加载的 HEAVY_MODULES"""
+    script = (f"import sys\n{code}\n"
+              f"import json; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    env = dict(os.environ, PYTHONPATH=str(Path(tcm_herbdb.__file__).parent.parent))
+    completed = subprocess.run([sys.executable, "-c", script], env=env,
+                               capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+class TestLazyImports:
+    """包和 CLI 按需导入的测试"""
+
+    def test_import_package_is_light(self):
+        """测试 import tcm_herbdb 和解析药材不加载 pandas、数据库和查询服务等模块"""
+        assert loaded_modules("import tcm_herbdb") == []
+        assert loaded_modules("import tcm_herbdb; tcm_herbdb.HerbParser().extract_herb_info('')") == []
+
+    def test_cli_help_is_light(self):
+        """测试加载 CLI 模块（如查看 --help）不加载 pandas 和查询服务"""
+        assert loaded_modules("import tcm_herbdb.cli") == []
+
+    def test_lazy_attributes(self):
+        """测试按需导入的名称与直接从模块导入的对象相同，未知名称抛出AttributeError"""
+        from tcm_herbdb.database import BaseHerbDatabase, HerbDatabase
+        from tcm_herbdb.server import HerbServer
+
+        assert tcm_herbdb.ExtendedHerbDatabase is HerbDatabase
+        assert tcm_herbdb.HerbDatabase is HerbDatabase
+        assert tcm_herbdb.BaseHerbDatabase is BaseHerbDatabase
+        assert tcm_herbdb.HerbServer is HerbServer
+        assert "ExtendedHerbDatabase" in dir(tcm_herbdb)
+        for name in tcm_herbdb.__all__:
+            assert getattr(tcm_herbdb, name) is not None
+        with pytest.raises(AttributeError):
+            tcm_herbdb.missing_name
@@ -0,0 +1,104 @@
+"""
+Markdown 教材解析的测试文件
+"""
+import io
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import CategoryIndex, ExtendedHerbDatabase, HerbParser, metrics
+from tcm_herbdb.database import load_herbs
+from tcm_herbdb.instrumentation import ENTRIES_TOTAL, UNMATCHED_HEADERS_TOTAL
+
+
+class TestMarkdown:
+    """Markdown 教材解析和章节层级索引的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        cls.data_file = Path(__file__).parent.parent.parent / "data" / "raw" / "herb.md"
+        if not cls.data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {cls.data_file}")
+        cls.parser = HerbParser()
+        cls.herbs = list(cls.parser.iter_herbs_markdown(cls.data_file))
+        cls.db = ExtendedHerbDatabase(cls.herbs)
+
+    def test_same_as_plain_text(self):
+        """测试去掉章节标签后与整理成纯文本再解析的结果一致"""
+        with open(self.data_file, encoding="utf-8") as f:
+            text = "".join(line + "\n" for line, _ in self.parser.iter_markdown_lines(f))
+        expected = self.parser.extract_herb_info(text)
+        assert len(self.herbs) > 400
+        stripped = [{key: value for key, value in herb.items()
+                     if key not in ("chapter", "category", "subcategory")} for herb in self.herbs]
+
+        # 表头不符合解析正则的药材在纯文本中并入上一味药材，Markdown 解析按标题拆开
+        split = [i for i, herb in enumerate(self.herbs) if herb["name"] in ("檀香", "刀豆", "儿茶")]
+        assert len(split) == 3 and len(self.herbs) == len(expected) + 3
+        merged = [i - 1 for i in split]
+        for i in split:
+            previous = next(herb for herb in expected if herb["name"] == self.herbs[i - 1]["name"])
+            assert self.herbs[i]["full_content"].split("\n")[0] in previous["full_content"]
+            assert self.herbs[i]["full_content"].split("\n")[0] not in self.herbs[i - 1]["full_content"]
+        names = {self.herbs[i]["name"] for i in merged}
+        assert [herb for i, herb in enumerate(stripped) if i not in split and i not in merged] == \
+            [herb for herb in expected if herb["name"] not in names]
+
+    def test_unmatched_header(self):
+        """测试表头因 OCR 错误不符合解析正则的药名标题仍拆成单独的条目，并记录计数"""
+        source = io.StringIO("# 第十五章 理气药\n凡以疏理气机为主要功效的药物，称理气药。\n## 沉香\n## Chénxiāng（《名医别录》）\n【功效】行气止痛。\n"
+                             "## 檀香\n## Lionsing（名：别是\n【功效】行气温中。\n")
+        metrics.reset()
+        metrics.enable()
+        try:
+            herbs = list(self.parser.iter_herbs_markdown(source))
+            assert metrics.counter_value(UNMATCHED_HEADERS_TOTAL) == 1
+            assert metrics.counter_value(ENTRIES_TOTAL) == 2
+        finally:
+            metrics.disable()
+            metrics.reset()
+        assert [(herb["name"], herb["pinyin"], herb["source"]) for herb in herbs] == [
+            ("沉香", "Chénxiāng", "《名医别录》"), ("檀香", "Lionsing", "")]
+        # 与 extract_herb_info 一致，后面还有条目时不含最后一行末尾的字符
+        assert [herb["efficacy"] for herb in herbs] == ["行气止痛", "行气温中。"]
+        assert herbs[1]["category"] == "理气药"
+
+    def test_category_tags(self):
+        """测试药材带有所属的章、类别和节"""
+        herb = self.db.get_herbs_by_name("麻黄")[0]
+        assert (herb["chapter"], herb["category"], herb["subcategory"]) == ("第八章", "解表药", "发散风寒药")
+        assert all(herb["chapter"] and herb["category"] for herb in self.herbs)
+
+    def test_markdown_lines(self):
+        """测试标题标记去除、行内标题拆分，以及名称标题与拼音行的合并"""
+        source = io.StringIO("# 第八章 解表药\n\n## 第一节 发散风寒药\n"
+                             "## 麻黄\nMáhuáng《神农本草经》\n正文。## 桂枝 Guìzhī《名医别录》\n")
+        assert list(self.parser.iter_markdown_lines(source)) == [
+            ("第八章 解表药", True),
+            ("第一节 发散风寒药", True),
+            ("麻黄Máhuáng《神农本草经》", True),
+            ("正文。", False),
+            ("桂枝 Guìzhī《名医别录》", True),
+        ]
+
+    def test_category_lookup(self):
+        """测试按章、类别或节查找与全表扫描一致，空字符串返回空列表"""
+        categories = self.db.get_categories()
+        assert "发散风寒药" in categories["解表药"]
+        for name in ["第八章", "解表药", "发散风寒药", "不存在的类别"]:
+            expected = [herb for herb in self.herbs
+                        if name in (herb["chapter"], herb["category"], herb["subcategory"])]
+            assert self.db.get_herbs_by_category(name) == expected
+            assert ExtendedHerbDatabase(self.herbs, use_index=False).get_herbs_by_category(name) == expected
+        assert self.db.get_herbs_by_category("") == []
+
+        index = CategoryIndex()
+        index.add(0, self.herbs[0])
+        index.remove(0, self.herbs[0])
+        assert index.entries == {}
+
+    def test_load_markdown(self):
+        """测试 load_herbs 按后缀识别 Markdown 教材，不支持紧凑记录"""
+        assert load_herbs(str(self.data_file), cache=False) == self.herbs
+        with pytest.raises(ValueError):
+            load_herbs(str(self.data_file), compact=True, cache=False)
@@ -0,0 +1,50 @@
+"""
+药性结构化解析的测试文件
+"""
+import pytest
+
+from tcm_herbdb import PropertyIndex, parse_properties
+
+
+class TestProperties:
+    """parse_properties 函数和 PropertyIndex 类的测试"""
+
+    def test_parse_properties(self):
+        """测试拆分五味、四气和归经"""
+        result = parse_properties("辛、微苦，温。归肺、膀胱经。")
+        assert result == {"flavors": ["辛", "苦"], "nature": "温", "meridians": ["肺", "膀胱"]}
+
+    def test_parse_properties_with_toxicity(self):
+        """测试带毒性说明和程度修饰的药性"""
+        result = parse_properties("辛、甘，大热；有毒。归心、肾、脾经。")
+        assert result == {"flavors": ["辛", "甘"], "nature": "大热", "meridians": ["心", "肾", "脾"]}
+
+    def test_parse_properties_distinguishes_similar_meridians(self):
+        """测试心与心包、肠与大肠等归经不会混淆"""
+        result = parse_properties("甘，凉。归肝、心包经。")
+        assert result["meridians"] == ["肝", "心包"]
+
+    def test_parse_empty_properties(self):
+        """测试空药性"""
+        assert parse_properties("") == {"flavors": [], "nature": "", "meridians": []}
+
+    def test_property_index_query(self):
+        """测试位掩码多条件筛选"""
+        index = PropertyIndex()
+        index.add(0, {"properties": "辛、微苦，温。归肺、膀胱经。"})
+        index.add(1, {"properties": "辛，温。归肺、脾、胃经。"})
+        index.add(2, {"properties": "苦，寒。归肺、胃经。"})
+
+        assert list(index.query(natures="温", meridians=["肺", "胃"])) == [1]
+        assert list(index.query(meridians=["肺"])) == [0, 1, 2]
+        assert list(index.query(flavors=["苦"])) == [0, 2]
+        assert list(index.query(natures=["温", "寒"], flavors=["辛"])) == [0, 1]
+        assert index.describe(0) == {"flavors": ["辛", "苦"], "nature": "温", "meridians": ["肺", "膀胱"]}
+
+    def test_unknown_value_raises(self):
+        """测试未知取值抛出ValueError"""
+        index = PropertyIndex()
+        with pytest.raises(ValueError):
+            index.query(meridians=["不存在"])
+        with pytest.raises(ValueError):
+            index.query(natures="很温")
@@ -0,0 +1,78 @@
+"""
+组合查询的测试文件
+"""
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import Attributes, Contains, Equals, ExtendedHerbDatabase, parse_query
+from tcm_herbdb.query import Predicate
+
+
+class TestQuery:
+    """组合查询和查询规划的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {data_file}")
+        cls.db = ExtendedHerbDatabase.from_txt_file(data_file)
+        cls.scan_db = ExtendedHerbDatabase(list(cls.db.herbs), use_index=False)
+
+    def test_query_matches_scan(self):
+        """测试使用索引的查询结果与逐条判断一致"""
+        queries = [
+            "efficacy:解表 AND properties:温 AND NOT precautions:孕妇",
+            "efficacy:清热 OR efficacy:解毒",
+            "NOT efficacy:清热 application:咳嗽",
+            "name=麻黄 OR pinyin~guizhi",
+            '(efficacy:活血 OR efficacy:止血) AND dosage:"煎服"',
+        ]
+        for text in queries:
+            predicate = parse_query(text)
+            expected = [herb for herb in self.db.herbs if predicate.matches(herb)]
+            assert self.db.query(text) == expected, f"{text} 的索引查询结果应该与逐条判断一致"
+            assert self.scan_db.query(text) == expected, f"{text} 的全表扫描结果应该与逐条判断一致"
+
+    def test_builder(self):
+        """测试用运算符组合谓词"""
+        condition = (Contains("efficacy", "止咳") & Attributes(natures="温", meridians=["肺"])) | Equals("name", "麻黄")
+        result = self.db.query(condition)
+        assert any(herb["name"] == "麻黄" for herb in result)
+        assert result == [herb for herb in self.db.herbs if condition.matches(herb)]
+        with pytest.raises(TypeError):
+            Predicate()
+
+    def test_explain_uses_most_selective_index(self):
+        """测试规划器选择候选行数最少的可索引条件做索引扫描"""
+        plan = self.db.explain("properties:温 AND efficacy:解表 AND NOT precautions:孕妇")
+        lines = plan.splitlines()
+        assert lines[1].startswith("1. 索引扫描 efficacy 包含 '解表'"), "应该先用更有选择性的功效条件"
+        assert "NOT precautions" in lines[3], "不可索引的条件应该排在最后"
+        assert lines[-1].endswith(f"-> {len(self.db.query('efficacy:解表 properties:温 NOT precautions:孕妇'))} 行")
+
+        assert "1. 全表扫描" in self.scan_db.explain("efficacy:解表"), "没有索引时应该全表扫描"
+
+    def test_structured_conditions(self):
+        """测试药性和剂量条件的查询语法与对应的查询方法一致，并可作为索引扫描的驱动条件"""
+        db = self.db
+        assert db.query("meridian:肺,胃 nature:温") == db.get_herbs_by_attributes(natures="温", meridians=["肺", "胃"])
+        assert db.query("flavor:辛、苦") == db.get_herbs_by_attributes(flavors=["辛", "苦"])
+        assert db.query("nature:寒,微寒") == db.get_herbs_by_attributes(natures=["寒", "微寒"])
+        assert db.query("dose:15-30g") == db.get_herbs_by_dosage(15, 30)
+        assert db.query("dose:15-") == db.get_herbs_by_dosage(15)
+        assert db.query("dose:10") == db.get_herbs_by_dosage(10, 10)
+        assert db.query("max_dose:3") == db.get_herbs_by_dosage(max_dose=3)
+
+        text = "efficacy:解表 AND flavor:辛 AND NOT dose:-3g"
+        expected = [herb for herb in db.herbs if parse_query(text).matches(herb)]
+        assert db.query(text) == expected and self.scan_db.query(text) == expected
+        assert db.explain("max_dose:1 AND efficacy:止咳").splitlines()[1].startswith("1. 索引扫描 剂量")
+
+    def test_parse_errors(self):
+        """测试格式错误的查询字符串抛出ValueError"""
+        for text in ["efficacy:", "unknown:解表", "(efficacy:解表", "efficacy:解表)", "AND efficacy:解表",
+                     "dose:abc", "dose:10-5", "max_dose:1-2", "nature:暖", "dose=3"]:
+            with pytest.raises(ValueError):
+                parse_query(text)
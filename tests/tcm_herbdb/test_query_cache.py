@@ -0,0 +1,70 @@
+"""
+查询结果缓存的测试文件
+"""
+import pytest
+from pathlib import Path
+
+from tcm_herbdb import ExtendedHerbDatabase, QueryCache
+
+
+class TestQueryCache:
+    """QueryCache 类和数据库查询缓存的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {data_file}")
+        cls.herbs = ExtendedHerbDatabase.from_txt_file(data_file).herbs
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的结果"""
+        cache = QueryCache(maxsize=2)
+        cache.put("a", [1], version=0)
+        cache.put("b", [2], version=0)
+        assert cache.get("a", version=0) == (True, [1])
+        cache.put("c", [3], version=0)
+        assert cache.get("b", version=0) == (False, None), "最久未使用的b应该被淘汰"
+        assert cache.get("a", version=0) == (True, [1])
+        assert cache.info()["hits"] == 2 and cache.info()["misses"] == 1
+
+    def test_ttl_and_version(self, monkeypatch):
+        """测试结果过期和版本号变化后不再命中"""
+        now = [100.0]
+        monkeypatch.setattr("tcm_herbdb.query_cache.time.monotonic", lambda: now[0])
+        cache = QueryCache(maxsize=8, ttl=10)
+        cache.put("a", [1], version=0)
+        now[0] += 5
+        assert cache.get("a", version=0)[0]
+        now[0] += 10
+        assert not cache.get("a", version=0)[0], "超过过期时间的结果不应该命中"
+
+        cache.put("a", [1], version=0)
+        assert not cache.get("a", version=1)[0], "版本号变化后缓存应该失效"
+        assert len(cache) == 0
+
+    def test_database_query_cache(self):
+        """测试重复查询命中缓存，且修改数据库后返回新结果"""
+        db = ExtendedHerbDatabase(list(self.herbs), use_index=False)
+        first = db.get_herbs_by_efficacy("解表")
+        second = db.get_herbs_by_efficacy("解表")
+        assert second == first
+        info = db.cache_info()
+        assert info["hits"] == 1 and info["misses"] == 1, "嵌套的 get_herbs_by_field 不应该重复计数"
+
+        second.clear()
+        assert db.get_herbs_by_efficacy("解表") == first, "修改返回的列表不应该影响缓存"
+
+        db.add_herb({**self.herbs[0], "name": "测试药", "efficacy": "解表"})
+        result = db.get_herbs_by_efficacy("解表")
+        assert len(result) == len(first) + 1, "添加药材后缓存的结果应该失效"
+        assert db.get_herbs_by_attributes(flavors=["辛"], meridians=["肺"]) == \
+            db.get_herbs_by_attributes(flavors=["辛"], meridians=["肺"])
+
+    def test_cache_disabled(self):
+        """测试 cache_size 为0时不缓存"""
+        db = ExtendedHerbDatabase(list(self.herbs), cache_size=0)
+        db.get_herbs_by_name("麻黄")
+        db.get_herbs_by_name("麻黄")
+        assert db.cache_info()["hits"] == 0 and len(db.query_cache) == 0
@@ -0,0 +1,163 @@
+"""
+查询服务的测试文件
+"""
+import asyncio
+import http.client
+import json
+import socket
+import threading
+import pytest
+from pathlib import Path
+from urllib.parse import quote
+
+from tcm_herbdb import ExtendedHerbDatabase, HerbServer, metrics
+
+
+class TestHerbServer:
+    """HerbServer 类的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据，并在后台线程中启动查询服务"""
+        data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {data_file}")
+        cls.db = ExtendedHerbDatabase.from_txt_file(data_file)
+        cls.server = HerbServer(cls.db, "127.0.0.1", 0)
+
+        cls.loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(cls.loop)
+            cls.loop.run_until_complete(cls.server.start())
+            started.set()
+            cls.loop.run_forever()
+
+        cls.thread = threading.Thread(target=run, daemon=True)
+        cls.thread.start()
+        started.wait(10)
+        cls.port = cls.server.server.sockets[0].getsockname()[1]
+
+    @classmethod
+    def teardown_class(cls):
+        """关闭查询服务，等待连接处理结束后关闭事件循环"""
+        async def close():
+            cls.server.server.close()
+            await cls.server.server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), cls.loop).result(10)
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join(10)
+        cls.loop.close()
+
+    def get(self, connection, path):
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_keep_alive_queries(self):
+        """测试同一连接上的多个请求，结果与直接查询数据库一致"""
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        status, body = self.get(connection, "/health")
+        assert status == 200 and body["herbs"] == self.db.get_herb_count()
+
+        status, body = self.get(connection, f"/herbs?name={quote('麻黄')}")
+        assert body["results"] == [dict(herb) for herb in self.db.get_herbs_by_name("麻黄")]
+
+        condition = "efficacy:解表 AND NOT precautions:孕妇"
+        status, body = self.get(connection, f"/query?q={quote(condition)}&explain=1&fields=name")
+        assert [herb["name"] for herb in body["results"]] == [herb["name"] for herb in self.db.query(condition)]
+        assert body["plan"].startswith("查询:")
+
+        status, body = self.get(connection, f"/fuzzy?q={quote('ma huang')}&k=1")
+        assert body["results"][0]["name"] == "麻黄" and body["results"][0]["distance"] == 0
+
+        status, body = self.get(connection, f"/similar?name={quote('麻黄')}&k=3&fields=name")
+        expected = self.db.similar_herbs("麻黄", 3)
+        assert [(herb["name"], herb["score"]) for herb in body["results"]] == \
+            [(herb["name"], score) for herb, score in expected]
+        connection.close()
+
+    def test_streamed_large_result(self):
+        """测试分块传输的大结果集完整且是合法的JSON"""
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        connection.request("GET", "/search?field=efficacy&value=")
+        response = connection.getresponse()
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        body = json.loads(response.read())
+        assert body["count"] == len(body["results"]) == self.db.get_herb_count()
+        connection.close()
+
+    def test_errors(self):
+        """测试未知接口、错误参数和不支持的请求方法"""
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        assert self.get(connection, "/unknown")[0] == 404
+        assert self.get(connection, "/query?q=unknown:x")[0] == 400
+        assert self.get(connection, "/dosage?low=abc")[0] == 400
+        connection.request("POST", "/health", body=b"{}")
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 405
+        assert self.get(connection, "/health")[0] == 200, "出错后连接应该仍然可用"
+        connection.close()
+
+    def test_category_fields(self):
+        """测试从 Markdown 教材加载时可以按章节层级字段选择返回的字段"""
+        herb = dict(self.db.get_herbs_by_name("麻黄")[0], chapter="第八章", category="解表药",
+                    subcategory="发散风寒药")
+        server = HerbServer(ExtendedHerbDatabase([herb]))
+        status, payload, herbs = server.dispatch("GET", f"/herbs?category={quote('解表药')}"
+                                                        "&fields=name,chapter,category,subcategory")
+        assert status == 200
+        assert payload["count"] == 1
+        assert list(herbs) == [{"name": "麻黄", "chapter": "第八章", "category": "解表药", "subcategory": "发散风寒药"}]
+        assert server.dispatch("GET", "/herbs?category=x&fields=unknown")[0] == 400
+
+    def test_lazy_projection(self):
+        """测试药材在写出响应时才逐个复制（压缩存储时才解压），limit 截取后计数正确"""
+        db = ExtendedHerbDatabase(list(self.db.herbs), compress="zlib")
+        server = HerbServer(db)
+        status, payload, herbs = server.dispatch("GET", f"/search?field=efficacy&value={quote('解表')}&limit=3")
+        assert status == 200 and payload["count"] == 3
+        assert db.compressor.misses == 0
+        assert [herb["name"] for herb in herbs] == [herb["name"] for herb in db.get_herbs_by_efficacy("解表")[:3]]
+        assert db.compressor.misses == 3
+        assert server.dispatch("GET", "/herbs?name=x&limit=-1")[0] == 400
+
+    def raw_request(self, data: bytes) -> bytes:
+        """发送原始请求字节并关闭写端，返回服务端的完整响应"""
+        with socket.create_connection(("127.0.0.1", self.port), timeout=10) as sock:
+            sock.sendall(data)
+            sock.shutdown(socket.SHUT_WR)
+            response = b""
+            while chunk := sock.recv(65536):
+                response += chunk
+        return response
+
+    @pytest.mark.parametrize("length, body", [("abc", b""), ("-5", b""), ("10", b"abc")])
+    def test_bad_content_length(self, length, body):
+        """测试非数字、负数的 Content-Length 以及不完整的请求体返回400，服务不受影响"""
+        request = f"GET /health HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n".encode("ascii")
+        response = self.raw_request(request + body)
+        assert response.startswith(b"HTTP/1.1 400 ")
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        assert self.get(connection, "/health")[0] == 200
+        connection.close()
+
+    def test_metrics(self):
+        """测试 /metrics 以 Prometheus 文本格式返回查询延迟"""
+        metrics.enable()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+            self.get(connection, f"/herbs?name={quote('桂枝')}")
+            connection.request("GET", "/metrics")
+            response = connection.getresponse()
+            text = response.read().decode("utf-8")
+            assert response.status == 200
+            assert response.getheader("Content-Type").startswith("text/plain")
+            assert 'tcm_herbdb_query_seconds_count{method="get_herbs_by_name"} 1' in text
+            connection.close()
+        finally:
+            metrics.disable()
+            metrics.reset()
@@ -0,0 +1,77 @@
+"""
+相似度检索的测试文件
+"""
+import numpy as np
+from pathlib import Path
+
+from tcm_herbdb import ExtendedHerbDatabase, HerbParser, TfidfIndex, char_ngrams
+
+
+def dense_scores(index: TfidfIndex, text: str) -> np.ndarray:
+    """用稠密矩阵直接计算文本与各药材的余弦相似度，作为对照"""
+    matrix = index.matrix
+    n_terms, n_docs = len(matrix["indptr"]) - 1, len(index._documents)
+    dense = np.zeros((n_docs, n_terms))
+    for term in range(n_terms):
+        start, end = matrix["indptr"][term], matrix["indptr"][term + 1]
+        dense[matrix["indices"][start:end], term] = matrix["data"][start:end]
+    query = np.zeros(n_terms)
+    for gram, count in char_ngrams(text).items():
+        if gram in index.vocabulary:
+            term = index.vocabulary[gram]
+            query[term] = (1 + np.log(count)) * matrix["idf"][term]
+    return dense @ (query / np.linalg.norm(query))
+
+
+class TestSimilarity:
+    """TfidfIndex 类和数据库相似度查询的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        cls.data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not cls.data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {cls.data_file}")
+        cls.herbs = HerbParser().extract_herb_info(cls.data_file.read_text(encoding="utf-8"))
+        cls.db = ExtendedHerbDatabase(cls.herbs)
+
+    def test_char_ngrams(self):
+        """测试字符 n-gram 不跨越标点，字母转为小写"""
+        assert char_ngrams("发汗，解表Ab") == {"发": 1, "汗": 1, "发汗": 1, "解": 1, "表": 1, "解表": 1,
+                                             "a": 1, "b": 1, "ab": 1, "表a": 1}
+        assert char_ngrams("发汗发汗", (2, 2)) == {"发汗": 2, "汗发": 1}
+
+    def test_matches_dense_cosine(self):
+        """测试稀疏矩阵乘积与稠密余弦相似度一致，结果按相似度降序取前k个"""
+        index = self.db.similarity_index
+        text = "恶寒发热，无汗，头身疼痛"
+        expected = dense_scores(index, text)
+        matches = index.search(text, k=5)
+        assert len(matches) == 5
+        assert [herb_id for herb_id, _ in matches] == list(np.argsort(-expected, kind="stable")[:5])
+        for herb_id, score in matches:
+            assert abs(score - expected[herb_id]) < 1e-9
+        assert index.search("", k=5) == [] and index.search("ＸＹ", k=5) == []
+
+    def test_batch_and_similar(self):
+        """测试批量查询与逐个查询一致，相似药材不含自身"""
+        texts = ["咳嗽气喘，痰多", "补气健脾", "活血化瘀止痛", ""]
+        assert self.db.similarity_search_many(texts, k=5) == [self.db.similarity_search(text, k=5)
+                                                              for text in texts]
+
+        similar = self.db.similar_herbs("麻黄", k=5)
+        names = [herb["name"] for herb, _ in similar]
+        assert len(names) == 5 and "麻黄" not in names and "桂枝" in names
+        assert self.db.similar_herbs("不存在的药材") == []
+
+    def test_scan_and_incremental(self):
+        """测试不建索引时结果一致，添加药材后索引同步更新"""
+        plain = ExtendedHerbDatabase(list(self.herbs), use_index=False)
+        assert plain.similar_herbs("麻黄", k=5) == self.db.similar_herbs("麻黄", k=5)
+        assert plain.similarity_search("清热解毒", k=5) == self.db.similarity_search("清热解毒", k=5)
+
+        db = ExtendedHerbDatabase(list(self.herbs))
+        db.similarity_search("发汗解表")
+        db.add_herb(dict(self.herbs[0], name="测试药"))
+        top = db.similar_herbs("测试药", k=1)
+        assert top[0][0]["name"] == self.herbs[0]["name"] and abs(top[0][1] - 1) < 1e-9
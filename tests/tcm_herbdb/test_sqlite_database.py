@@ -0,0 +1,108 @@
+"""
+SQLiteHerbDatabase 类的测试文件
+"""
+import pytest
+import sqlite3
+from pathlib import Path
+
+from tcm_herbdb import ExtendedHerbDatabase, SQLiteHerbDatabase
+from tcm_herbdb.records import FIELDS
+
+
+class TestSQLiteHerbDatabase:
+    """SQLiteHerbDatabase 类的测试"""
+
+    @classmethod
+    def setup_class(cls):
+        """在所有测试开始前加载数据"""
+        cls.data_file = Path(__file__).parent.parent.parent / "data" / "processed" / "herb.txt"
+        if not cls.data_file.exists():
+            raise FileNotFoundError(f"数据文件不存在: {cls.data_file}")
+
+        cls.memory_db = ExtendedHerbDatabase.from_txt_file(cls.data_file)
+        cls.sqlite_db = SQLiteHerbDatabase(":memory:", cls.memory_db.herbs)
+
+    def test_bulk_load(self):
+        """测试批量写入后的数据与内存数据库一致"""
+        assert self.sqlite_db.get_herb_count() == self.memory_db.get_herb_count()
+        assert self.sqlite_db.get_all_herbs() == self.memory_db.get_all_herbs()
+
+    def test_substring_queries_match_memory(self):
+        """测试子串查询（含FTS5索引和短子串回退）与内存数据库一致"""
+        for field in ("properties", "efficacy", "application", "precautions", "dosage"):
+            for value in ("温", "解表", "清热解毒", "归肺经", "", "不存在的内容", "*", "a?[", "10g"):
+                assert self.sqlite_db.get_herbs_by_field(field, value) == \
+                    self.memory_db.get_herbs_by_field(field, value), f"字段 {field} 查询 '{value}' 的结果不一致"
+
+    def test_name_and_pinyin_queries(self):
+        """测试名称和拼音查询"""
+        assert self.sqlite_db.get_herbs_by_name("麻黄") == self.memory_db.get_herbs_by_name("麻黄")
+        assert [herb["name"] for herb in self.sqlite_db.get_herbs_by_pinyin("mahuang")] == ["麻黄"]
+
+    def test_add_herb_and_reopen(self, tmp_path):
+        """测试添加药材后全文索引和相似度索引同步更新，且数据库文件可被重新打开"""
+        db_path = tmp_path / "herbs.sqlite3"
+        db = SQLiteHerbDatabase(db_path, self.memory_db.herbs[:10])
+        assert db.similar_herbs(self.memory_db.herbs[0]["name"], k=10)
+        db.add_herb(dict(self.memory_db.herbs[0], name="测试药材", efficacy="测试专用功效"))
+        assert "测试药材" in [herb["name"] for herb, _ in db.similar_herbs(self.memory_db.herbs[0]["name"], k=10)]
+        db.close()
+
+        reopened = SQLiteHerbDatabase(db_path)
+        assert reopened.get_herb_count() == 11
+        assert [herb["name"] for herb in reopened.get_herbs_by_efficacy("测试专用功效")] == ["测试药材"]
+        reopened.close()
+
+    def test_inherited_queries_match_memory(self):
+        """测试沿用 BaseHerbDatabase 实现的查询与内存数据库一致，且不通过 herbs 属性读表"""
+        sqlite_db, memory_db = self.sqlite_db, self.memory_db
+        assert not hasattr(sqlite_db, "herbs")
+        assert sqlite_db.get_herbs_by_attributes(natures="温", meridians=["肺"]) == \
+            memory_db.get_herbs_by_attributes(natures="温", meridians=["肺"])
+        assert sqlite_db.get_herbs_by_dosage(15, 30) == memory_db.get_herbs_by_dosage(15, 30)
+        assert sqlite_db.fuzzy_search("麻璜") == memory_db.fuzzy_search("麻璜")
+        assert sqlite_db.search_many(["解表", "止咳"]) == memory_db.search_many(["解表", "止咳"])
+        assert sqlite_db.query("efficacy:解表 AND properties:温") == memory_db.query("efficacy:解表 AND properties:温")
+        assert sqlite_db.similar_herbs("麻黄", k=5) == memory_db.similar_herbs("麻黄", k=5)
+        assert sqlite_db.similarity_search_many(["咳嗽气喘", "补气健脾"], k=5) == \
+            memory_db.similarity_search_many(["咳嗽气喘", "补气健脾"], k=5)
+
+    def test_reload_same_file(self, tmp_path):
+        """测试同一文件再次载入同一数据库文件时不重复写入，文件修改后整体替换"""
+        db_path = tmp_path / "herbs.sqlite3"
+        SQLiteHerbDatabase.from_txt_file(self.data_file, db_path).close()
+        db = SQLiteHerbDatabase.from_txt_file(self.data_file, db_path)
+        assert db.get_herb_count() == self.memory_db.get_herb_count()
+        assert len(db.get_herbs_by_name("麻黄")) == 1
+        assert db.load_txt_file(self.data_file) is False
+
+        changed = tmp_path / "herb.txt"
+        changed.write_text(self.data_file.read_text(encoding="utf-8").replace("麻黄", "麻黄草"), encoding="utf-8")
+        assert db.load_txt_file(changed) is True
+        assert db.get_herb_count() == self.memory_db.get_herb_count()
+        assert db.get_herbs_by_name("麻黄") == [] and len(db.get_herbs_by_name("麻黄草")) == 1
+        assert [herb["name"] for herb in db.get_herbs_by_efficacy("发汗解表")] == \
+            [herb["name"].replace("麻黄", "麻黄草") for herb in self.memory_db.get_herbs_by_efficacy("发汗解表")]
+        db.close()
+
+    def test_markdown_categories(self, tmp_path):
+        """测试 Markdown 教材的章节层级写入数据库，按类别查找与内存数据库一致"""
+        md_file = Path(__file__).parent.parent.parent / "data" / "raw" / "herb.md"
+        memory_db = ExtendedHerbDatabase.from_txt_file(md_file)
+        db = SQLiteHerbDatabase.from_txt_file(md_file)
+        assert db.get_all_herbs() == memory_db.get_all_herbs()
+        for category in ("第八章", "解表药", "发散风寒药", "不存在的类别", ""):
+            assert db.get_herbs_by_category(category) == memory_db.get_herbs_by_category(category)
+        assert db.get_categories() == memory_db.get_categories()
+        assert self.sqlite_db.get_herbs_by_category("解表药") == []
+
+        # 旧版本建立的数据库文件没有章节层级列，打开时补上
+        db_path = tmp_path / "old.sqlite3"
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(f"CREATE TABLE herbs (id INTEGER PRIMARY KEY, "
+                         f"{', '.join(f'{field} TEXT' for field in FIELDS)}, plain_pinyin TEXT)")
+        conn.close()
+        old = SQLiteHerbDatabase(db_path, memory_db.herbs[:5])
+        assert old.get_herbs_by_category(memory_db.herbs[0]["category"]) == \
+            [herb for herb in memory_db.herbs[:5] if herb["category"] == memory_db.herbs[0]["category"]]
+        old.close()